@@ -0,0 +1,17 @@
+# -*- coding: utf-8 -*-
+"""
+Núcleo compartilhado do Analisador de Tributos
+
+Código reutilizado pelas versões web (app.py), local (app_local.py) e
+desktop (app_desktop.py).
+"""
+
+from .core import AnalysisConfig, Analyzer, get_profile
+from .matcher import TributoMatcher
+
+__all__ = [
+    'AnalysisConfig',
+    'Analyzer',
+    'TributoMatcher',
+    'get_profile',
+]
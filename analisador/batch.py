@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+"""
+Análise em lote de vários PDFs
+
+Os arquivos são distribuídos por um pool de processos (um arquivo por
+tarefa) e os resultados de cada um são reunidos em uma única lista marcada
+com o nome do arquivo. O progresso, a vazão (arquivos/s e páginas/s) e o
+tempo restante estimado são reportados a cada arquivo concluído.
+"""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from .extraction import count_pages
+from .progress import estimate_eta, format_eta
+
+# Número de processos da análise em lote (padrão: um por núcleo)
+BATCH_WORKERS = int(os.environ.get('BATCH_WORKERS', os.cpu_count() or 1))
+
+
+def find_pdfs(paths):
+    """
+    Expande arquivos e pastas na lista de PDFs a analisar
+
+    Args:
+        paths (list): Caminhos de arquivos PDF e/ou pastas
+
+    Returns:
+        list: Caminhos dos PDFs, com as pastas percorridas em ordem alfabética
+    """
+    pdf_paths = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                pdf_paths.extend(os.path.join(root, name) for name in sorted(files)
+                                 if name.lower().endswith('.pdf'))
+        else:
+            pdf_paths.append(path)
+    return pdf_paths
+
+
+class BatchProgress:
+    """Contadores de progresso e vazão de um lote"""
+
+    def __init__(self, total_files, total_pages=None):
+        """
+        Args:
+            total_files (int): Número de arquivos do lote
+            total_pages (int): Páginas somadas dos arquivos (base do tempo
+                restante; sem ele a estimativa é por arquivo)
+        """
+        self.total_files = total_files
+        self.total_pages = total_pages
+        self.arquivos = 0
+        self.paginas = 0
+        self.trechos = 0
+        self.erros = 0
+        self.started = time.monotonic()
+
+    def add(self, result):
+        """Contabiliza o resultado de um arquivo concluído"""
+        self.arquivos += 1
+        self.paginas += result.get('paginas_processadas', 0)
+        self.trechos += len(result.get('results', []))
+        # Arquivo lido mas sem ocorrências não conta como erro
+        if 'error' in result and 'paginas_processadas' not in result:
+            self.erros += 1
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    @property
+    def files_per_second(self):
+        return self.arquivos / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def pages_per_second(self):
+        return self.paginas / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def eta(self):
+        """Segundos restantes pela vazão de páginas (ou de arquivos), None sem base"""
+        if self.arquivos >= self.total_files:
+            return 0.0
+        if self.total_pages:
+            return estimate_eta(self.paginas, self.total_pages, self.elapsed)
+        return estimate_eta(self.arquivos, self.total_files, self.elapsed)
+
+    def to_dict(self):
+        """Estatísticas do lote para a API"""
+        return {
+            'arquivos': self.arquivos,
+            'total_arquivos': self.total_files,
+            'paginas': self.paginas,
+            'total_paginas': self.total_pages,
+            'trechos': self.trechos,
+            'erros': self.erros,
+            'duracao': round(self.elapsed, 3),
+            'arquivos_por_segundo': round(self.files_per_second, 2),
+            'paginas_por_segundo': round(self.pages_per_second, 2),
+            'eta_s': None if self.eta is None else round(self.eta, 1),
+        }
+
+    def __str__(self):
+        return (f"📦 {self.arquivos}/{self.total_files} arquivos | {self.paginas} páginas | "
+                f"{self.trechos} trechos | {self.files_per_second:.2f} arquivos/s | "
+                f"{self.pages_per_second:.1f} páginas/s | restam {format_eta(self.eta)}")
+
+
+def _count_pages(pdf_path):
+    try:
+        return count_pages(pdf_path)
+    except Exception:
+        # Arquivo ilegível: o erro aparece na análise dele
+        return 0
+
+
+def run_batch(pdf_paths, tributos_text, analyze, workers=None, on_progress=None):
+    """
+    Analisa vários PDFs em paralelo e junta os resultados
+
+    Args:
+        pdf_paths (list): Caminhos dos PDFs
+        tributos_text (str): String com tributos separados por vírgula
+        analyze (callable): ``analyze(pdf_path, tributos_text)`` com o formato de
+            resultado de ``process_pdf_analysis``; precisa ser serializável
+            (função de módulo ou ``functools.partial``)
+        workers (int): Número de processos (padrão: BATCH_WORKERS)
+        on_progress (callable): Recebe o ``BatchProgress`` a cada arquivo concluído
+
+    Returns:
+        dict: Resultados de todos os arquivos (cada um com 'arquivo'), o resumo
+        por arquivo e as estatísticas do lote
+    """
+    # Contar as páginas só lê a árvore de páginas (fração pequena da extração)
+    progress = BatchProgress(len(pdf_paths), sum(_count_pages(pdf_path) for pdf_path in pdf_paths))
+    outcomes = [None] * len(pdf_paths)
+    workers = max(1, min(workers or BATCH_WORKERS, len(pdf_paths)))
+
+    def finish(i, result):
+        outcomes[i] = result
+        progress.add(result)
+        if on_progress:
+            on_progress(progress)
+
+    if workers == 1:
+        for i, pdf_path in enumerate(pdf_paths):
+            try:
+                result = analyze(pdf_path, tributos_text)
+            except Exception as e:
+                result = {"error": f"Erro durante processamento: {str(e)}"}
+            finish(i, result)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(analyze, pdf_path, tributos_text): i
+                       for i, pdf_path in enumerate(pdf_paths)}
+            for future in as_completed(futures):
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = {"error": f"Erro durante processamento: {str(e)}"}
+                finish(futures[future], result)
+
+    # Junta na ordem dos arquivos (não na ordem de conclusão)
+    results = []
+    arquivos = []
+    for pdf_path, result in zip(pdf_paths, outcomes):
+        name = os.path.basename(pdf_path)
+        file_results = result.get('results', [])
+        results.extend(dict(trecho, arquivo=name) for trecho in file_results)
+
+        resumo = {
+            'arquivo': name,
+            'paginas': result.get('paginas_processadas', 0),
+            'total_encontrados': len(file_results),
+        }
+        if 'error' in result:
+            resumo['erro'] = result['error']
+        arquivos.append(resumo)
+
+    return {
+        "success": True,
+        "results": results,
+        "total_encontrados": len(results),
+        "arquivos": arquivos,
+        "estatisticas": progress.to_dict(),
+    }
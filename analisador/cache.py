@@ -0,0 +1,358 @@
+# -*- coding: utf-8 -*-
+"""
+Cache em disco do texto extraído dos PDFs
+
+Cada entrada é identificada pelo SHA-256 dos bytes do arquivo e guarda o
+texto de cada página em JSON Lines comprimido com gzip. O tamanho total do
+cache é limitado: as entradas usadas há mais tempo (mtime, atualizado a cada
+leitura) são removidas primeiro.
+
+Com o pré-filtro (ver ``prefilter``) as páginas sem tributo ficam só com o
+texto cru; elas são gravadas como ``{"cru": texto}`` e completadas (a
+entrada é regravada) na primeira análise que precisar do texto completo.
+"""
+
+import os
+import gzip
+import json
+import uuid
+import shutil
+import hashlib
+import threading
+from collections import deque
+from itertools import chain, islice
+
+from .extraction import count_pages, iter_pages, open_pdf
+from .prefilter import RawPageText
+
+# Padrão: pasta 'cache' ao lado das aplicações, e não na pasta de onde o processo foi iniciado
+PDF_TEXT_CACHE_DIR = os.environ.get(
+    'PDF_TEXT_CACHE_DIR', os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'cache'))
+PDF_TEXT_CACHE_MAX_MB = int(os.environ.get('PDF_TEXT_CACHE_MAX_MB', 200))
+
+CACHE_SUFFIX = '.pages.gz'
+
+
+def file_sha256(pdf_path):
+    """
+    Calcula o SHA-256 do arquivo lendo em blocos
+
+    Args:
+        pdf_path (str | bytes): Caminho para o arquivo ou o seu conteúdo
+
+    Returns:
+        str: Hash em hexadecimal
+    """
+    if isinstance(pdf_path, bytes):
+        return hashlib.sha256(pdf_path).hexdigest()
+
+    digest = hashlib.sha256()
+    with open(pdf_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class PageTextCache:
+    """
+    Cache LRU em disco do texto por página, limitado em bytes
+
+    A pasta só é criada na primeira gravação: criar o cache (ex: ao importar
+    uma aplicação) não toca no disco.
+    """
+
+    def __init__(self, directory=PDF_TEXT_CACHE_DIR, max_bytes=PDF_TEXT_CACHE_MAX_MB * 1024 * 1024):
+        """
+        Args:
+            directory (str): Pasta das entradas do cache
+            max_bytes (int): Tamanho máximo somado das entradas
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + CACHE_SUFFIX)
+
+    def open(self, key):
+        """
+        Abre uma entrada do cache para leitura
+
+        Args:
+            key (str): SHA-256 do arquivo
+
+        Returns:
+            tuple: (total_paginas, paginas_guardadas, gerador_de_paginas)
+            ou None se a entrada não existir
+        """
+        path = self._path(key)
+        try:
+            f = gzip.open(path, 'rt', encoding='utf-8')
+            header = json.loads(f.readline())
+        except (OSError, EOFError, ValueError):
+            self._remove(path)
+            return None
+
+        # Marca a entrada como usada recentemente (LRU)
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+        return header['total_paginas'], header['paginas'], self._read_pages(f, path)
+
+    def _read_pages(self, f, path):
+        """Gera as páginas de uma entrada já aberta"""
+        try:
+            with f:
+                for line in f:
+                    page_text = json.loads(line)
+                    yield RawPageText(page_text['cru']) if isinstance(page_text, dict) else page_text
+        except (OSError, EOFError, ValueError):
+            # Entrada corrompida: descarta para a próxima análise refazer
+            self._remove(path)
+            raise
+
+    def writer(self, key, total_pages):
+        """
+        Cria um gravador incremental para uma entrada
+
+        Args:
+            key (str): SHA-256 do arquivo
+            total_pages (int): Número total de páginas do documento
+
+        Returns:
+            CacheEntryWriter: Gravador (chamar ``commit`` ou ``discard``)
+        """
+        return CacheEntryWriter(self, key, total_pages)
+
+    def write(self, key, total_pages, pages):
+        """
+        Grava as páginas de um documento de uma vez
+
+        Args:
+            key (str): SHA-256 do arquivo
+            total_pages (int): Número total de páginas do documento
+            pages (iterable): Texto das páginas extraídas (prefixo do documento)
+        """
+        writer = self.writer(key, total_pages)
+        for page_text in pages:
+            writer.add(page_text)
+        writer.commit()
+
+    def evict(self):
+        """Remove as entradas menos usadas até caber no limite de tamanho"""
+        with self._lock:
+            entries = []
+            try:
+                names = os.listdir(self.directory)
+            except OSError:
+                return
+            for name in names:
+                if not name.endswith(CACHE_SUFFIX):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(self.directory, name))
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, name))
+
+            total = sum(size for _, size, _ in entries)
+            for _, size, name in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                self._remove(os.path.join(self.directory, name))
+                total -= size
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+class CacheEntryWriter:
+    """
+    Grava uma entrada do cache página a página
+
+    As páginas vão para um arquivo temporário comprimido; no ``commit`` o
+    cabeçalho (que depende do número de páginas gravadas) é escrito como um
+    membro gzip separado seguido dos bytes já comprimidos, sem recomprimir.
+    """
+
+    def __init__(self, cache, key, total_pages):
+        self.cache = cache
+        self.key = key
+        self.total_pages = total_pages
+        self.pages = 0
+        os.makedirs(cache.directory, exist_ok=True)
+        self._tmp_path = os.path.join(cache.directory, f'.{key}.{uuid.uuid4().hex}.tmp')
+        self._file = gzip.open(self._tmp_path, 'wt', encoding='utf-8')
+
+    def add(self, page_text):
+        """Acrescenta o texto da próxima página (``RawPageText`` fica marcado como cru)"""
+        if isinstance(page_text, RawPageText):
+            page_text = {'cru': str(page_text)}
+        self._file.write(json.dumps(page_text, ensure_ascii=False) + '\n')
+        self.pages += 1
+
+    def commit(self):
+        """Publica a entrada no cache (substituição atômica)"""
+        self._file.close()
+        entry_tmp_path = self._tmp_path + '.entry'
+        header = json.dumps({'total_paginas': self.total_pages, 'paginas': self.pages}) + '\n'
+        try:
+            with open(entry_tmp_path, 'wb') as out:
+                out.write(gzip.compress(header.encode('utf-8')))
+                with open(self._tmp_path, 'rb') as body:
+                    shutil.copyfileobj(body, out)
+            os.replace(entry_tmp_path, self.cache._path(self.key))
+        finally:
+            self.cache._remove(entry_tmp_path)
+            self.cache._remove(self._tmp_path)
+
+        self.cache.evict()
+
+    def discard(self):
+        """Descarta o que foi gravado"""
+        self._file.close()
+        self.cache._remove(self._tmp_path)
+
+
+def iter_pages_cached(pdf_path, cache, workers=None, max_pages=None, sha256=None, start_page=0, stats=None,
+                      page_filter=None):
+    """
+    Gera o texto das páginas usando o cache quando possível
+
+    Em um acerto o pdfplumber não é usado. Em uma falta as páginas são
+    extraídas normalmente e gravadas no cache à medida que passam; se quem
+    consome parar antes do fim, o prefixo extraído é gravado assim mesmo e
+    reaproveitado quando uma análise posterior precisar de mais páginas.
+
+    O pré-filtro vale também com o cache: as páginas não candidatas são
+    guardadas com o texto cru. Uma página crua guardada é extraída por
+    completo (e a entrada regravada) quando passa a ser candidata, ou vizinha
+    de uma candidata, para os tributos da análise atual, ou em toda leitura
+    sem pré-filtro. Uma faixa que começa depois do prefixo guardado é
+    extraída sem passar pelo cache (ele só guarda prefixos do documento).
+
+    Args:
+        pdf_path (str | bytes): Caminho para o arquivo PDF ou o seu conteúdo
+        cache (PageTextCache): Cache a usar (None desativa o cache)
+        workers (int): Número de processos de extração
+        max_pages (int): Limite opcional de páginas (índice final, exclusivo)
+        sha256 (str): Hash do arquivo, se já calculado
+        start_page (int): Primeira página gerada (0-based)
+        stats (dict): Se informado, recebe 'total_paginas' do documento
+        page_filter (PageFilter): Pré-filtro das páginas extraídas (opcional)
+
+    Yields:
+        str: Texto de cada página, na ordem do documento
+    """
+    if cache is None:
+        total_pages = count_pages(pdf_path)
+        if stats is not None:
+            stats['total_paginas'] = total_pages
+        yield from iter_pages(pdf_path, workers=workers, max_pages=max_pages, total_pages=total_pages,
+                              start_page=start_page, page_filter=page_filter)
+        return
+
+    key = sha256 or file_sha256(pdf_path)
+
+    entry = cache.open(key)
+    if entry is not None:
+        total_pages, stored_pages, stored = entry
+    else:
+        total_pages, stored_pages, stored = count_pages(pdf_path), 0, ()
+    if stats is not None:
+        stats['total_paginas'] = total_pages
+    wanted = total_pages if max_pages is None else min(total_pages, max_pages)
+
+    if start_page > stored_pages:
+        cache.misses += 1
+        if entry is not None:
+            stored.close()
+        yield from iter_pages(pdf_path, workers=workers, max_pages=max_pages,
+                              total_pages=total_pages, start_page=start_page, page_filter=page_filter)
+        return
+
+    # Páginas guardadas e, depois delas, a extração do restante
+    pages = islice(stored, wanted)
+    if stored_pages < wanted:
+        pages = chain(pages, iter_pages(pdf_path, workers=workers, max_pages=max_pages, total_pages=total_pages,
+                                        start_page=stored_pages, page_filter=page_filter))
+
+    neighbors = page_filter.neighbors if page_filter is not None else 0
+    candidates = []
+    pending = deque()
+    writer = None
+    pdf = None
+
+    def complete(i, page_text):
+        """Texto da página i, extraindo por completo uma página crua que agora precisa dele"""
+        nonlocal writer, pdf
+        changed = i >= stored_pages
+        if (isinstance(page_text, RawPageText) and i >= start_page
+                and any(candidates[max(0, i - neighbors):i + neighbors + 1])):
+            if pdf is None:
+                pdf = open_pdf(pdf_path)
+            page = pdf.pages[i]
+            page_text = page.extract_text() or ''
+            page.flush_cache()
+            changed = True
+
+        if changed and writer is None:
+            # Primeira mudança na entrada: a gravação começa com as páginas já passadas
+            previous = cache.open(key) if i else None
+            if i and previous is None:
+                return page_text
+            writer = cache.writer(key, total_pages)
+            if previous is not None:
+                try:
+                    for previous_text in islice(previous[2], i):
+                        writer.add(previous_text)
+                finally:
+                    previous[2].close()
+        if writer is not None:
+            writer.add(page_text)
+        return page_text
+
+    def drain(keep):
+        # Uma página sai quando as vizinhas seguintes já disseram se são candidatas
+        while len(pending) > keep:
+            i, page_text = pending.popleft()
+            page_text = complete(i, page_text)
+            if i >= start_page:
+                yield page_text
+
+    try:
+        for i, page_text in enumerate(pages):
+            candidates.append(page_filter is None or page_filter.is_candidate(page_text))
+            pending.append((i, page_text))
+            yield from drain(neighbors)
+        yield from drain(0)
+    finally:
+        if pdf is not None:
+            pdf.close()
+
+        if writer is None:
+            if entry is not None and stored_pages >= wanted:
+                cache.hits += 1
+            else:
+                cache.misses += 1
+        else:
+            cache.misses += 1
+            # O que não passou pela busca (parada antes do fim) é gravado como estava
+            for _, page_text in pending:
+                writer.add(page_text)
+            if entry is not None:
+                for page_text in stored:
+                    writer.add(page_text)
+            if writer.pages >= stored_pages:
+                writer.commit()
+            else:
+                writer.discard()
+        if entry is not None:
+            stored.close()
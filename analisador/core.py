@@ -0,0 +1,896 @@
+# -*- coding: utf-8 -*-
+"""
+Motor de análise compartilhado pelas versões web, local e desktop
+
+As três versões executam o mesmo caminho (páginas -> linhas -> ocorrências
+-> regiões de contexto -> empresas) e diferem só nos limites, que ficam em
+um ``AnalysisConfig``. Os perfis prontos estão em ``PROFILES``.
+"""
+
+import os
+import re
+import copy
+import json
+from collections import Counter, deque
+from itertools import count, islice
+
+from .cache import file_sha256, iter_pages_cached
+from .deadline import MOTIVO_CANCELADO, MOTIVO_TEMPO, Deadline, iter_until
+from .entities import EntityEngine
+from .extraction import PDF_EXTRACTION_WORKERS
+from .folding import fold
+from .index import iter_indexed_lines
+from .matcher import TributoMatcher
+from .metrics import StageTimer, record_analysis
+from .pipeline import PageOffsets, group_by_tributo, iter_context_regions, iter_lines, iter_matches, iter_text_lines
+from .prefilter import PageFilter
+from .progress import ETAPA_EMPRESAS, ETAPA_EXTRACAO, ProgressTracker
+from .synonyms import SYNONYMS
+
+# Prompt da extração de empresas pela Maritaca AI
+AI_SYSTEM_PROMPT = ("Você é um especialista em identificar nomes de empresas em textos oficiais. "
+                    "Identifique todas as empresas mencionadas e forneça apenas os nomes principais "
+                    "(removendo LTDA, ME, EIRELI, etc.).")
+
+# Schema da saída estruturada (perfis com ``ai_structured_output``)
+AI_RESPONSE_SCHEMA = {
+    "name": "empresas_identificadas",
+    "schema": {
+        "type": "object",
+        "properties": {
+            "empresas": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "nome_simplificado": {"type": "string"}
+                    },
+                    "required": ["nome_simplificado"]
+                }
+            }
+        },
+        "required": ["empresas"]
+    }
+}
+
+# Leitura das páginas interrompida pelo ``extraction_budget``
+LIMITE_ORCAMENTO = 'orcamento_paginas'
+
+# Mensagens de uma análise parcial, pelo motivo de ela ter parado
+AVISOS_LIMITE = {
+    MOTIVO_TEMPO: "Tempo limite excedido",
+    MOTIVO_CANCELADO: "Análise cancelada",
+    LIMITE_ORCAMENTO: "Tempo de leitura das páginas esgotado",
+    'max_pdf_pages': "Limite de páginas por análise atingido",
+    'max_text_size': "Limite de texto por análise atingido",
+    'max_lines': "Limite de linhas por análise atingido",
+    'max_matches_per_tributo': "Limite de ocorrências por tributo atingido",
+}
+
+
+class AnalysisConfig:
+    """
+    Limites e parâmetros de uma análise
+
+    Os limites com valor None não são aplicados.
+    """
+
+    def __init__(self, context_lines=15, max_region_lines=None, max_pdf_pages=None, max_text_size=None,
+                 max_lines=None, max_tributos=None, max_matches_per_tributo=None, max_context_returned=None,
+                 timeout=None, extraction_budget=None, extraction_workers=None, max_entity_regions=None,
+                 ai_regions=None,
+                 max_empresas=None, stream_entities=False, prefilter_pages=False, api_timeout=30, ai_text_chars=2000,
+                 ai_max_tokens=500, ai_max_results=None, ai_structured_output=False, entity_engine=None):
+        """
+        Args:
+            context_lines (int): Linhas de contexto antes e depois de cada ocorrência
+            max_region_lines (int): Tamanho máximo de uma região de contextos
+                sobrepostos (padrão: cerca de dois contextos)
+            max_pdf_pages (int): Máximo de páginas lidas por análise (a partir da página inicial)
+            max_text_size (int): Máximo de caracteres lidos (e de cada contexto)
+            max_lines (int): Máximo de linhas buscadas
+            max_tributos (int): Máximo de tributos por análise
+            max_matches_per_tributo (int): Máximo de ocorrências de cada tributo
+            max_context_returned (int): Caracteres de contexto devolvidos por trecho
+            timeout (float): Prazo da análise em segundos; ao fim dele a análise
+                para e devolve o que já encontrou
+            extraction_budget (float): Segundos, dentro do prazo, para a leitura das
+                páginas; as que não couberem ficam para uma próxima faixa e o
+                restante do prazo fica para as empresas
+            extraction_workers (int): Processos de extração (padrão: PDF_EXTRACTION_WORKERS)
+            max_entity_regions (int): Regiões (na ordem do documento) com extração de empresas
+            ai_regions (int): Regiões, entre essas, também enviadas à Maritaca AI
+            max_empresas (int): Máximo de empresas por trecho
+            stream_entities (bool): Extrai as empresas de cada região assim que ela
+                começa, a partir do contexto do primeiro trecho (resposta mais
+                rápida); senão, no fim, com o texto da região inteira e as
+                chamadas à Maritaca em paralelo
+            prefilter_pages (bool): Só extrai com análise de layout as páginas cujo
+                texto cru menciona um tributo e as vizinhas (ver ``prefilter``);
+                não se aplica quando o documento vai para o índice de busca
+            api_timeout (float): Timeout das chamadas à Maritaca AI
+            ai_text_chars (int): Caracteres do contexto enviados à Maritaca AI
+            ai_max_tokens (int): Máximo de tokens da resposta da Maritaca AI
+            ai_max_results (int): Máximo de empresas aproveitadas da resposta
+            ai_structured_output (bool): Pede a resposta em JSON (schema) em vez de texto
+            entity_engine (EntityEngine): Extração por regex (padrão: ``EntityEngine()``)
+        """
+        self.context_lines = context_lines
+        self.max_region_lines = max_region_lines or 2 * (2 * context_lines + 1)
+        self.max_pdf_pages = max_pdf_pages
+        self.max_text_size = max_text_size
+        self.max_lines = max_lines
+        self.max_tributos = max_tributos
+        self.max_matches_per_tributo = max_matches_per_tributo
+        self.max_context_returned = max_context_returned
+        self.timeout = timeout
+        self.extraction_budget = extraction_budget
+        self.extraction_workers = extraction_workers
+        self.max_entity_regions = max_entity_regions
+        self.ai_regions = ai_regions
+        self.max_empresas = max_empresas
+        self.stream_entities = stream_entities
+        self.prefilter_pages = prefilter_pages
+        self.api_timeout = api_timeout
+        self.ai_text_chars = ai_text_chars
+        self.ai_max_tokens = ai_max_tokens
+        self.ai_max_results = ai_max_results
+        self.ai_structured_output = ai_structured_output
+        self.entity_engine = entity_engine or EntityEngine()
+
+    def replace(self, **changes):
+        """
+        Cria uma cópia com alguns parâmetros alterados
+
+        Args:
+            **changes: Parâmetros a alterar (mesmos nomes do construtor)
+
+        Returns:
+            AnalysisConfig: Nova configuração
+        """
+        config = copy.copy(self)
+        for name, value in changes.items():
+            if not hasattr(config, name):
+                raise TypeError(f"Parâmetro desconhecido: {name}")
+            setattr(config, name, value)
+        if 'context_lines' in changes and 'max_region_lines' not in changes:
+            config.max_region_lines = 2 * (2 * config.context_lines + 1)
+        return config
+
+
+PROFILES = {
+    # Render.com: um worker com pouca memória, resposta rápida
+    'web': AnalysisConfig(
+        context_lines=5,
+        max_pdf_pages=200,
+        max_text_size=2000000,
+        max_lines=50000,
+        max_matches_per_tributo=5,
+        max_context_returned=500,
+        timeout=120,
+        extraction_budget=90,
+        extraction_workers=1,
+        max_entity_regions=3,
+        ai_regions=1,
+        max_empresas=3,
+        stream_entities=True,
+        prefilter_pages=True,
+        api_timeout=3,
+        ai_text_chars=500,
+        ai_max_tokens=100,
+        ai_max_results=3,
+        ai_structured_output=True,
+        entity_engine=EntityEngine(include_names=False, max_razao_length=99, max_results=10),
+    ),
+    # Versão local: sem limites, mais contexto
+    'local': AnalysisConfig(
+        context_lines=15,
+        entity_engine=EntityEngine(min_name_length=9, max_name_length=51, max_razao_length=91),
+    ),
+    # Versão desktop (Tkinter)
+    'desktop': AnalysisConfig(
+        context_lines=10,
+        prefilter_pages=True,
+        ai_text_chars=1000,
+        ai_max_tokens=200,
+        ai_max_results=5,
+        entity_engine=EntityEngine(min_name_length=6, max_name_length=31, max_razao_length=61,
+                                   min_length=4, max_results=10),
+    ),
+}
+
+
+def get_profile(name, **overrides):
+    """
+    Configuração de um perfil, opcionalmente com parâmetros alterados
+
+    Args:
+        name (str): 'web', 'local' ou 'desktop'
+        **overrides: Parâmetros a alterar
+
+    Returns:
+        AnalysisConfig: Configuração do perfil
+    """
+    config = PROFILES[name]
+    return config.replace(**overrides) if overrides else config
+
+
+def _track_last_line(lines, scan):
+    """Repassa as linhas guardando em ``scan['linha']`` o número da última"""
+    for item in lines:
+        scan['linha'] = item[0]
+        yield item
+
+
+def parse_ai_response(content, structured=False):
+    """
+    Extrai os nomes de empresas da resposta da Maritaca AI
+
+    Args:
+        content (str): Conteúdo da resposta
+        structured (bool): Se a resposta segue ``AI_RESPONSE_SCHEMA``
+
+    Returns:
+        list: Nomes de empresas
+    """
+    if not content:
+        return []
+
+    if structured:
+        empresas = json.loads(content).get('empresas', [])
+        return [emp.get('nome_simplificado', '') for emp in empresas if emp.get('nome_simplificado')]
+
+    empresas = []
+    for line in content.split('\n'):
+        line = line.strip()
+        if line and not line.startswith(('Empresas', 'As empresas', 'Identifiquei')) and len(line) > 3:
+            # Remove numeração e pontuação
+            line = re.sub(r'^\d+[\.\-\)]\s*', '', line)
+            line = re.sub(r'^[\-\*]\s*', '', line)
+            if line:
+                empresas.append(line)
+    return empresas
+
+
+class Analyzer:
+    """
+    Análise de um PDF com uma configuração e os recursos de cada versão
+
+    Os recursos (cache de páginas, cliente da Maritaca, índice de busca) são
+    opcionais; com None a etapa correspondente é pulada.
+    """
+
+    def __init__(self, config, page_cache=None, maritaca=None, index=None, log=None):
+        """
+        Args:
+            config (AnalysisConfig): Limites da análise
+            page_cache (PageTextCache): Cache do texto das páginas
+            maritaca (MaritacaClient): Cliente da Maritaca AI
+            index (DocumentIndex): Índice onde os documentos novos são gravados
+            log (callable): Recebe as mensagens de andamento (ex: ``print``)
+        """
+        self.config = config
+        self.page_cache = page_cache
+        self.maritaca = maritaca
+        self.index = index
+        self.log = log or (lambda message: None)
+
+    def parse_tributos(self, tributos_text):
+        """
+        Separa a lista de tributos digitada pelo usuário
+
+        Args:
+            tributos_text (str): Tributos separados por vírgula
+
+        Returns:
+            list: Nomes canônicos dos tributos, com os sinônimos do mesmo
+            tributo em um único grupo (até ``max_tributos``)
+        """
+        tributos = SYNONYMS.group(tributos_text.split(','))
+        return tributos[:self.config.max_tributos]
+
+    def iter_pages(self, pdf_path, progress=None, workers=None, sha256=None, deadline=None, on_stop=None,
+                   start_page=0, stats=None, page_filter=None):
+        """
+        Gera o texto das páginas respeitando os limites de páginas, texto e tempo
+
+        Com um prazo, a leitura para entre duas páginas quando ele acaba (ou a
+        análise é cancelada), sem deixar a extração rodando. A leitura também
+        para quando passa do ``extraction_budget`` da configuração.
+
+        Args:
+            pdf_path (str | bytes): Caminho para o arquivo PDF ou o seu conteúdo
+            progress (callable): Recebe o progresso como argumentos nomeados (opcional)
+            workers (int): Processos de extração (padrão: o da configuração)
+            sha256 (str): Hash do arquivo, se já calculado
+            deadline (Deadline): Prazo da leitura (opcional)
+            on_stop (callable): Recebe o motivo (chave de ``AVISOS_LIMITE``) se o
+                prazo, o orçamento ou o limite de texto interromper a leitura
+            start_page (int): Primeira página lida (0-based)
+            stats (dict): Se informado, recebe 'total_paginas' do documento
+            page_filter (PageFilter): Pré-filtro das páginas (opcional)
+
+        O progresso recebe a etapa, 'paginas_processadas' e 'paginas_previstas'
+        (páginas que esta leitura deve cobrir, conhecidas a partir da primeira).
+
+        Yields:
+            str: Texto de cada página
+        """
+        config = self.config
+        stats = stats if stats is not None else {}
+        workers = workers or config.extraction_workers or PDF_EXTRACTION_WORKERS
+        self.log(f"📄 Extraindo páginas com até {workers} processos...")
+        text_size = 0
+        on_stop = on_stop or (lambda reason: None)
+
+        page_deadline = deadline
+        if config.extraction_budget is not None:
+            page_deadline = (deadline or Deadline()).limit(config.extraction_budget)
+
+        def stopped(reason):
+            # O prazo menor da leitura acabou antes do prazo da análise
+            if page_deadline is not deadline and not (deadline is not None and deadline.expired()):
+                reason = LIMITE_ORCAMENTO
+            on_stop(reason)
+
+        # Páginas vêm do cache em disco quando o mesmo PDF já foi analisado
+        hits = self.page_cache.hits if self.page_cache is not None else 0
+        max_pages = start_page + config.max_pdf_pages if config.max_pdf_pages else None
+        pages = iter_pages_cached(pdf_path, self.page_cache, workers=workers, max_pages=max_pages,
+                                  sha256=sha256, start_page=start_page, stats=stats, page_filter=page_filter)
+        expected = None
+        if progress:
+            # Início da etapa (base da vazão de páginas)
+            progress(etapa=ETAPA_EXTRACAO, paginas_processadas=0)
+        for i, page_text in enumerate(iter_until(pages, page_deadline, stopped)):
+            if i == 0:
+                if self.page_cache is not None and self.page_cache.hits > hits:
+                    self.log("⚡ Texto reaproveitado do cache (PDF já analisado)")
+                total_pages = stats.get('total_paginas')
+                if total_pages is not None:
+                    expected = (min(total_pages, max_pages) if max_pages else total_pages) - start_page
+            yield page_text
+
+            if progress:
+                progress(etapa=ETAPA_EXTRACAO, paginas_processadas=i + 1, paginas_previstas=expected)
+
+            # Quebra se o texto já é muito grande
+            if config.max_text_size:
+                text_size += len(page_text) + 2
+                if text_size > config.max_text_size:
+                    on_stop('max_text_size')
+                    break
+
+    def page_text(self, pdf_path, page):
+        """
+        Texto de uma única página, para mostrar a página de um trecho
+
+        Só a página pedida é extraída (ou lida do cache de páginas).
+
+        Args:
+            pdf_path (str | bytes): Caminho para o arquivo PDF ou o seu conteúdo
+            page (int): Número da página (1-based, o 'pagina' dos resultados)
+
+        Returns:
+            str: Texto da página ('' se ela não existe)
+        """
+        pages = iter_pages_cached(pdf_path, self.page_cache, workers=1, max_pages=page, start_page=page - 1)
+        return next(pages, '')
+
+    def iter_matches(self, lines, matcher, scan=None, first_line=1):
+        """
+        Gera as ocorrências dos tributos respeitando os limites de linhas e de ocorrências
+
+        Args:
+            lines (iterable): Tuplas (numero_linha, linha) em ordem
+            matcher (TributoMatcher): Matcher com os tributos buscados
+            scan (dict): Se informado, recebe em 'linha' a última linha buscada
+                por completo e em 'interrompida' se o limite de ocorrências
+                parou a busca (as linhas seguintes já lidas não contam)
+            first_line (int): Ocorrências em linhas anteriores a esta são
+                ignoradas (as linhas servem só de contexto)
+
+        Yields:
+            dict: Ocorrência (com 'tributo_idx'), em ordem de linha
+        """
+        config = self.config
+        cap = config.max_matches_per_tributo
+        por_tributo = [0] * len(matcher.tributos)
+        tributos_completos = 0
+
+        if config.max_lines:
+            lines = islice(lines, config.max_lines)
+        if scan is not None:
+            lines = _track_last_line(lines, scan)
+
+        for match in iter_matches(lines, matcher, config.context_lines, config.context_lines):
+            if match['linha_numero'] < first_line:
+                continue
+            if config.max_text_size:
+                match['contexto'] = match['contexto'][:config.max_text_size]
+            if not cap:
+                yield match
+                continue
+
+            tributo_idx = match['tributo_idx']
+            if por_tributo[tributo_idx] >= cap:
+                continue
+            yield match
+
+            # Todos os tributos no limite: não há mais nada a buscar
+            por_tributo[tributo_idx] += 1
+            if por_tributo[tributo_idx] == cap:
+                tributos_completos += 1
+                if tributos_completos == len(matcher.tributos):
+                    if scan is not None:
+                        # As linhas lidas depois desta (contexto) ainda podem ter ocorrências
+                        scan['linha'] = match['linha_numero']
+                        scan['interrompida'] = True
+                    return
+
+    def search_lines(self, lines, tributos):
+        """
+        Busca os tributos linha a linha, em streaming
+
+        Args:
+            lines (iterable): Tuplas (numero_linha, linha)
+            tributos (list): Lista de tributos para buscar
+
+        Returns:
+            list: Trechos encontrados, agrupados por tributo na ordem pedida
+        """
+        matcher = TributoMatcher(tributos)
+        results = group_by_tributo(self.iter_matches(lines, matcher))
+
+        ocorrencias = Counter(r['tributo'] for r in results)
+        for tributo in matcher.tributos:
+            self.log(f"✅ {tributo}: {ocorrencias[tributo]} ocorrências encontradas")
+        return results
+
+    def search_text(self, text, tributos):
+        """
+        Busca os tributos em um texto já extraído
+
+        Args:
+            text (str): Texto do PDF
+            tributos (list): Lista de tributos para buscar
+
+        Returns:
+            list: Trechos encontrados, agrupados por tributo na ordem pedida
+        """
+        # O texto é dobrado de uma vez, não linha a linha
+        lines = zip(count(1), iter_text_lines(text), iter_text_lines(fold(text)))
+        return self.search_lines(lines, tributos)
+
+    def extract_entities_regex(self, text):
+        """
+        Extrai empresas com o ``EntityEngine`` da configuração
+
+        Args:
+            text (str): Texto para análise
+
+        Returns:
+            list: Possíveis nomes de empresas
+        """
+        if self.config.max_text_size:
+            text = text[:self.config.max_text_size]
+        return self.config.entity_engine.extract(text)
+
+    def extract_entities_ai(self, text, deadline=None):
+        """
+        Extrai empresas com a Maritaca AI
+
+        Args:
+            text (str): Texto para análise
+            deadline (Deadline): Prazo da análise; a chamada não passa dele (opcional)
+
+        Returns:
+            list: Nomes de empresas (vazia sem chave da API, em caso de erro ou
+            se o prazo já acabou)
+        """
+        config = self.config
+        if not self._ai_enabled():
+            return []
+
+        kwargs = {}
+        remaining = deadline.remaining() if deadline is not None else None
+        if remaining is not None:
+            if remaining <= 0:
+                return []
+            kwargs['timeout'] = min(remaining, self.maritaca.timeout)
+        if config.ai_structured_output:
+            kwargs['response_format'] = {"type": "json_schema", "json_schema": AI_RESPONSE_SCHEMA}
+
+        try:
+            content = self.maritaca.complete(
+                messages=[
+                    {"role": "system", "content": AI_SYSTEM_PROMPT},
+                    {"role": "user",
+                     "content": f"Identifique todas as empresas no texto abaixo:\n\n{text[:config.ai_text_chars]}"}
+                ],
+                max_tokens=config.ai_max_tokens,
+                temperature=0.1,
+                **kwargs
+            )
+            empresas = parse_ai_response(content, config.ai_structured_output)
+        except Exception as e:
+            self.log(f"⚠️ Erro na API Maritaca: {e}")
+            return []
+
+        return empresas[:config.ai_max_results]
+
+    def _ai_enabled(self):
+        return self.maritaca is not None and self.maritaca.enabled
+
+    def combine_entities(self, entities_regex, entities_ai):
+        """Junta as empresas das duas extrações sem repetição"""
+        return list(dict.fromkeys(entities_regex + entities_ai))[:self.config.max_empresas]
+
+    def analyze(self, pdf_path, tributos_text, progress=None, on_event=None, workers=None, document_name=None,
+                deadline=None, start_page=0, start_line=1):
+        """
+        Processa a análise completa do PDF em streaming
+
+        Páginas -> linhas -> trechos, sem montar o texto completo. Cada trecho
+        é publicado em ``on_event('trecho', ...)`` assim que encontrado e as
+        empresas dele em ``on_event('empresas', ...)`` quando extraídas. Com um
+        índice configurado, as linhas de um documento novo são gravadas nele
+        durante a leitura.
+
+        O prazo é consultado entre páginas, entre linhas e antes de cada
+        extração de empresas. Se ele acabar (ou a análise for cancelada), as
+        etapas param onde estão e os trechos já encontrados são devolvidos com
+        ``truncated: True`` e um aviso.
+
+        O resultado informa em 'cobertura' a faixa de páginas lida; quando um
+        limite (páginas, texto, linhas, ocorrências ou tempo de leitura) para
+        a leitura antes do fim, 'proxima_pagina' é o ``start_page`` (1-based)
+        de uma análise seguinte que continua de onde esta parou; se a busca
+        parou no meio dessa página, 'proxima_linha' é o ``start_line``.
+
+        Args:
+            pdf_path (str | bytes): Caminho para o PDF ou o seu conteúdo (upload em memória)
+            tributos_text (str): String com tributos separados por vírgula
+            progress (callable): Recebe o retrato do progresso como argumentos
+                nomeados, no máximo a cada ``PROGRESS_INTERVAL`` segundos e ao
+                final: etapa, páginas, linhas lidas, ocorrências, empresas
+                pendentes e 'eta_s' (ver ``progress.ProgressTracker``) (opcional)
+            on_event (callable): Recebe ``(evento, dados)`` de cada trecho (opcional)
+            workers (int): Processos de extração (padrão: o da configuração)
+            document_name (str): Nome do documento no índice (padrão: nome do arquivo)
+            deadline (Deadline): Prazo e cancelamento (padrão: ``timeout`` da configuração)
+            start_page (int): Primeira página analisada (0-based); as linhas são
+                numeradas a partir dela
+            start_line (int): Linha (1-based) da primeira página a partir da
+                qual as ocorrências são buscadas
+
+        Returns:
+            dict: Resultados da análise ou {'error': ...}, com os tempos de
+            cada etapa em 'metricas' (também registrados em ``metrics.REGISTRY``)
+        """
+        tributos = self.parse_tributos(tributos_text)
+        if not tributos:
+            return {"error": "Nenhum tributo foi especificado para busca."}
+        if deadline is None:
+            deadline = Deadline(self.config.timeout)
+
+        # Tempos das etapas e contagens, registrados nas métricas mesmo se a análise falhar
+        timer = StageTimer()
+        counts = Counter()
+        stats = {}
+        page_hits = self.page_cache.hits if self.page_cache is not None else 0
+        llm_cache = self.maritaca.cache if self.maritaca is not None else None
+        llm_hits = llm_cache.hits if llm_cache is not None else 0
+
+        # O progresso é publicado em intervalos, com o tempo restante estimado
+        tracker = ProgressTracker(progress, stats) if progress else None
+
+        outcome = 'erro'
+        try:
+            result = self._analyze(pdf_path, tributos, tracker.update if tracker else None, on_event, workers,
+                                   document_name, timer, counts, stats, deadline, start_page, start_line)
+            if result.get('truncated'):
+                outcome = 'truncado'
+            else:
+                outcome = 'sucesso' if result.get('success') else 'sem_resultado'
+        finally:
+            if tracker:
+                tracker.flush()
+            if self.page_cache is not None:
+                counts['paginas'] = self.page_cache.hits - page_hits
+            if llm_cache is not None:
+                counts['maritaca_cache'] = llm_cache.hits - llm_hits
+            metricas = record_analysis(timer, outcome, stats, counts)
+            self.log("⏱️ " + ", ".join(f"{etapa}: {segundos:.2f}s" for etapa, segundos in metricas['etapas_s'].items()))
+
+        result['metricas'] = metricas
+        return result
+
+    def _analyze(self, pdf_path, tributos, progress, on_event, workers, document_name, timer, counts, stats,
+                 deadline, start_page, start_line):
+        """Corpo de ``analyze``, com os tempos e contagens em ``timer`` e ``counts``"""
+        self.log(f"🎯 Buscando {len(tributos)} tributos: {', '.join(tributos)}")
+        matcher = TributoMatcher(tributos)
+
+        # Motivos de parada: prazo, orçamento de leitura e limites
+        stops = []
+        document = {}
+
+        sha256 = file_sha256(pdf_path) if self.index is not None else None
+        documento_id = self.index.document_id(sha256) if self.index is not None else None
+        index_new = self.index is not None and start_page == 0 and documento_id is None
+
+        # O índice precisa do texto completo de todas as páginas
+        page_filter = PageFilter(matcher.terms) if self.config.prefilter_pages and not index_new else None
+
+        page_offsets = PageOffsets(first_page=start_page + 1)
+        pages = timer.iter('extracao', self.iter_pages(pdf_path, progress, workers, sha256, deadline,
+                                                       stops.append, start_page, document, page_filter))
+        lines = iter_lines(pages, stats, page_offsets, fold_text=True)
+
+        # Documento novo lido desde o início: grava as linhas no índice enquanto a busca passa por elas
+        index_writer = None
+        if index_new:
+            if not document_name:
+                # PDF em memória sem nome: identificado pelo início do hash
+                document_name = os.path.basename(pdf_path) if isinstance(pdf_path, str) else sha256[:12]
+            index_writer = self.index.writer(sha256, document_name)
+            lines = iter_indexed_lines(lines, index_writer, page_offsets)
+
+        # O prazo também é consultado linha a linha (páginas longas)
+        lines = iter_until(lines, deadline, stops.append)
+
+        try:
+            scan = {}
+            found = self._collect(lines, matcher, page_offsets, progress, on_event, timer, counts,
+                                  deadline, stops, scan, start_line)
+            # Páginas buscadas, antes de o índice ler o restante do documento
+            scan['paginas'] = stats.get('paginas', 0)
+            scan['paginas_completas'] = stats.get('paginas_completas', 0)
+            if index_writer:
+                # Os limites podem encerrar a busca antes do fim: o índice recebe o documento inteiro
+                deque(lines, maxlen=0)
+        except Exception:
+            if index_writer:
+                index_writer.discard()
+            raise
+
+        cobertura = self._coverage(start_page, scan, document.get('total_paginas', 0), stops, page_offsets)
+
+        if index_writer:
+            if start_page + stats.get('paginas_completas', 0) >= cobertura['total_paginas']:
+                index_writer.commit(stats['paginas'], page_offsets)
+                documento_id = index_writer.documento_id
+                self.log("🗂️ Documento adicionado ao índice de busca")
+            else:
+                # Documento incompleto: fica para a próxima análise
+                index_writer.discard()
+
+        if not stats.get('paginas_com_texto'):
+            if start_page and start_page >= cobertura['total_paginas']:
+                return {"error": f"A página inicial {start_page + 1} está além do fim do documento "
+                                 f"({cobertura['total_paginas']} páginas)."}
+            if cobertura['truncated']:
+                return self._truncated_error(cobertura, stats)
+            return {"error": "Não foi possível extrair texto do PDF. Verifique se o arquivo contém texto (não é apenas imagem)."}
+
+        self.log(f"✅ Texto extraído: {stats['paginas']} páginas, {stats['linhas']} linhas")
+
+        if not found:
+            if cobertura['truncated']:
+                return self._truncated_error(cobertura, stats)
+            return {"error": "Nenhum dos tributos especificados foi encontrado no PDF.",
+                    "paginas_processadas": stats['paginas'], "cobertura": cobertura}
+
+        if not self.config.stream_entities:
+            self._extract_region_entities(found, progress, on_event, timer, counts, deadline, stops)
+            # O prazo pode ter acabado durante a extração das empresas
+            cobertura = self._coverage(start_page, scan, cobertura['total_paginas'], stops, page_offsets)
+
+        # Resultados agrupados por tributo, na ordem em que foram pedidos
+        found.sort(key=lambda item: item[0]['tributo_idx'])
+        results = [result for _, result in found]
+
+        result = {"success": True, "results": results, "total_encontrados": len(results),
+                  "paginas_processadas": stats['paginas'], "cobertura": cobertura}
+        if documento_id is not None:
+            # As páginas dos trechos podem ser consultadas no índice
+            result['documento_id'] = documento_id
+        if cobertura['truncated']:
+            result['truncated'] = True
+            result['aviso'] = self._coverage_warning(cobertura)
+            self.log(f"⚠️ {result['aviso']}")
+        else:
+            self.log(f"✅ Análise concluída! {len(results)} resultados processados")
+        return result
+
+    def _coverage(self, start_page, scan, total_pages, stops, page_offsets):
+        """
+        Faixa de páginas lida por uma análise
+
+        Uma página em que a busca parou no meio (limite de linhas ou de
+        ocorrências, prazo) não conta como lida: a próxima faixa começa nela,
+        na linha seguinte à última buscada.
+
+        Args:
+            scan (dict): Páginas iniciadas e completas na busca e a última
+                linha buscada (ver ``iter_matches``)
+
+        Returns:
+            dict: 'paginas' ([primeira, última], 1-based), 'total_paginas',
+            'completa', 'proxima_pagina' (None no fim do documento),
+            'proxima_linha' (linha da próxima página onde continuar, 1 se ela
+            não foi começada), 'motivo' (chave de ``AVISOS_LIMITE`` ou None)
+            e 'truncated'
+        """
+        config = self.config
+        lidas = scan.get('paginas', 0)
+        fim = start_page + scan.get('paginas_completas', 0)
+        proxima_linha = 1
+        linha = scan.get('linha')
+        if linha and (scan.get('interrompida') or lidas > scan.get('paginas_completas', 0)):
+            # Continua na linha seguinte à última buscada
+            pagina, proxima_linha = page_offsets.locate(linha + 1)
+            fim = pagina - 1
+        completa = fim >= total_pages
+
+        interrupted = [stop for stop in stops if stop in (MOTIVO_TEMPO, MOTIVO_CANCELADO)]
+        motivo = None
+        if interrupted:
+            motivo = interrupted[0]
+        elif not completa:
+            if stops:
+                motivo = stops[0]
+            elif config.max_pdf_pages and lidas >= config.max_pdf_pages:
+                motivo = 'max_pdf_pages'
+            elif config.max_lines and scan.get('linha', 0) >= config.max_lines:
+                motivo = 'max_lines'
+            elif config.max_matches_per_tributo:
+                motivo = 'max_matches_per_tributo'
+
+        return {
+            'paginas': [start_page + 1, start_page + lidas],
+            'total_paginas': total_pages,
+            'completa': completa,
+            'proxima_pagina': None if completa else fim + 1,
+            'proxima_linha': None if completa else proxima_linha,
+            'motivo': motivo,
+            'truncated': bool(interrupted) or not completa,
+        }
+
+    @staticmethod
+    def _coverage_warning(cobertura):
+        """Aviso de uma análise parcial, com a página para continuar"""
+        motivo = AVISOS_LIMITE.get(cobertura['motivo'], "Análise parcial")
+        if cobertura['completa']:
+            return f"{motivo}: resultados parciais"
+        primeira, ultima = cobertura['paginas']
+        proxima = f"página {cobertura['proxima_pagina']}"
+        if cobertura['proxima_linha'] > 1:
+            proxima += f", linha {cobertura['proxima_linha']}"
+        return (f"{motivo}: páginas {primeira} a {ultima} de {cobertura['total_paginas']} analisadas; "
+                f"continue a partir da {proxima}")
+
+    @staticmethod
+    def _stopped(deadline, stops):
+        """Se o prazo acabou, registrando o motivo em ``stops``"""
+        reason = deadline.reason
+        if reason is not None:
+            stops.append(reason)
+        return reason is not None
+
+    def _truncated_error(self, cobertura, stats):
+        """Resultado de uma análise parcial que não encontrou nenhum trecho"""
+        if cobertura['motivo'] in (MOTIVO_TEMPO, MOTIVO_CANCELADO) and not stats.get('paginas_com_texto'):
+            error = (f"{AVISOS_LIMITE[cobertura['motivo']]} antes de encontrar os tributos. "
+                     "Tente um PDF menor ou com menos páginas.")
+        else:
+            primeira, ultima = cobertura['paginas']
+            error = f"Nenhum dos tributos especificados foi encontrado nas páginas {primeira} a {ultima}."
+        return {"error": error, "truncated": True, "aviso": self._coverage_warning(cobertura),
+                "paginas_processadas": stats.get('paginas', 0), "cobertura": cobertura}
+
+    def _collect(self, lines, matcher, page_offsets, progress, on_event, timer, counts, deadline, stops, scan,
+                 start_line):
+        """Busca os trechos publicando cada um; devolve pares (ocorrência, resultado)"""
+        config = self.config
+        found = []
+        regioes = 0
+        region_end = 0
+        region_entities = None
+
+        for trecho in self.iter_matches(lines, matcher, scan, start_line):
+            trecho_id = len(found)
+            pagina, linha_pagina = page_offsets.locate(trecho['linha_numero'])
+            result = {
+                'tributo': trecho['tributo'],
+                'linha_encontrada': trecho['linha_encontrada'],
+                'termo_encontrado': trecho['termo_encontrado'],
+                'posicao': trecho['posicao'],
+                'contexto': trecho['contexto'][:config.max_context_returned],
+                'linha_numero': trecho['linha_numero'],
+                'pagina': pagina,
+                'linha_pagina': linha_pagina,
+                'empresas_identificadas': []
+            }
+            trecho['id'] = trecho_id
+            found.append((trecho, result))
+            counts['ocorrencias'] += 1
+
+            if progress:
+                progress(ocorrencias=len(found))
+            if on_event:
+                on_event('trecho', dict(result, id=trecho_id))
+
+            if not config.stream_entities:
+                continue
+
+            # Contexto sobreposto ao da região anterior: reaproveita as empresas dela
+            context_start = trecho['linha_numero'] - config.context_lines
+            if region_entities is not None and context_start <= region_end:
+                result['empresas_identificadas'] = region_entities
+            elif ((config.max_entity_regions is None or regioes < config.max_entity_regions)
+                  and not self._stopped(deadline, stops)):
+                entities_regex = timer.time('entidades', self.extract_entities_regex, trecho['contexto'])
+                counts['regex'] += 1
+                entities_ai = []
+                if (config.ai_regions is None or regioes < config.ai_regions) and self._ai_enabled():
+                    entities_ai = timer.time('maritaca', self.extract_entities_ai, trecho['contexto'], deadline)
+                    counts['maritaca'] += 1
+                region_entities = self.combine_entities(entities_regex, entities_ai)
+                region_end = trecho['linha_numero'] + config.context_lines
+                regioes += 1
+                result['empresas_identificadas'] = region_entities
+            else:
+                continue
+
+            if on_event:
+                on_event('empresas', {'id': trecho_id, 'empresas_identificadas': region_entities})
+
+        return found
+
+    def _extract_region_entities(self, found, progress, on_event, timer, counts, deadline, stops):
+        """Extrai as empresas uma vez por região de contextos sobrepostos, até o fim do prazo"""
+        config = self.config
+        trechos = [trecho for trecho, _ in found]
+        results = {trecho['id']: result for trecho, result in found}
+        regions = list(iter_context_regions(trechos, config.context_lines, config.max_region_lines))
+        self.log(f"🧩 {len(trechos)} trechos em {len(regions)} regiões de contexto")
+        regions = regions[:config.max_entity_regions]
+        textos = [texto for texto, _ in regions]
+        if progress:
+            progress(etapa=ETAPA_EMPRESAS, empresas_total=len(regions), empresas_processadas=0,
+                     empresas_pendentes=len(regions))
+
+        # Maritaca AI: chamadas em paralelo (concorrência limitada pelo cliente)
+        entities_ai_por_regiao = [[] for _ in textos]
+        ai_textos = textos[:config.ai_regions]
+        if ai_textos and self._ai_enabled() and not self._stopped(deadline, stops):
+            self.log(f"🤖 Consultando a Maritaca AI ({len(ai_textos)} regiões, "
+                     f"{self.maritaca.max_concurrency} chamadas simultâneas)...")
+            completed = count(1)
+
+            def extract_ai(texto):
+                try:
+                    return self.extract_entities_ai(texto, deadline)
+                finally:
+                    if progress:
+                        progress(chamadas_ia_pendentes=len(ai_textos) - next(completed))
+
+            entities_ai_por_regiao[:len(ai_textos)] = timer.time('maritaca', self.maritaca.map, extract_ai, ai_textos)
+            counts['maritaca'] += len(ai_textos)
+            self.log(str(self.maritaca))
+
+        for i, ((texto, membros), entities_ai) in enumerate(zip(regions, entities_ai_por_regiao)):
+            if self._stopped(deadline, stops):
+                self.log(f"⚠️ Prazo esgotado: empresas de {len(regions) - i} regiões não extraídas")
+                break
+            self.log(f"🔍 Processando região {i+1}/{len(regions)}")
+            empresas = self.combine_entities(timer.time('entidades', self.extract_entities_regex, texto), entities_ai)
+            counts['regex'] += 1
+            for trecho in membros:
+                results[trecho['id']]['empresas_identificadas'] = empresas
+                if on_event:
+                    on_event('empresas', {'id': trecho['id'], 'empresas_identificadas': empresas})
+            if progress:
+                progress(empresas_processadas=i + 1, empresas_pendentes=len(regions) - i - 1)
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+Prazo e cancelamento cooperativo de uma análise
+
+Em vez de abandonar uma thread que continua rodando depois do timeout, a
+análise recebe um ``Deadline`` e o consulta entre páginas, entre linhas e
+antes de cada extração de empresas. Quando o prazo acaba (ou a análise é
+cancelada) as etapas param no ponto em que estão e o que já foi encontrado é
+devolvido como resultado parcial.
+"""
+
+import time
+import threading
+
+# Motivos de interrupção
+MOTIVO_TEMPO = 'tempo_esgotado'
+MOTIVO_CANCELADO = 'cancelado'
+
+
+class Deadline:
+    """Prazo opcional mais um sinal de cancelamento, compartilhável entre threads"""
+
+    def __init__(self, seconds=None, cancel_event=None):
+        """
+        Args:
+            seconds (float): Segundos a partir de agora (None = sem prazo)
+            cancel_event (threading.Event): Sinal de cancelamento compartilhado
+                (ex: o de um job); por padrão um novo
+        """
+        self.expires_at = None if seconds is None else time.monotonic() + seconds
+        self._cancelled = cancel_event or threading.Event()
+
+    def limit(self, seconds):
+        """
+        Prazo menor dentro deste, com o mesmo sinal de cancelamento
+
+        Args:
+            seconds (float): Segundos a partir de agora
+
+        Returns:
+            Deadline: O que acabar primeiro entre este prazo e ``seconds``
+        """
+        child = Deadline(seconds, self._cancelled)
+        if self.expires_at is not None:
+            child.expires_at = min(child.expires_at, self.expires_at)
+        return child
+
+    def cancel(self):
+        """Pede a interrupção da análise"""
+        self._cancelled.set()
+
+    @property
+    def reason(self):
+        """Motivo da interrupção ou None se a análise pode continuar"""
+        if self._cancelled.is_set():
+            return MOTIVO_CANCELADO
+        if self.expires_at is not None and time.monotonic() >= self.expires_at:
+            return MOTIVO_TEMPO
+        return None
+
+    def expired(self):
+        """Se o prazo acabou ou a análise foi cancelada"""
+        return self.reason is not None
+
+    def remaining(self):
+        """Segundos restantes (None sem prazo, 0 se já acabou ou foi cancelada)"""
+        if self._cancelled.is_set():
+            return 0.0
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+
+def iter_until(iterable, deadline, on_stop=None):
+    """
+    Repassa os itens enquanto houver prazo
+
+    Ao parar, a fonte é fechada (encerrando a extração em andamento) e
+    ``on_stop(motivo)`` é chamado.
+
+    Args:
+        iterable (iterable): Itens (páginas, linhas...)
+        deadline (Deadline): Prazo consultado antes de cada item (None = sem prazo)
+        on_stop (callable): Recebe o motivo da interrupção (opcional)
+
+    Yields:
+        Os mesmos itens
+    """
+    if deadline is None:
+        yield from iterable
+        return
+
+    iterator = iter(iterable)
+    try:
+        for item in iterator:
+            reason = deadline.reason
+            if reason is not None:
+                if on_stop:
+                    on_stop(reason)
+                return
+            yield item
+    finally:
+        close = getattr(iterator, 'close', None)
+        if close:
+            close()
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+Extração de empresas por regex em uma única passada
+
+CNPJ, razão social e nomes em maiúsculas são reconhecidos por uma única
+expressão regular com grupos nomeados, compilada uma vez no import. Os
+nomes são casados palavra a palavra (uma palavra nunca contém espaço), então
+cada posição do texto é examinada uma vez, sem o backtracking das classes
+``[A-Z\\s]{8,50}`` com ``re.IGNORECASE`` usadas antes.
+"""
+
+import re
+
+# Letras maiúsculas aceitas nos nomes (inclui as acentuadas do português)
+_UPPER = 'A-ZÁÀÂÃÉÊÍÓÔÕÚÜÇ'
+
+# Palavra de um nome: começa com maiúscula e não tem minúsculas, ou é um número
+# inteiro ("ALFA 2000", mas não o começo de um CNPJ). Nenhuma palavra contém
+# espaço e todas terminam fora de \w, então cada palavra só pode ser casada de
+# um jeito (sem backtracking exponencial).
+_WORD = rf'(?:[{_UPPER}][{_UPPER}0-9&.\-/]*|\d+(?![.,/\-]\d))(?!\w)'
+
+ENTITY_PATTERN = re.compile(
+    r'(?P<cnpj>(?<!\d)\d{2}\.\d{3}\.\d{3}/\d{4}-\d{2}(?!\d))'
+    rf'|(?P<nome>(?<!\w)[{_UPPER}][{_UPPER}0-9&.\-/]*(?!\w)(?:[ \t]+{_WORD})*)'
+)
+
+# Sufixos que identificam uma razão social (sem a pontuação final)
+RAZAO_SOCIAL_SUFFIXES = frozenset({
+    'LTDA', 'S/A', 'S.A', 'SA', 'EIRELI', 'EPP', 'ME', 'MICROEMPRESA',
+})
+
+# Pontuação descartada no fim das palavras
+_TRAILING = '.,;:-/'
+
+
+def _split_sentences(words):
+    """Quebra uma sequência de palavras onde há um ponto final ("ISS. DECRETO")"""
+    segment = []
+    for word in words:
+        segment.append(word)
+        stripped = word.rstrip(_TRAILING)
+        # "S.A." é abreviação; "ISS." e "LTDA." encerram a frase
+        if word.endswith('.') and '.' not in stripped:
+            yield segment
+            segment = []
+    if segment:
+        yield segment
+
+
+class EntityEngine:
+    """
+    Reconhecedor de empresas configurável por aplicação
+
+    As três aplicações usam o mesmo reconhecimento, só com limites
+    diferentes de tamanho e quantidade.
+    """
+
+    def __init__(self, include_names=True, min_name_length=6, max_name_length=50,
+                 max_razao_length=80, min_length=6, max_results=None):
+        """
+        Args:
+            include_names (bool): Inclui nomes em maiúsculas sem sufixo de empresa
+            min_name_length (int): Tamanho mínimo de um nome sem sufixo
+            max_name_length (int): Tamanho máximo de um nome sem sufixo
+            max_razao_length (int): Tamanho máximo de uma razão social (as
+                palavras iniciais que passarem do limite são descartadas)
+            min_length (int): Tamanho mínimo de qualquer entidade
+            max_results (int): Máximo de entidades devolvidas (None = sem limite)
+        """
+        self.include_names = include_names
+        self.min_name_length = min_name_length
+        self.max_name_length = max_name_length
+        self.max_razao_length = max_razao_length
+        self.min_length = min_length
+        self.max_results = max_results
+
+    def extract(self, text):
+        """
+        Extrai CNPJs, razões sociais e nomes em maiúsculas
+
+        Args:
+            text (str): Texto para análise
+
+        Returns:
+            list: Entidades sem repetição, na ordem em que aparecem
+        """
+        entities = {}
+
+        for match in ENTITY_PATTERN.finditer(text):
+            if match.group('cnpj'):
+                found = [match.group('cnpj')]
+            else:
+                found = [self._classify(words) for words in _split_sentences(match.group('nome').split())]
+
+            for entity in found:
+                if entity and len(entity) >= self.min_length:
+                    entities[entity] = None
+                    if self.max_results and len(entities) >= self.max_results:
+                        return list(entities)
+
+        return list(entities)
+
+    def _classify(self, words):
+        """Decide se uma sequência de palavras em maiúsculas é razão social, nome ou nada"""
+        words[-1] = words[-1].rstrip(_TRAILING)
+
+        # Razão social: termina em LTDA, S/A, ME...
+        if len(words) > 1 and words[-1] in RAZAO_SOCIAL_SUFFIXES:
+            if words[-1] == 'S.A':
+                words[-1] = 'S.A.'
+            # Mantém as últimas palavras que cabem no limite (ex: "DECRETO ... EMPRESA X LTDA")
+            kept = [words[-1]]
+            size = len(words[-1])
+            for word in reversed(words[:-1]):
+                size += len(word) + 1
+                if size > self.max_razao_length:
+                    break
+                kept.append(word)
+            return ' '.join(reversed(kept)) if len(kept) > 1 else None
+
+        name = ' '.join(words)
+        if self.include_names and self.min_name_length <= len(name) <= self.max_name_length:
+            return name
+
+        return None
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+Exportação dos resultados em CSV, em streaming
+
+O CSV é gerado linha a linha enquanto a resposta é enviada: cada trecho é
+escrito e repassado sem montar o arquivo inteiro em memória. Os resultados
+podem vir do corpo da requisição ou, sem reenvio pelo cliente, de um job
+concluído (versão web) ou do índice de busca (versão local).
+"""
+
+import csv
+from datetime import datetime
+
+from flask import Response
+
+# Colunas do CSV
+CSV_HEADER = ['Tributo', 'Linha Encontrada', 'Número da Linha', 'Página', 'Linha na Página',
+              'Empresas Identificadas', 'Contexto Completo']
+
+# BOM para o Excel reconhecer o UTF-8
+CSV_BOM = '\ufeff'
+
+
+class _Line:
+    """Destino do ``csv.writer`` que devolve a linha escrita em vez de guardá-la"""
+
+    def write(self, value):
+        return value
+
+
+def csv_row(result):
+    """
+    Colunas de um trecho encontrado
+
+    Args:
+        result (dict): Trecho no formato da análise
+
+    Returns:
+        list: Valores na ordem de ``CSV_HEADER``
+    """
+    return [
+        result.get('tributo', ''),
+        result.get('linha_encontrada', ''),
+        result.get('linha_numero', ''),
+        result.get('pagina', ''),
+        result.get('linha_pagina', ''),
+        '; '.join(result.get('empresas_identificadas') or []),
+        (result.get('contexto') or '').replace('\n', ' | ')
+    ]
+
+
+def iter_csv(results):
+    """
+    Gera o CSV linha a linha
+
+    Args:
+        results (iterable): Trechos no formato da análise (lidos sob demanda)
+
+    Yields:
+        str: BOM mais cabeçalho e, depois, uma linha do CSV por trecho
+    """
+    writer = csv.writer(_Line())
+    yield CSV_BOM + writer.writerow(CSV_HEADER)
+    for result in results:
+        yield writer.writerow(csv_row(result))
+
+
+def filter_results(results, tributo=None, empresa=None):
+    """
+    Aplica os mesmos filtros da tabela de resultados da interface
+
+    Args:
+        results (iterable): Trechos no formato da análise
+        tributo (str): Só os trechos deste tributo (opcional)
+        empresa (str): Texto procurado nas empresas, na linha e no contexto,
+            sem diferenciar maiúsculas (opcional)
+
+    Yields:
+        dict: Trechos que passam nos filtros
+    """
+    empresa = (empresa or '').lower()
+    for result in results:
+        if tributo and result.get('tributo') != tributo:
+            continue
+        if empresa and not (any(empresa in e.lower() for e in result.get('empresas_identificadas') or [])
+                            or empresa in (result.get('linha_encontrada') or '').lower()
+                            or empresa in (result.get('contexto') or '').lower()):
+            continue
+        yield result
+
+
+def csv_response(results):
+    """
+    Resposta de download com o CSV gerado em streaming
+
+    Args:
+        results (iterable): Trechos no formato da análise
+
+    Returns:
+        Response: CSV como anexo (UTF-8 com BOM)
+    """
+    filename = f'analise_tributos_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
+    return Response(iter_csv(results), mimetype='text/csv',
+                    headers={'Content-Disposition': f'attachment; filename={filename}'})
@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+"""
+Extração paralela de texto de PDFs
+
+O ``page.extract_text()`` do pdfplumber é limitado por CPU, então as páginas
+são divididas em faixas distribuídas por um pool de processos. Cada processo
+abre o PDF por conta própria e devolve o texto das suas páginas; os textos
+são reunidos na ordem original. Um PDF recebido em memória é gravado uma vez
+em um arquivo temporário (tmpfs quando existe), e as faixas levam só o
+caminho, em vez de cada uma levar uma cópia dos bytes para o processo.
+"""
+
+import io
+import os
+import math
+import tempfile
+import threading
+from collections import deque
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import pdfplumber
+
+from .prefilter import iter_filtered_pages
+from .uploads import UPLOAD_SPOOL_DIR
+
+# Número de processos de extração (padrão: um por núcleo)
+PDF_EXTRACTION_WORKERS = int(os.environ.get('PDF_EXTRACTION_WORKERS', os.cpu_count() or 1))
+
+# Abaixo disso o custo de abrir o PDF em outro processo não compensa
+MIN_PAGES_PER_WORKER = 4
+
+# Faixas por processo (mais de uma equilibra páginas mais pesadas que outras)
+RANGES_PER_WORKER = 4
+
+# Pools compartilhados por número de processos: jobs, requisições e lotes
+# usam os pools ao mesmo tempo, então um pool nunca é trocado enquanto outra
+# thread pode estar usando
+_executors = {}
+_executors_lock = threading.Lock()
+
+
+def _get_executor(workers):
+    """Retorna o pool de processos compartilhado com esse número de processos"""
+    with _executors_lock:
+        executor = _executors.get(workers)
+        if executor is None:
+            executor = _executors[workers] = ProcessPoolExecutor(max_workers=workers)
+        return executor
+
+
+def _discard_executor(executor):
+    """Descarta um pool quebrado (se outra thread ainda não o substituiu)"""
+    with _executors_lock:
+        for workers, current in list(_executors.items()):
+            if current is executor:
+                del _executors[workers]
+    executor.shutdown(wait=False)
+
+
+def shutdown_pool():
+    """Encerra os pools de processos de extração (se existirem)"""
+    with _executors_lock:
+        executors = list(_executors.values())
+        _executors.clear()
+    for executor in executors:
+        executor.shutdown(wait=True)
+
+
+def open_pdf(pdf_path, pages=None):
+    """
+    Abre o PDF a partir do caminho ou do conteúdo já em memória
+
+    Cada abertura lê de um ``BytesIO`` próprio (a posição de leitura não é
+    compartilhada), que usa os mesmos bytes sem copiá-los.
+
+    Args:
+        pdf_path (str | bytes): Caminho para o arquivo PDF ou o seu conteúdo
+        pages (list): Números (1-based) das páginas carregadas (padrão: todas)
+
+    Returns:
+        PDF: Documento do pdfplumber (usar como context manager)
+    """
+    if isinstance(pdf_path, bytes):
+        pdf_path = io.BytesIO(pdf_path)
+    return pdfplumber.open(pdf_path, pages=pages)
+
+
+def count_pages(pdf_path):
+    """
+    Conta as páginas do PDF
+
+    Args:
+        pdf_path (str | bytes): Caminho para o arquivo PDF ou o seu conteúdo
+
+    Returns:
+        int: Número de páginas
+    """
+    with open_pdf(pdf_path) as pdf:
+        return len(pdf.pages)
+
+
+def split_page_ranges(total_pages, workers, start_page=0):
+    """
+    Divide as páginas em faixas contíguas para os processos
+
+    Args:
+        total_pages (int): Número de páginas do documento
+        workers (int): Número de processos
+        start_page (int): Primeira página a incluir (0-based)
+
+    Returns:
+        list: Lista de tuplas (inicio, fim) com índices 0-based, fim exclusivo
+    """
+    if total_pages <= start_page:
+        return []
+
+    chunk = max(MIN_PAGES_PER_WORKER, math.ceil((total_pages - start_page) / (workers * RANGES_PER_WORKER)))
+    return [(start, min(start + chunk, total_pages)) for start in range(start_page, total_pages, chunk)]
+
+
+def iter_pages(pdf_path, workers=None, max_pages=None, total_pages=None, start_page=0, page_filter=None):
+    """
+    Gera o texto de cada página na ordem, em paralelo quando compensa
+
+    No máximo ``2 * workers`` faixas ficam em andamento ao mesmo tempo, então
+    a memória ocupada não cresce com o tamanho do documento. Um PDF em
+    memória (bytes) é gravado em um arquivo temporário antes de ir para os
+    processos, removido no fim.
+
+    Args:
+        pdf_path (str | bytes): Caminho para o arquivo PDF ou o seu conteúdo
+        workers (int): Número de processos (padrão: PDF_EXTRACTION_WORKERS)
+        max_pages (int): Limite opcional de páginas
+        total_pages (int): Número de páginas, se já conhecido
+        start_page (int): Primeira página a extrair (0-based)
+        page_filter (PageFilter): Se informado, só as páginas candidatas e
+            vizinhas passam pela extração completa (ver ``prefilter``)
+
+    Yields:
+        str: Texto de cada página ('' para páginas sem texto)
+    """
+    workers = max(1, workers or PDF_EXTRACTION_WORKERS)
+
+    if total_pages is None:
+        total_pages = count_pages(pdf_path)
+    if max_pages is not None:
+        total_pages = min(total_pages, max_pages)
+
+    if workers == 1 or total_pages - start_page < MIN_PAGES_PER_WORKER * 2:
+        yield from _iter_page_range(pdf_path, start_page, total_pages, page_filter)
+        return
+
+    ranges = iter(split_page_ranges(total_pages, workers, start_page))
+    pending = deque()
+    next_page = start_page
+    executor = None
+    spooled = None
+
+    try:
+        source = pdf_path
+        if isinstance(pdf_path, bytes):
+            with tempfile.NamedTemporaryFile(dir=UPLOAD_SPOOL_DIR, prefix='extracao_', suffix='.pdf',
+                                             delete=False) as spool:
+                spooled = spool.name
+                spool.write(pdf_path)
+            source = spooled
+
+        executor = _get_executor(workers)
+        for start, end in islice(ranges, workers * 2):
+            pending.append(executor.submit(extract_page_range, source, start, end, page_filter))
+
+        while pending:
+            texts = pending.popleft().result()
+
+            next_range = next(ranges, None)
+            if next_range is not None:
+                pending.append(executor.submit(extract_page_range, source, *next_range, page_filter))
+
+            for page_text in texts:
+                next_page += 1
+                yield page_text
+    except BrokenProcessPool:
+        # Pool quebrado (ex: processo morto pelo sistema): continua sem paralelismo
+        _discard_executor(executor)
+        yield from _iter_page_range(pdf_path, next_page, total_pages, page_filter)
+    finally:
+        for future in pending:
+            future.cancel()
+        if spooled is not None:
+            os.remove(spooled)
+
+
+def _iter_page_range(pdf_path, start, end, page_filter=None):
+    """Gera o texto das páginas de uma faixa no próprio processo"""
+    if start >= end:
+        return
+    if page_filter is not None:
+        # As vizinhas da faixa também são lidas para saber se são candidatas
+        first = max(0, start - page_filter.neighbors)
+        with open_pdf(pdf_path, pages=list(range(first + 1, end + page_filter.neighbors + 1))) as pdf:
+            yield from iter_filtered_pages(pdf.pages, first, start, end, page_filter)
+        return
+    with open_pdf(pdf_path, pages=list(range(start + 1, end + 1))) as pdf:
+        for page in pdf.pages:
+            page_text = page.extract_text() or ''
+            page.flush_cache()
+            yield page_text
+
+
+def extract_page_range(pdf_path, start, end, page_filter=None):
+    """
+    Extrai o texto de uma faixa de páginas (executado dentro do processo)
+
+    Args:
+        pdf_path (str | bytes): Caminho para o arquivo PDF ou o seu conteúdo
+        start (int): Primeira página (0-based)
+        end (int): Página final (exclusiva)
+        page_filter (PageFilter): Pré-filtro das páginas (opcional)
+
+    Returns:
+        list: Texto de cada página da faixa ('' para páginas sem texto)
+    """
+    return list(_iter_page_range(pdf_path, start, end, page_filter))
+
+
+def extract_pages(pdf_path, workers=None, max_pages=None):
+    """
+    Extrai o texto de todas as páginas, em paralelo quando compensa
+
+    Args:
+        pdf_path (str): Caminho para o arquivo PDF
+        workers (int): Número de processos (padrão: PDF_EXTRACTION_WORKERS)
+        max_pages (int): Limite opcional de páginas
+
+    Returns:
+        list: Texto de cada página, na ordem do documento
+    """
+    return list(iter_pages(pdf_path, workers=workers, max_pages=max_pages))
+
+
+def join_pages(pages):
+    """
+    Junta os textos das páginas no formato usado pela busca
+
+    Args:
+        pages (list): Texto de cada página
+
+    Returns:
+        str: Páginas com texto separadas por linha em branco
+    """
+    return ''.join(page_text + "\n\n" for page_text in pages if page_text)
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+Texto "dobrado" para buscas sem acentos e sem diferenciar maiúsculas
+
+O texto é normalizado em NFKD, perde as marcas de acentuação e passa por
+``casefold()`` (ex: 'Serviços' e 'SERVICOS' viram 'servicos'). Com isso os
+padrões de busca são compilados sem ``re.IGNORECASE`` e casam com as grafias
+sem acento ou em caixa alta comuns nos Diários Oficiais.
+
+Texto Latin-1 (quase todo o texto dos Diários) é dobrado com
+``bytes.translate`` e uma tabela de 256 posições; os demais textos passam por
+``str.translate`` com uma tabela que calcula e guarda o resultado de cada
+caractere na primeira vez em que ele aparece. Quase todo caractere vira
+exatamente um caractere; quando algum muda de tamanho (ex: 'ß' -> 'ss', ligaduras, marcas
+de acentuação soltas) é montado um mapa de posições para devolver os trechos
+encontrados em posições do texto original.
+"""
+
+import re
+import unicodedata
+from array import array
+
+
+def _fold_char(char):
+    """Dobra de um caractere: NFKD, sem marcas de acentuação, casefold"""
+    return ''.join(c for c in unicodedata.normalize('NFKD', char)
+                   if not unicodedata.combining(c)).casefold()
+
+
+class _FoldTable(dict):
+    """Tabela do ``str.translate`` preenchida sob demanda, um caractere por vez"""
+
+    def __init__(self):
+        super().__init__()
+        # Caracteres cuja dobra não tem exatamente um caractere
+        self.resizing = set()
+
+    def __missing__(self, codepoint):
+        char = chr(codepoint)
+        folded = _fold_char(char)
+        if len(folded) != 1:
+            self.resizing.add(char)
+        self[codepoint] = folded
+        return folded
+
+
+_TABLE = _FoldTable()
+
+# Tabela Latin-1 -> Latin-1; os caracteres sem dobra de um caractere Latin-1
+# (ex: 'ß', 'µ', '½') ficam como estão e mandam o texto para ``str.translate``
+_LATIN1_FOLDS = [_fold_char(chr(i)) for i in range(256)]
+_LATIN1_TABLE = bytes(ord(f) if len(f) == 1 and ord(f) < 256 else i for i, f in enumerate(_LATIN1_FOLDS))
+_LATIN1_RESIZING = re.compile(b'[' + b''.join(
+    re.escape(bytes([i])) for i, f in enumerate(_LATIN1_FOLDS) if len(f) != 1 or ord(f) >= 256) + b']')
+
+
+def fold(text):
+    """
+    Texto sem acentos e sem diferenciar maiúsculas
+
+    Args:
+        text (str): Texto original
+
+    Returns:
+        str: Texto dobrado
+    """
+    if text.isascii():
+        return text.lower()
+    try:
+        data = text.encode('latin-1').translate(_LATIN1_TABLE)
+    except UnicodeEncodeError:
+        return text.translate(_TABLE)
+    if _LATIN1_RESIZING.search(data):
+        return text.translate(_TABLE)
+    return data.decode('latin-1')
+
+
+class FoldedText:
+    """Texto dobrado com o mapa de posições de volta ao original"""
+
+    __slots__ = ('original', 'folded', '_offsets')
+
+    def __init__(self, text):
+        """
+        Args:
+            text (str): Texto original
+        """
+        self.original = text
+        self.folded = fold(text)
+        # Sem mudança de tamanho as posições são as mesmas nos dois textos
+        if len(self.folded) == len(text) and _TABLE.resizing.isdisjoint(text):
+            self._offsets = None
+        else:
+            self._offsets = array('I')
+            for i, char in enumerate(text):
+                self._offsets.extend([i] * len(_TABLE[ord(char)]))
+            self._offsets.append(len(text))
+
+    def to_original(self, start, end):
+        """
+        Converte um trecho do texto dobrado para posições do original
+
+        Args:
+            start (int): Início no texto dobrado
+            end (int): Fim (exclusivo) no texto dobrado
+
+        Returns:
+            tuple: (inicio, fim) no texto original
+        """
+        if self._offsets is None:
+            return start, end
+        if end <= start:
+            return self._offsets[start], self._offsets[start]
+        # Inclui as marcas de acentuação soltas que vêm logo depois do trecho
+        return self._offsets[start], max(self._offsets[end - 1] + 1, self._offsets[end])
@@ -0,0 +1,425 @@
+# -*- coding: utf-8 -*-
+"""
+Índice invertido persistente dos Diários já processados
+
+As linhas de cada documento analisado são gravadas em um banco SQLite com um
+índice FTS5 (tokens normalizados -> linhas). Uma consulta encontra as linhas
+candidatas pelo índice, confirma cada uma com o ``TributoMatcher`` (mesma
+semântica da busca no PDF) e monta o contexto a partir das linhas vizinhas
+guardadas, sem reabrir nem reextrair nenhum PDF.
+"""
+
+import os
+import time
+import sqlite3
+import threading
+from itertools import islice
+
+from .matcher import TributoMatcher
+from .pipeline import PageOffsets, first_spans
+
+# Padrão: ao lado das aplicações, e não na pasta de onde o processo foi iniciado
+SEARCH_INDEX_PATH = os.environ.get(
+    'SEARCH_INDEX_PATH', os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'indice.sqlite3'))
+
+# Linhas acumuladas antes de cada gravação (transações curtas e memória limitada)
+INDEX_WRITE_BATCH = 2000
+
+# Documentos não concluídos há mais que isso são de gravações interrompidas
+STALE_WRITE_SECONDS = 24 * 3600
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documentos (
+    id INTEGER PRIMARY KEY,
+    sha256 TEXT NOT NULL,
+    nome TEXT NOT NULL,
+    indexado_em REAL NOT NULL,
+    paginas INTEGER NOT NULL DEFAULT 0,
+    linhas INTEGER NOT NULL DEFAULT 0,
+    completo INTEGER NOT NULL DEFAULT 0,
+    inicio_paginas BLOB
+);
+CREATE INDEX IF NOT EXISTS documentos_sha256 ON documentos (sha256);
+
+CREATE TABLE IF NOT EXISTS linhas (
+    id INTEGER PRIMARY KEY,
+    documento_id INTEGER NOT NULL REFERENCES documentos (id) ON DELETE CASCADE,
+    linha INTEGER NOT NULL,
+    pagina INTEGER NOT NULL,
+    texto TEXT NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS linhas_documento ON linhas (documento_id, linha);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS linhas_fts USING fts5 (
+    texto, content='linhas', content_rowid='id', tokenize='unicode61'
+);
+"""
+
+
+def _fts_query(tributos):
+    """Monta a consulta FTS5 (frases unidas por OR) para os tributos"""
+    phrases = ['"' + tributo.replace('"', '""') + '"' for tributo in tributos]
+    return ' OR '.join(phrases)
+
+
+class DocumentIndex:
+    """
+    Índice FTS5 em disco das linhas dos documentos processados
+
+    O banco (e a sua pasta) só é criado no primeiro uso.
+    """
+
+    def __init__(self, path=SEARCH_INDEX_PATH):
+        """
+        Args:
+            path (str): Arquivo do banco SQLite
+
+        Raises:
+            sqlite3.OperationalError: Se o SQLite não tiver suporte a FTS5
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._created = False
+        # Confere o suporte a FTS5 em memória, sem criar o arquivo
+        conn = sqlite3.connect(':memory:')
+        try:
+            conn.execute('CREATE VIRTUAL TABLE teste USING fts5 (texto)')
+        finally:
+            conn.close()
+
+    def _create(self):
+        """Cria a pasta e as tabelas do banco (uma vez por instância)"""
+        with self._lock:
+            if self._created:
+                return
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30)
+            try:
+                conn.executescript(_SCHEMA)
+                # Índices criados antes da tabela de páginas
+                columns = {row[1] for row in conn.execute('PRAGMA table_info(documentos)')}
+                if 'inicio_paginas' not in columns:
+                    conn.execute('ALTER TABLE documentos ADD COLUMN inicio_paginas BLOB')
+            finally:
+                conn.close()
+            self._created = True
+
+    def _connect(self):
+        # Uma conexão por operação: o índice é usado por várias threads e processos
+        if not self._created:
+            self._create()
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA foreign_keys=ON')
+        return conn
+
+    def has_document(self, sha256):
+        """
+        Verifica se o documento já está indexado por completo
+
+        Args:
+            sha256 (str): SHA-256 do arquivo
+
+        Returns:
+            bool: True se o documento já está no índice
+        """
+        return self.document_id(sha256) is not None
+
+    def document_id(self, sha256):
+        """
+        Id do documento indexado por completo com este conteúdo
+
+        Args:
+            sha256 (str): SHA-256 do arquivo
+
+        Returns:
+            int: Id do documento ou None se ele não está no índice
+        """
+        conn = self._connect()
+        try:
+            row = conn.execute('SELECT id FROM documentos WHERE sha256 = ? AND completo = 1 ORDER BY id DESC',
+                               (sha256,)).fetchone()
+        finally:
+            conn.close()
+        return row[0] if row else None
+
+    def writer(self, sha256, nome):
+        """
+        Cria um gravador incremental para um documento
+
+        Args:
+            sha256 (str): SHA-256 do arquivo
+            nome (str): Nome do arquivo exibido nos resultados
+
+        Returns:
+            IndexWriter: Gravador (chamar ``commit`` ou ``discard``)
+        """
+        return IndexWriter(self, sha256, nome)
+
+    def documents(self):
+        """
+        Lista os documentos indexados, do mais recente para o mais antigo
+
+        Returns:
+            list: Dicionários com 'id', 'nome', 'indexado_em', 'paginas' e 'linhas'
+        """
+        conn = self._connect()
+        try:
+            rows = conn.execute('SELECT id, nome, indexado_em, paginas, linhas FROM documentos '
+                                'WHERE completo = 1 ORDER BY id DESC').fetchall()
+        finally:
+            conn.close()
+        return [dict(zip(('id', 'nome', 'indexado_em', 'paginas', 'linhas'), row)) for row in rows]
+
+    def search(self, tributos, ultimos=None, context_before=5, context_after=5, limit=100, documento_id=None):
+        """
+        Busca os tributos nos documentos indexados
+
+        Args:
+            tributos (list): Lista de tributos para buscar
+            ultimos (int): Considera só os N documentos indexados mais recentes
+            context_before (int): Linhas de contexto antes da ocorrência
+            context_after (int): Linhas de contexto depois da ocorrência
+            limit (int): Máximo de ocorrências devolvidas (None = todas)
+            documento_id (int): Busca só neste documento (opcional)
+
+        Returns:
+            list: Ocorrências no formato da busca no PDF (ver ``iter_search``)
+        """
+        return list(islice(self.iter_search(tributos, ultimos, context_before, context_after, documento_id), limit))
+
+    def iter_search(self, tributos, ultimos=None, context_before=5, context_after=5, documento_id=None):
+        """
+        Gera as ocorrências dos tributos nos documentos indexados, sob demanda
+
+        Cada tributo é uma consulta ao FTS, lida do cursor à medida que as
+        ocorrências são consumidas: nada é acumulado em memória (ex: a
+        exportação em CSV de um documento inteiro).
+
+        Args:
+            tributos (list): Lista de tributos para buscar
+            ultimos (int): Considera só os N documentos indexados mais recentes
+            context_before (int): Linhas de contexto antes da ocorrência
+            context_after (int): Linhas de contexto depois da ocorrência
+            documento_id (int): Busca só neste documento (opcional)
+
+        Yields:
+            dict: Ocorrência no formato da busca no PDF, com 'arquivo',
+            'documento_id', 'pagina' e 'linha_pagina', agrupadas por tributo
+            e do documento mais recente para o mais antigo
+        """
+        matcher = TributoMatcher(tributos)
+        if not matcher.tributos:
+            return
+
+        documentos = 'SELECT id FROM documentos WHERE completo = 1 ORDER BY id DESC'
+        filtro = []
+        if documento_id is not None:
+            documentos = 'SELECT id FROM documentos WHERE completo = 1 AND id = ?'
+            filtro.append(int(documento_id))
+        elif ultimos:
+            documentos += ' LIMIT ?'
+            filtro.append(int(ultimos))
+
+        conn = self._connect()
+        try:
+            page_offsets = {}
+            for tributo in matcher.tributos:
+                # Um matcher por tributo: os sinônimos dele entram na consulta ao FTS
+                tributo_matcher = TributoMatcher([tributo])
+                candidates = conn.execute(
+                    'SELECT l.documento_id, d.nome, l.linha, l.pagina, l.texto '
+                    'FROM linhas_fts JOIN linhas l ON l.id = linhas_fts.rowid '
+                    'JOIN documentos d ON d.id = l.documento_id '
+                    f'WHERE linhas_fts MATCH ? AND l.documento_id IN ({documentos}) '
+                    'ORDER BY l.documento_id DESC, l.linha',
+                    [_fts_query(tributo_matcher.terms)] + filtro
+                )
+
+                # O FTS encontra candidatos; o matcher confirma com word boundaries
+                for doc_id, nome, linha, pagina, texto in candidates:
+                    spans = first_spans(tributo_matcher, texto)
+                    if not spans:
+                        continue
+                    inicio, fim = spans[0]
+                    if doc_id not in page_offsets:
+                        row = conn.execute('SELECT inicio_paginas FROM documentos WHERE id = ?', (doc_id,)).fetchone()
+                        page_offsets[doc_id] = PageOffsets(data=row[0]) if row and row[0] else None
+                    offsets = page_offsets[doc_id]
+                    contexto = conn.execute(
+                        'SELECT texto FROM linhas WHERE documento_id = ? AND linha BETWEEN ? AND ? ORDER BY linha',
+                        (doc_id, linha - context_before, linha + context_after)
+                    )
+                    yield {
+                        'tributo': tributo,
+                        'linha_encontrada': texto.strip(),
+                        'termo_encontrado': texto.strip()[inicio:fim],
+                        'posicao': [inicio, fim],
+                        'contexto': '\n'.join(row[0] for row in contexto),
+                        'linha_numero': linha,
+                        'pagina': pagina,
+                        # Documentos indexados antes da tabela de páginas não têm a posição na página
+                        'linha_pagina': offsets.locate(linha)[1] if offsets else None,
+                        'arquivo': nome,
+                        'documento_id': doc_id,
+                    }
+        finally:
+            conn.close()
+
+    def page(self, documento_id, pagina):
+        """
+        Texto de uma página de um documento indexado, sem reler o PDF
+
+        Args:
+            documento_id (int): Documento no índice
+            pagina (int): Número da página (1-based)
+
+        Returns:
+            dict: 'arquivo', 'pagina', 'total_paginas', 'primeira_linha'
+            (número global da primeira linha) e 'linhas' (texto de cada
+            linha), ou None se o documento ou a página não existem
+        """
+        conn = self._connect()
+        try:
+            row = conn.execute('SELECT nome, paginas, linhas, inicio_paginas FROM documentos '
+                               'WHERE id = ? AND completo = 1', (int(documento_id),)).fetchone()
+            if row is None or not 1 <= pagina <= row[1]:
+                return None
+            nome, paginas, linhas, inicio_paginas = row
+
+            faixa = PageOffsets(data=inicio_paginas).page_lines(pagina) if inicio_paginas else None
+            if faixa:
+                primeira, ultima = faixa
+                rows = conn.execute(
+                    'SELECT linha, texto FROM linhas WHERE documento_id = ? AND linha BETWEEN ? AND ? ORDER BY linha',
+                    (documento_id, primeira, ultima if ultima is not None else linhas)
+                ).fetchall()
+            else:
+                rows = conn.execute(
+                    'SELECT linha, texto FROM linhas WHERE documento_id = ? AND pagina = ? ORDER BY linha',
+                    (documento_id, pagina)
+                ).fetchall()
+        finally:
+            conn.close()
+
+        # Sem a linha em branco que separa as páginas
+        while rows and not rows[-1][1]:
+            rows.pop()
+        return {'arquivo': nome, 'pagina': pagina, 'total_paginas': paginas,
+                'primeira_linha': rows[0][0] if rows else None, 'linhas': [texto for _, texto in rows]}
+
+
+class IndexWriter:
+    """
+    Grava as linhas de um documento no índice à medida que são lidas
+
+    As linhas vão para o banco em lotes; o documento só aparece nas consultas
+    depois do ``commit``. Um ``discard`` (ou uma falha no meio) apaga o que já
+    tinha sido gravado.
+    """
+
+    def __init__(self, index, sha256, nome):
+        self.index = index
+        self.lines = 0
+        self._pending = []
+        self._conn = index._connect()
+        with self._conn:
+            cursor = self._conn.execute(
+                'INSERT INTO documentos (sha256, nome, indexado_em) VALUES (?, ?, ?)',
+                (sha256, nome, time.time())
+            )
+        self.documento_id = cursor.lastrowid
+        self.sha256 = sha256
+
+    def add(self, line_no, page, text):
+        """
+        Acrescenta uma linha do documento
+
+        Args:
+            line_no (int): Número global da linha (numeração de ``iter_lines``)
+            page (int): Número da página (1-based)
+            text (str): Texto da linha
+        """
+        self._pending.append((self.documento_id, line_no, page, text))
+        self.lines = line_no
+        if len(self._pending) >= INDEX_WRITE_BATCH:
+            self._flush()
+
+    def _flush(self):
+        if not self._pending:
+            return
+        first_line = self._pending[0][1]
+        with self._conn:
+            self._conn.executemany(
+                'INSERT INTO linhas (documento_id, linha, pagina, texto) VALUES (?, ?, ?, ?)',
+                self._pending
+            )
+            # Linhas em branco ficam só na tabela (servem de contexto), fora do FTS
+            self._conn.execute(
+                'INSERT INTO linhas_fts (rowid, texto) SELECT id, texto FROM linhas '
+                "WHERE documento_id = ? AND linha >= ? AND texto != ''",
+                (self.documento_id, first_line)
+            )
+        self._pending = []
+
+    def commit(self, pages, page_offsets=None):
+        """
+        Publica o documento no índice
+
+        Args:
+            pages (int): Número de páginas lidas
+            page_offsets (PageOffsets): Primeira linha de cada página (opcional)
+        """
+        try:
+            self._flush()
+            with self._conn:
+                # Versões anteriores do mesmo arquivo saem do índice, assim
+                # como gravações interrompidas há mais de um dia
+                self._remove_documents('sha256 = ? AND id != ?', (self.sha256, self.documento_id))
+                self._remove_documents('completo = 0 AND indexado_em < ?', (time.time() - STALE_WRITE_SECONDS,))
+                self._conn.execute(
+                    'UPDATE documentos SET paginas = ?, linhas = ?, inicio_paginas = ?, completo = 1 WHERE id = ?',
+                    (pages, self.lines, page_offsets.tobytes() if page_offsets is not None else None,
+                     self.documento_id)
+                )
+        finally:
+            self._conn.close()
+
+    def discard(self):
+        """Descarta o que foi gravado"""
+        try:
+            with self._conn:
+                self._remove_documents('id = ?', (self.documento_id,))
+        finally:
+            self._conn.close()
+
+    def _remove_documents(self, where, params):
+        ids = [row[0] for row in self._conn.execute(f'SELECT id FROM documentos WHERE {where}', params)]
+        for documento_id in ids:
+            # Conteúdo externo: o FTS precisa receber o texto antigo para apagar os tokens
+            self._conn.execute(
+                "INSERT INTO linhas_fts (linhas_fts, rowid, texto) SELECT 'delete', id, texto "
+                "FROM linhas WHERE documento_id = ? AND texto != ''", (documento_id,)
+            )
+            self._conn.execute('DELETE FROM linhas WHERE documento_id = ?', (documento_id,))
+            self._conn.execute('DELETE FROM documentos WHERE id = ?', (documento_id,))
+
+
+def iter_indexed_lines(lines, writer, page_offsets):
+    """
+    Repassa as linhas do pipeline gravando cada uma no índice
+
+    Args:
+        lines (iterable): Tuplas (numero_linha, linha, ...) de ``iter_lines``
+        writer (IndexWriter): Gravador do documento
+        page_offsets (PageOffsets): Tabela preenchida por ``iter_lines`` com o início de cada página
+
+    Yields:
+        tuple: As mesmas tuplas
+    """
+    for item in lines:
+        # A página da linha atual é a última que começou
+        writer.add(item[0], max(1, len(page_offsets)), item[1])
+        yield item
@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""
+Fila local de jobs de análise
+
+As análises rodam em threads de trabalho do próprio processo, fora do ciclo
+da requisição: a rota só enfileira o job e devolve o id, e o cliente consulta
+o progresso e o resultado depois. Cada job também guarda um log de eventos
+(ex: cada trecho encontrado) que pode ser acompanhado enquanto a análise roda,
+e um sinal de cancelamento que a análise consulta entre páginas e linhas.
+"""
+
+import os
+import time
+import uuid
+import queue
+import threading
+
+# Estados de um job
+STATUS_NA_FILA = 'na_fila'
+STATUS_PROCESSANDO = 'processando'
+STATUS_CONCLUIDO = 'concluido'
+STATUS_ERRO = 'erro'
+
+
+class QueueFullError(Exception):
+    """A fila já tem o número máximo de jobs aguardando"""
+    pass
+
+
+class Job:
+    """Um job de análise com progresso e resultado"""
+
+    def __init__(self, args):
+        self.id = uuid.uuid4().hex
+        self.args = args
+        self.status = STATUS_NA_FILA
+        self.progress = {}
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self.events = []
+        self.cancelled = threading.Event()
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+
+    def update(self, **progress):
+        """Atualiza os contadores de progresso (chamado pela thread de trabalho)"""
+        with self._lock:
+            self.progress.update(progress)
+            self._changed.notify_all()
+
+    def emit(self, event, data):
+        """
+        Acrescenta um evento ao log do job (chamado pela thread de trabalho)
+
+        Args:
+            event (str): Nome do evento
+            data (dict): Dados do evento (serializáveis em JSON)
+        """
+        with self._lock:
+            self.events.append((event, data))
+            self._changed.notify_all()
+
+    def cancel(self):
+        """Pede a interrupção do job (um job na fila termina assim que começar)"""
+        self.cancelled.set()
+        with self._lock:
+            self._changed.notify_all()
+
+    def set_status(self, status):
+        """Muda o estado do job e acorda quem acompanha os eventos"""
+        with self._lock:
+            if status in (STATUS_CONCLUIDO, STATUS_ERRO):
+                self.finished_at = time.time()
+            self.status = status
+            self._changed.notify_all()
+
+    def wait_events(self, start, timeout):
+        """
+        Aguarda eventos a partir de uma posição do log
+
+        Retorna antes do ``timeout`` se chegar um evento, o progresso mudar
+        ou o job terminar.
+
+        Args:
+            start (int): Posição do primeiro evento ainda não recebido
+            timeout (float): Segundos máximos de espera
+
+        Returns:
+            tuple: (eventos_novos, job_terminado)
+        """
+        with self._lock:
+            if len(self.events) <= start and not self.done:
+                self._changed.wait(timeout)
+            return self.events[start:], self.done
+
+    @property
+    def done(self):
+        return self.status in (STATUS_CONCLUIDO, STATUS_ERRO)
+
+    def to_dict(self):
+        """Estado do job para a API (sem o resultado)"""
+        with self._lock:
+            data = {
+                'job_id': self.id,
+                'status': self.status,
+                'progresso': dict(self.progress),
+                'criado_em': self.created_at,
+            }
+        if self.cancelled.is_set():
+            data['cancelado'] = True
+        if self.finished_at is not None:
+            data['duracao'] = round(self.finished_at - self.created_at, 3)
+        if self.error:
+            data['erro'] = self.error
+        return data
+
+
+class JobQueue:
+    """
+    Fila de jobs atendida por threads de trabalho locais
+
+    As threads só são criadas no primeiro ``submit`` (e recriadas se o
+    processo mudou), porque com ``preload_app`` o gunicorn importa a
+    aplicação antes do fork e threads criadas no import não sobrevivem a ele.
+    """
+
+    def __init__(self, handler, workers=1, max_pending=20, result_ttl=3600):
+        """
+        Args:
+            handler (callable): Função ``handler(job, *args)`` que devolve o resultado
+            workers (int): Número de threads de trabalho
+            max_pending (int): Máximo de jobs aguardando na fila
+            result_ttl (int): Segundos que um job concluído fica disponível
+        """
+        self.handler = handler
+        self.workers = workers
+        self.max_pending = max_pending
+        self.result_ttl = result_ttl
+        self._jobs = {}
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def submit(self, *args):
+        """
+        Enfileira um job
+
+        Returns:
+            Job: Job criado
+
+        Raises:
+            QueueFullError: Se a fila estiver cheia
+        """
+        self._ensure_workers()
+        self._cleanup()
+
+        if self._queue.qsize() >= self.max_pending:
+            raise QueueFullError("Fila de análises cheia")
+
+        job = Job(args)
+        with self._lock:
+            self._jobs[job.id] = job
+        self._queue.put(job)
+        return job
+
+    def get(self, job_id):
+        """Retorna o job pelo id (ou None)"""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _ensure_workers(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._queue = queue.Queue()
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f'analise-job-{i}')
+                thread.daemon = True
+                thread.start()
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            job.set_status(STATUS_PROCESSANDO)
+            try:
+                job.result = self.handler(job, *job.args)
+                job.set_status(STATUS_CONCLUIDO)
+            except Exception as e:
+                print(f"Erro no job {job.id}: {e}")
+                job.error = str(e)
+                job.set_status(STATUS_ERRO)
+            finally:
+                job.args = None
+                self._queue.task_done()
+
+    def _cleanup(self):
+        """Remove jobs concluídos há mais de ``result_ttl`` segundos"""
+        limit = time.time() - self.result_ttl
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items()
+                       if job.finished_at is not None and job.finished_at < limit]
+            for job_id in expired:
+                del self._jobs[job_id]
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+"""
+Cache persistente das respostas da API Maritaca
+
+Os mesmos parágrafos (cabeçalhos, textos padrão) aparecem em muitos trechos
+e em várias edições do Diário. A resposta de cada chamada é guardada em um
+banco SQLite com a chave formada pelo hash do modelo, dos parâmetros e das
+mensagens com os espaços normalizados. As entradas expiram após um TTL e o
+número de entradas é limitado: as usadas há mais tempo saem primeiro.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+# Padrão: dentro da pasta 'cache' ao lado das aplicações
+LLM_CACHE_PATH = os.environ.get(
+    'LLM_CACHE_PATH',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'cache', 'maritaca.sqlite3'))
+LLM_CACHE_TTL_DAYS = float(os.environ.get('LLM_CACHE_TTL_DAYS', 30))
+LLM_CACHE_MAX_ENTRIES = int(os.environ.get('LLM_CACHE_MAX_ENTRIES', 20000))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS respostas (
+    chave TEXT PRIMARY KEY,
+    resposta TEXT NOT NULL,
+    criado_em REAL NOT NULL,
+    usado_em REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS respostas_usado_em ON respostas (usado_em);
+"""
+
+
+def normalize_whitespace(text):
+    """Colapsa qualquer sequência de espaços, tabs e quebras de linha em um espaço"""
+    return ' '.join(text.split())
+
+
+def make_key(model, messages, **params):
+    """
+    Monta a chave do cache de uma chamada
+
+    Args:
+        model (str): Modelo usado
+        messages (list): Mensagens da chamada (prompt e contexto)
+        **params: Demais parâmetros que alteram a resposta (max_tokens etc.)
+
+    Returns:
+        str: SHA-256 em hexadecimal
+    """
+    normalized = [{'role': m['role'], 'content': normalize_whitespace(m['content'])} for m in messages]
+    payload = json.dumps([model, normalized, params], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class LLMCache:
+    """
+    Cache em disco das respostas, com TTL e limite de entradas
+
+    O banco (e a sua pasta) só é criado na primeira consulta.
+    """
+
+    def __init__(self, path=LLM_CACHE_PATH, ttl=LLM_CACHE_TTL_DAYS * 86400, max_entries=LLM_CACHE_MAX_ENTRIES):
+        """
+        Args:
+            path (str): Arquivo do banco SQLite
+            ttl (float): Segundos até uma resposta expirar
+            max_entries (int): Máximo de respostas guardadas
+        """
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._created = False
+
+    def _connect(self):
+        # Uma conexão por operação: o cache é usado por várias threads e processos
+        if not self._created:
+            self._create()
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute('PRAGMA journal_mode=WAL')
+        return conn
+
+    def _create(self):
+        """Cria a pasta e as tabelas do banco (uma vez por instância)"""
+        with self._lock:
+            if self._created:
+                return
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30)
+            try:
+                conn.executescript(_SCHEMA)
+            finally:
+                conn.close()
+            self._created = True
+
+    def get(self, key):
+        """
+        Busca uma resposta guardada
+
+        Args:
+            key (str): Chave de ``make_key``
+
+        Returns:
+            str: Resposta ou None se não existir ou tiver expirado
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            with conn:
+                row = conn.execute('SELECT resposta FROM respostas WHERE chave = ? AND criado_em >= ?',
+                                   (key, now - self.ttl)).fetchone()
+                if row is not None:
+                    # Marca como usada recentemente (LRU)
+                    conn.execute('UPDATE respostas SET usado_em = ? WHERE chave = ?', (now, key))
+        finally:
+            conn.close()
+
+        with self._lock:
+            if row is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return None if row is None else row[0]
+
+    def set(self, key, response):
+        """
+        Guarda uma resposta e aplica o TTL e o limite de entradas
+
+        Args:
+            key (str): Chave de ``make_key``
+            response (str): Conteúdo da resposta
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute('INSERT OR REPLACE INTO respostas (chave, resposta, criado_em, usado_em) '
+                             'VALUES (?, ?, ?, ?)', (key, response, now, now))
+                conn.execute('DELETE FROM respostas WHERE criado_em < ?', (now - self.ttl,))
+                conn.execute('DELETE FROM respostas WHERE chave IN (SELECT chave FROM respostas '
+                             'ORDER BY usado_em DESC, rowid DESC LIMIT -1 OFFSET ?)', (self.max_entries,))
+        finally:
+            conn.close()
+
+    def to_dict(self):
+        """Acertos, faltas e taxa de acerto desde o início do processo"""
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        return {
+            'acertos': hits,
+            'faltas': misses,
+            'taxa_acerto': round(hits / total, 3) if total else 0.0,
+        }
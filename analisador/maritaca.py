@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+"""
+Cliente compartilhado da API Maritaca AI
+
+Um único cliente OpenAI com pool de conexões HTTP (keep-alive) é criado por
+processo e reaproveitado em todas as chamadas, evitando uma nova conexão e
+um novo handshake TLS por trecho. As chamadas de vários trechos podem rodar
+em paralelo num pool de threads de tamanho limitado, e a latência e as
+falhas de cada chamada são contabilizadas. Opcionalmente as respostas são
+memorizadas em um ``LLMCache`` consultado antes de cada chamada.
+"""
+
+import os
+import time
+import sqlite3
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from .llm_cache import make_key
+
+MARITACA_BASE_URL = os.environ.get('MARITACA_BASE_URL', 'https://chat.maritaca.ai/api')
+MARITACA_MODEL = 'sabiazinho-3'
+
+# Chamadas simultâneas à API (também é o tamanho do pool de conexões)
+MARITACA_MAX_CONCURRENCY = int(os.environ.get('MARITACA_MAX_CONCURRENCY', 4))
+
+# Latências guardadas para as estatísticas (janela das últimas chamadas)
+LATENCY_WINDOW = 200
+
+
+class MaritacaStats:
+    """Contadores de chamadas, falhas e latência"""
+
+    def __init__(self):
+        self.chamadas = 0
+        self.falhas = 0
+        self.ultima_falha = None
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self._lock = threading.Lock()
+
+    def record(self, seconds, error=None):
+        """Registra uma chamada concluída (com ou sem erro)"""
+        with self._lock:
+            self.chamadas += 1
+            self._latencies.append(seconds)
+            if error is not None:
+                self.falhas += 1
+                self.ultima_falha = str(error)
+
+    def to_dict(self):
+        """Estatísticas em milissegundos"""
+        with self._lock:
+            latencies = sorted(self._latencies)
+            data = {'chamadas': self.chamadas, 'falhas': self.falhas}
+            if self.ultima_falha:
+                data['ultima_falha'] = self.ultima_falha
+        if latencies:
+            data['latencia_media_ms'] = round(sum(latencies) / len(latencies) * 1000, 1)
+            data['latencia_p95_ms'] = round(latencies[int(0.95 * (len(latencies) - 1))] * 1000, 1)
+        return data
+
+    def __str__(self):
+        data = self.to_dict()
+        media = data.get('latencia_media_ms', 0)
+        return f"🤖 Maritaca: {data['chamadas']} chamadas, {data['falhas']} falhas, {media:.0f} ms em média"
+
+
+class MaritacaClient:
+    """
+    Cliente de longa duração da API Maritaca (compatível com OpenAI)
+
+    O cliente HTTP e o pool de threads só são criados na primeira chamada (e
+    recriados se o processo mudou), porque com ``preload_app`` o gunicorn
+    importa a aplicação antes do fork.
+    """
+
+    def __init__(self, api_key, base_url=MARITACA_BASE_URL, model=MARITACA_MODEL,
+                 timeout=30, max_concurrency=MARITACA_MAX_CONCURRENCY, cache=None):
+        """
+        Args:
+            api_key (str): Chave da API
+            base_url (str): URL base da API (um servidor local nos testes)
+            model (str): Modelo usado nas chamadas
+            timeout (float): Timeout em segundos de cada chamada
+            max_concurrency (int): Máximo de chamadas simultâneas
+            cache (LLMCache): Cache das respostas (None desativa)
+        """
+        self.api_key = api_key
+        self.cache = cache
+        self.base_url = base_url
+        self.model = model
+        self.timeout = timeout
+        self.max_concurrency = max(1, max_concurrency)
+        self.stats = MaritacaStats()
+        self._client = None
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        """Se há uma chave de API configurada"""
+        return bool(self.api_key) and self.api_key != 'sua_chave_aqui'
+
+    def _ensure_client(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                import httpx
+                from openai import OpenAI
+
+                self._pid = os.getpid()
+                # http_client próprio: conexões persistentes limitadas à concorrência
+                http_client = httpx.Client(
+                    timeout=self.timeout,
+                    limits=httpx.Limits(max_connections=self.max_concurrency,
+                                        max_keepalive_connections=self.max_concurrency)
+                )
+                self._client = OpenAI(api_key=self.api_key, base_url=self.base_url,
+                                      http_client=http_client, max_retries=0)
+                self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency,
+                                                    thread_name_prefix='maritaca')
+            return self._client
+
+    def complete(self, messages, max_tokens, temperature=0.1, response_format=None, timeout=None):
+        """
+        Faz uma chamada de chat completion
+
+        Args:
+            messages (list): Mensagens no formato da API
+            max_tokens (int): Máximo de tokens da resposta
+            temperature (float): Temperatura
+            response_format (dict): Formato de saída estruturada (opcional)
+            timeout (float): Timeout desta chamada (padrão: o do cliente)
+
+        Returns:
+            str: Conteúdo da resposta ('' se vazia)
+
+        Raises:
+            Exception: Erros da API (já contabilizados nas estatísticas)
+        """
+        kwargs = {}
+        if response_format is not None:
+            kwargs['response_format'] = response_format
+
+        # Mesmo contexto (a menos de espaços), modelo e prompt: resposta memorizada
+        key = None
+        if self.cache is not None:
+            key = make_key(self.model, messages, max_tokens=max_tokens, temperature=temperature, **kwargs)
+            try:
+                cached = self.cache.get(key)
+            except sqlite3.Error as e:
+                print(f"⚠️ Cache da Maritaca indisponível: {e}")
+                cached = key = None
+            if cached is not None:
+                return cached
+
+        client = self._ensure_client()
+        started = time.perf_counter()
+        try:
+            response = client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                timeout=timeout if timeout is not None else self.timeout,
+                **kwargs
+            )
+        except Exception as e:
+            self.stats.record(time.perf_counter() - started, e)
+            raise
+
+        self.stats.record(time.perf_counter() - started)
+        content = response.choices[0].message.content or ''
+
+        if key is not None:
+            try:
+                self.cache.set(key, content)
+            except sqlite3.Error as e:
+                print(f"⚠️ Cache da Maritaca indisponível: {e}")
+        return content
+
+    def to_dict(self):
+        """Estatísticas das chamadas e do cache de respostas"""
+        data = self.stats.to_dict()
+        if self.cache is not None:
+            data['cache'] = self.cache.to_dict()
+        return data
+
+    def __str__(self):
+        text = str(self.stats)
+        if self.cache is not None:
+            cache = self.cache.to_dict()
+            text += f" | cache: {cache['acertos']} acertos ({cache['taxa_acerto']:.0%})"
+        return text
+
+    def map(self, func, items):
+        """
+        Executa ``func(item)`` para cada item no pool de threads do cliente
+
+        Args:
+            func (callable): Função que faz a chamada (ex: extração de um trecho)
+            items (iterable): Argumentos de cada chamada
+
+        Returns:
+            list: Resultados na ordem dos itens
+        """
+        self._ensure_client()
+        return list(self._executor.map(func, items))
+
+    def close(self):
+        """Encerra o pool de threads e as conexões"""
+        with self._lock:
+            if self._executor is not None and self._pid == os.getpid():
+                self._executor.shutdown(wait=True)
+                self._client.close()
+            self._client = None
+            self._executor = None
+            self._pid = None
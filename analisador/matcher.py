@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+Busca de vários tributos em uma única passada pelo texto
+
+Em vez de reprocessar cada linha uma vez por tributo, todos os tributos são
+combinados em uma única expressão regular compilada uma vez por análise.
+
+A busca roda sobre o texto dobrado (sem acentos e em minúsculas, ver
+``folding``), então os padrões dispensam ``re.IGNORECASE`` e "Serviços"
+também casa com "SERVICOS". Espaços no nome do tributo casam com qualquer
+sequência de espaços, o que permite buscar nomes completos quebrados por
+espaçamento irregular no texto extraído.
+
+Os termos digitados são agrupados pelo dicionário de sinônimos (ver
+``synonyms``): cada tributo casa com qualquer um dos seus nomes e é reportado
+pelo nome canônico.
+"""
+
+import re
+
+from .folding import FoldedText, fold
+from .synonyms import SYNONYMS
+
+
+def _tributo_pattern(tributo):
+    """Padrão do tributo dobrado, com espaços flexíveis (sem atravessar linhas)"""
+    return r'[^\S\n]+'.join(re.escape(word) for word in fold(tributo).split())
+
+
+class TributoMatcher:
+    """
+    Casa uma lista de tributos com word boundaries em uma única passada
+
+    A expressão combinada usa um lookahead de largura zero, então tributos
+    sobrepostos (ex: "ISS" e "ISS RETIDO") são todos reportados. Cada posição
+    candidata é confirmada com o padrão individual do tributo, com a semântica
+    de ``re.search(r'\\bTRIBUTO\\b', linha)`` sobre o texto dobrado. Os
+    sinônimos de um tributo são alternativas no mesmo padrão, então o número
+    de passadas não depende de quantos nomes são buscados.
+    """
+
+    def __init__(self, tributos, synonyms=SYNONYMS):
+        """
+        Args:
+            tributos (list): Lista de tributos para buscar (qualquer grafia ou sinônimo)
+            synonyms (SynonymDictionary): Dicionário de sinônimos (None para
+                buscar cada termo isoladamente)
+        """
+        if synonyms is None:
+            self.tributos = [t.strip() for t in tributos if t and t.strip()]
+            groups = [[tributo] for tributo in self.tributos]
+        else:
+            self.tributos = synonyms.group(tributos)
+            groups = [synonyms.aliases(tributo) for tributo in self.tributos]
+        # Todos os nomes buscados (ex: para a consulta ao índice e o pré-filtro)
+        self.terms = [term for group in groups for term in group]
+
+        # Alternativas mais longas primeiro para o lookahead preferir o maior casamento
+        self._patterns = []
+        for group in groups:
+            patterns = sorted({_tributo_pattern(term) for term in group}, key=len, reverse=True)
+            self._patterns.append(re.compile(r'\b(?:' + '|'.join(patterns) + r')\b'))
+
+        alternativas = sorted({_tributo_pattern(term) for term in self.terms}, key=len, reverse=True)
+        if alternativas:
+            self._combined = re.compile(r'\b(?=(?:' + '|'.join(alternativas) + r')\b)')
+        else:
+            self._combined = None
+
+    def match_line(self, line):
+        """
+        Retorna os índices dos tributos encontrados em uma linha
+
+        Args:
+            line (str): Linha de texto
+
+        Returns:
+            list: Índices (em ``self.tributos``) dos tributos presentes na linha
+        """
+        return self.match_folded(fold(line))
+
+    def match_folded(self, folded):
+        """
+        Como ``match_line``, para uma linha já dobrada (ex: por ``iter_lines``
+        com ``fold_text``, que dobra cada página de uma vez)
+
+        Args:
+            folded (str): Linha dobrada
+
+        Returns:
+            list: Índices (em ``self.tributos``) dos tributos presentes na linha
+        """
+        # Caminho rápido: a maioria das linhas não menciona nenhum tributo
+        if self._combined is None or not self._combined.search(folded):
+            return []
+        return [tributo_idx for _, tributo_idx in self._iter_folded_hits(folded)]
+
+    def iter_spans(self, line):
+        """
+        Posições de cada tributo encontrado em uma linha
+
+        Args:
+            line (str): Linha de texto
+
+        Yields:
+            tuple: (indice_tributo, inicio, fim) com as posições no texto
+            original (não no dobrado), em ordem de posição
+        """
+        if self._combined is None:
+            return
+        text = FoldedText(line)
+        # Fim do último trecho de cada tributo (ex: 'PASEP' dentro de 'PIS/PASEP')
+        last_end = [0] * len(self._patterns)
+        for match in self._combined.finditer(text.folded):
+            for tributo_idx, pattern in enumerate(self._patterns):
+                if match.start() < last_end[tributo_idx]:
+                    continue
+                found = pattern.match(text.folded, match.start())
+                if found:
+                    last_end[tributo_idx] = found.end()
+                    yield (tributo_idx, *text.to_original(found.start(), found.end()))
+
+    def iter_hits(self, text):
+        """
+        Percorre o texto uma única vez reportando cada tributo por linha
+
+        Args:
+            text (str): Texto (uma ou mais linhas separadas por '\\n')
+
+        Yields:
+            tuple: (indice_linha, indice_tributo), em ordem de linha e cada
+            par no máximo uma vez
+        """
+        if self._combined is None:
+            return
+        yield from self._iter_folded_hits(fold(text))
+
+    def _iter_folded_hits(self, text):
+        line_idx = 0
+        line_start = 0
+        seen = set()
+
+        for match in self._combined.finditer(text):
+            pos = match.start()
+
+            # Avança o contador de linhas apenas até a posição do casamento
+            newlines = text.count('\n', line_start, pos)
+            if newlines:
+                line_idx += newlines
+                line_start = text.rfind('\n', line_start, pos) + 1
+                seen = set()
+
+            for tributo_idx, pattern in enumerate(self._patterns):
+                if tributo_idx not in seen and pattern.match(text, pos):
+                    seen.add(tributo_idx)
+                    yield line_idx, tributo_idx
@@ -0,0 +1,299 @@
+# -*- coding: utf-8 -*-
+"""
+Métricas da análise no formato texto do Prometheus
+
+Contadores, gauges e histogramas simples (sem dependências externas), com
+rótulos, guardados em memória no processo. Cada análise mede o tempo de
+cada etapa (extração, busca, regex, Maritaca AI) e o registra aqui; a rota
+``/metrics`` das aplicações devolve ``REGISTRY.render()``.
+
+Os valores são por processo: com vários workers do gunicorn, ou dentro do
+pool da análise em lote, cada processo tem os seus.
+"""
+
+import math
+import time
+import threading
+
+try:
+    import resource
+except ImportError:  # Windows (versão desktop empacotada)
+    resource = None
+
+# Limites dos histogramas de tempo, em segundos
+TIME_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+# Limites do histograma de vazão, em páginas por segundo
+RATE_BUCKETS = (0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name}: rótulos esperados {self.labelnames}, recebidos {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        with self._lock:
+            items = sorted(self._values.items())
+            lines.extend(self._render_samples(items))
+        return lines
+
+    def _render_samples(self, items):
+        return [f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}' for key, value in items]
+
+
+class Counter(_Metric):
+    """Valor que só aumenta (ex: páginas lidas)"""
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+
+class Gauge(_Metric):
+    """Valor que sobe e desce (ex: pico de memória)"""
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    """Distribuição de observações em faixas cumulativas"""
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=TIME_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            self._values[key] = (counts, total + value)
+
+    def count(self, **labels):
+        with self._lock:
+            counts, _ = self._values.get(self._key(labels), ([0], 0.0))
+        return sum(counts)
+
+    def _render_samples(self, items):
+        lines = []
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, ('le', _format_value(bound)))
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+            lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+class MetricsRegistry:
+    """Conjunto de métricas de um processo"""
+
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def _add(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._add(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._add(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=TIME_BUCKETS):
+        return self._add(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self):
+        """
+        Exporta as métricas
+
+        Returns:
+            str: Texto no formato de exposição do Prometheus (versão 0.0.4)
+        """
+        peak_rss.set(peak_rss_bytes() or 0)
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+def peak_rss_bytes():
+    """Pico de memória residente do processo em bytes (None se indisponível)"""
+    if resource is None:
+        return None
+    # ru_maxrss é em KB no Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+REGISTRY = MetricsRegistry()
+
+analyses = REGISTRY.counter('analisador_analises_total', 'Análises concluídas por resultado', ['resultado'])
+stage_seconds = REGISTRY.histogram('analisador_etapa_segundos', 'Tempo de cada etapa da análise', ['etapa'])
+pages_per_second = REGISTRY.histogram('analisador_paginas_por_segundo', 'Páginas lidas por segundo em cada análise',
+                                      buckets=RATE_BUCKETS)
+pages_read = REGISTRY.counter('analisador_paginas_lidas_total', 'Páginas lidas')
+lines_scanned = REGISTRY.counter('analisador_linhas_lidas_total', 'Linhas percorridas pela busca')
+matches_found = REGISTRY.counter('analisador_ocorrencias_total', 'Ocorrências de tributos encontradas')
+entity_calls = REGISTRY.counter('analisador_extracoes_entidades_total', 'Extrações de empresas por método', ['metodo'])
+cache_hits = REGISTRY.counter('analisador_cache_acertos_total', 'Acertos de cache durante as análises', ['cache'])
+peak_rss = REGISTRY.gauge('analisador_memoria_pico_bytes', 'Pico de memória residente do processo')
+
+
+class StageTimer:
+    """Tempos das etapas de uma análise"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.seconds = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage, seconds):
+        """Soma um tempo à etapa"""
+        with self._lock:
+            self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+
+    def time(self, stage, func, *args):
+        """Executa ``func(*args)`` contando o tempo na etapa"""
+        started = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            self.add(stage, time.perf_counter() - started)
+
+    def iter(self, stage, iterable):
+        """
+        Repassa os itens contando na etapa só o tempo gasto para produzi-los
+
+        Args:
+            stage (str): Nome da etapa
+            iterable (iterable): Itens (ex: páginas extraídas)
+
+        Yields:
+            Os mesmos itens
+        """
+        iterator = iter(iterable)
+        while True:
+            started = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self.add(stage, time.perf_counter() - started)
+            yield item
+
+    def elapsed(self):
+        """Tempo total desde o início"""
+        return time.perf_counter() - self.started
+
+
+def record_analysis(timer, result, stats=None, counts=None):
+    """
+    Registra uma análise concluída (ou interrompida) nas métricas
+
+    O tempo da busca é o que sobra do total depois das outras etapas, porque
+    ela roda intercalada com a extração.
+
+    Args:
+        timer (StageTimer): Tempos das etapas
+        result (str): 'sucesso', 'sem_resultado', 'truncado' ou 'erro'
+        stats (dict): Estatísticas de ``iter_lines`` ('paginas', 'linhas')
+        counts (dict): Ocorrências, extrações e acertos de cache da análise
+
+    Returns:
+        dict: Resumo da análise (tempos em segundos, contagens e memória)
+    """
+    stats = stats or {}
+    counts = counts or {}
+    total = timer.elapsed()
+
+    etapas = dict(timer.seconds)
+    etapas['busca'] = max(0.0, total - sum(etapas.values()))
+    etapas['total'] = total
+    for etapa, seconds in etapas.items():
+        stage_seconds.observe(seconds, etapa=etapa)
+
+    paginas = stats.get('paginas', 0)
+    linhas = stats.get('linhas', 0)
+    analyses.inc(resultado=result)
+    pages_read.inc(paginas)
+    lines_scanned.inc(linhas)
+    matches_found.inc(counts.get('ocorrencias', 0))
+    extracao = etapas.get('extracao')
+    if paginas and extracao:
+        pages_per_second.observe(paginas / extracao)
+    for metodo in ('regex', 'maritaca'):
+        if counts.get(metodo):
+            entity_calls.inc(counts[metodo], metodo=metodo)
+    for cache in ('paginas', 'maritaca_cache'):
+        if counts.get(cache):
+            cache_hits.inc(counts[cache], cache=cache.replace('_cache', ''))
+
+    rss = peak_rss_bytes()
+    if rss:
+        peak_rss.set(rss)
+
+    return {
+        'etapas_s': {etapa: round(seconds, 4) for etapa, seconds in etapas.items()},
+        'paginas': paginas,
+        'linhas': linhas,
+        'paginas_por_segundo': round(paginas / extracao, 1) if paginas and extracao else None,
+        'ocorrencias': counts.get('ocorrencias', 0),
+        'extracoes_regex': counts.get('regex', 0),
+        'chamadas_maritaca': counts.get('maritaca', 0),
+        'cache_paginas_acertos': counts.get('paginas', 0),
+        'cache_maritaca_acertos': counts.get('maritaca_cache', 0),
+        'memoria_pico_mb': round(rss / 1024 / 1024, 1) if rss else None,
+    }
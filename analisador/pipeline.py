@@ -0,0 +1,311 @@
+# -*- coding: utf-8 -*-
+"""
+Pipeline de análise em streaming
+
+Páginas -> linhas com numeração global -> ocorrências de tributos. Nenhuma
+etapa monta o texto completo do documento: o contexto de cada ocorrência sai
+de um buffer circular com as linhas anteriores mais as linhas seguintes
+ainda aguardadas, então o pico de memória depende do tamanho da janela de
+contexto e não do tamanho do documento.
+"""
+
+from array import array
+from bisect import bisect_right
+from collections import deque
+from itertools import islice
+
+from .folding import fold
+
+
+class PageOffsets:
+    """
+    Tabela compacta com a primeira linha de cada página
+
+    Um inteiro por página em um ``array`` (preenchido por ``iter_lines``), sem
+    nada guardado por linha: a página de qualquer linha da numeração global e
+    a posição dela dentro da página saem de uma busca binária, e as linhas de
+    uma página são uma faixa contínua (ex: para mostrar ou reler só a página
+    de uma ocorrência).
+    """
+
+    def __init__(self, first_page=1, data=None):
+        """
+        Args:
+            first_page (int): Número (1-based) da primeira página da tabela
+            data (bytes): Tabela serializada por ``tobytes`` (opcional)
+        """
+        self.first_page = first_page
+        self.starts = array('I')
+        if data:
+            self.starts.frombytes(data)
+
+    def append(self, line_no):
+        """Registra a primeira linha da próxima página"""
+        self.starts.append(line_no)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def locate(self, line_no):
+        """
+        Página e posição dentro dela de uma linha numerada por ``iter_lines``
+
+        Args:
+            line_no (int): Número global da linha
+
+        Returns:
+            tuple: (pagina, linha_na_pagina), ambos 1-based
+        """
+        # Páginas sem texto não têm linhas: a busca cai na última página com esse início
+        idx = max(1, bisect_right(self.starts, line_no))
+        start = self.starts[idx - 1] if self.starts else 1
+        return self.first_page + idx - 1, line_no - start + 1
+
+    def page_lines(self, page):
+        """
+        Faixa de linhas de uma página
+
+        Args:
+            page (int): Número da página (1-based)
+
+        Returns:
+            tuple: (primeira, ultima) linha da página, com a linha em branco
+            que a separa da próxima; ``ultima`` é None na última página e a
+            faixa é vazia (ultima < primeira) em páginas sem texto. None se a
+            página não está na tabela
+        """
+        idx = page - self.first_page
+        if not 0 <= idx < len(self.starts):
+            return None
+        last = self.starts[idx + 1] - 1 if idx + 1 < len(self.starts) else None
+        return self.starts[idx], last
+
+    def tobytes(self):
+        """Tabela serializada (ex: para o índice de busca)"""
+        return self.starts.tobytes()
+
+
+def iter_lines(pages, stats=None, page_offsets=None, fold_text=False):
+    """
+    Gera as linhas das páginas com numeração global
+
+    A numeração é a mesma do texto montado com ``page_text + "\\n\\n"`` para
+    cada página com texto: uma linha em branco separa as páginas e há uma
+    linha em branco extra no final.
+
+    Args:
+        pages (iterable): Texto de cada página, em ordem
+        stats (dict): Se informado, recebe os contadores 'paginas',
+            'paginas_com_texto', 'paginas_completas' (todas as linhas já
+            entregues) e 'linhas'
+        page_offsets (PageOffsets): Se informada, recebe o número da primeira
+            linha de cada página
+        fold_text (bool): Acrescenta a cada linha o texto dobrado (ver
+            ``folding``); cada página é dobrada de uma vez
+
+    Yields:
+        tuple: (numero_linha, linha), com numero_linha começando em 1
+    """
+    if stats is not None:
+        stats.setdefault('paginas', 0)
+        stats.setdefault('paginas_com_texto', 0)
+        stats.setdefault('paginas_completas', 0)
+        stats.setdefault('linhas', 0)
+
+    line_no = 0
+    for page_text in pages:
+        if stats is not None:
+            stats['paginas'] += 1
+        if page_offsets is not None:
+            page_offsets.append(line_no + 1)
+        if not page_text:
+            if stats is not None:
+                stats['paginas_completas'] += 1
+            continue
+        if stats is not None:
+            stats['paginas_com_texto'] += 1
+
+        if fold_text:
+            # A dobra não cria nem remove quebras de linha: as linhas se correspondem
+            for line, folded in zip(iter_text_lines(page_text), iter_text_lines(fold(page_text))):
+                line_no += 1
+                yield line_no, line, folded
+        else:
+            for line in iter_text_lines(page_text):
+                line_no += 1
+                yield line_no, line
+
+        # Linha em branco que separava as páginas no texto concatenado; quem
+        # a recebe já recebeu todas as linhas da página
+        line_no += 1
+        if stats is not None:
+            stats['paginas_completas'] += 1
+        yield (line_no, '', '') if fold_text else (line_no, '')
+
+        if stats is not None:
+            stats['linhas'] = line_no
+
+    if line_no:
+        yield (line_no + 1, '', '') if fold_text else (line_no + 1, '')
+        if stats is not None:
+            stats['linhas'] = line_no + 1
+
+
+def iter_text_lines(text):
+    """
+    Gera as linhas de um texto sem criar a lista completa de ``split('\\n')``
+
+    Args:
+        text (str): Texto
+
+    Yields:
+        str: Cada linha, na ordem
+    """
+    start = 0
+    while True:
+        end = text.find('\n', start)
+        if end < 0:
+            yield text[start:]
+            return
+        yield text[start:end]
+        start = end + 1
+
+
+def iter_matches(lines, matcher, context_before, context_after):
+    """
+    Encontra os tributos linha a linha com contexto de um buffer circular
+
+    Args:
+        lines (iterable): Tuplas (numero_linha, linha) em ordem crescente, ou
+            (numero_linha, linha, linha_dobrada) de ``iter_lines`` com ``fold_text``
+        matcher (TributoMatcher): Matcher com os tributos buscados
+        context_before (int): Linhas de contexto antes da ocorrência
+        context_after (int): Linhas de contexto depois da ocorrência
+
+    Yields:
+        dict: Ocorrência com 'tributo_idx', 'tributo', 'linha_encontrada',
+        'termo_encontrado' e 'posicao' (o nome do tributo como aparece no
+        texto original e a sua posição [inicio, fim] em 'linha_encontrada'),
+        'contexto' e 'linha_numero', em ordem de linha
+    """
+    window = deque(maxlen=context_before + context_after + 1)
+    pending = deque()
+    last_line_no = 0
+
+    for item in lines:
+        line_no, line = item[0], item[1]
+        window.append(line)
+        last_line_no = line_no
+
+        tributo_idxs = matcher.match_folded(item[2]) if len(item) > 2 else matcher.match_line(line)
+        if tributo_idxs:
+            pending.append((line_no, line, tributo_idxs))
+
+        # Ocorrências cujo contexto posterior já chegou por completo
+        while pending and line_no - pending[0][0] >= context_after:
+            yield from _emit(pending.popleft(), window, last_line_no, matcher, context_before, context_after)
+
+    # Final do documento: contexto posterior fica truncado
+    while pending:
+        yield from _emit(pending.popleft(), window, last_line_no, matcher, context_before, context_after)
+
+
+def _emit(hit, window, last_line_no, matcher, context_before, context_after):
+    """Monta as ocorrências de uma linha a partir da janela de contexto"""
+    line_no, line, tributo_idxs = hit
+
+    idx = len(window) - 1 - (last_line_no - line_no)
+    start_idx = max(0, idx - context_before)
+    end_idx = min(len(window), idx + context_after + 1)
+    context = '\n'.join(islice(window, start_idx, end_idx))
+    spans = first_spans(matcher, line)
+    found = line.strip()
+
+    for tributo_idx in tributo_idxs:
+        start, end = spans[tributo_idx]
+        yield {
+            'tributo_idx': tributo_idx,
+            'tributo': matcher.tributos[tributo_idx],
+            'linha_encontrada': found,
+            'termo_encontrado': found[start:end],
+            'posicao': [start, end],
+            'contexto': context,
+            'linha_numero': line_no
+        }
+
+
+def first_spans(matcher, line):
+    """
+    Primeira posição de cada tributo em uma linha, relativa à linha sem os
+    espaços das pontas (como em 'linha_encontrada')
+
+    Args:
+        matcher (TributoMatcher): Matcher com os tributos buscados
+        line (str): Linha original
+
+    Returns:
+        dict: Índice do tributo -> (inicio, fim)
+    """
+    offset = len(line) - len(line.lstrip())
+    spans = {}
+    for tributo_idx, start, end in matcher.iter_spans(line):
+        spans.setdefault(tributo_idx, (start - offset, end - offset))
+    return spans
+
+
+def iter_context_regions(matches, context_before, max_lines):
+    """
+    Junta em regiões as ocorrências cujos contextos se sobrepõem
+
+    Ocorrências em linhas próximas (ou vários tributos na mesma linha) têm
+    contextos quase iguais; a extração de entidades roda uma vez por região
+    em vez de uma vez por ocorrência.
+
+    Args:
+        matches (iterable): Ocorrências de ``iter_matches`` (em qualquer ordem)
+        context_before (int): Linhas de contexto antes usadas na busca
+        max_lines (int): Tamanho máximo de uma região, em linhas
+
+    Yields:
+        tuple: (texto_da_regiao, ocorrencias_da_regiao), em ordem de linha
+    """
+    members = []
+    region_lines = []
+    region_start = region_end = 0
+
+    for match in sorted(matches, key=lambda m: m['linha_numero']):
+        lines = match['contexto'].split('\n')
+        start = max(1, match['linha_numero'] - context_before)
+        end = start + len(lines) - 1
+
+        if members and start <= region_end and max(end, region_end) - region_start < max_lines:
+            # Acrescenta só as linhas que ainda não estão na região
+            region_lines.extend(lines[region_end - start + 1:])
+            region_end = max(region_end, end)
+            members.append(match)
+            continue
+
+        if members:
+            yield '\n'.join(region_lines), members
+        members = [match]
+        region_lines = lines
+        region_start, region_end = start, end
+
+    if members:
+        yield '\n'.join(region_lines), members
+
+
+def group_by_tributo(matches):
+    """
+    Ordena as ocorrências por tributo (na ordem pedida) e depois por linha
+
+    Args:
+        matches (iterable): Ocorrências de ``iter_matches``
+
+    Returns:
+        list: Ocorrências agrupadas por tributo, sem a chave 'tributo_idx'
+    """
+    ordered = sorted(matches, key=lambda match: match['tributo_idx'])
+    for match in ordered:
+        del match['tributo_idx']
+    return ordered
@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+"""
+Pré-filtro das páginas pelo texto cru do content stream
+
+O ``extract_text()`` do pdfplumber faz uma análise de layout caractere a
+caractere em toda página, mas a maioria das páginas de um Diário Oficial
+não menciona nenhum dos tributos buscados. Antes dela, as strings
+desenhadas pelos operadores de texto (Tj, TJ, ', ") são lidas direto do
+content stream e decodificadas com as fontes da página; só as páginas em que
+algum tributo pode aparecer, e as vizinhas delas (contexto), passam pela
+extração completa. As demais ficam com o texto cru, que basta para a busca
+não encontrar nada nelas e mantém a contagem de páginas e linhas.
+
+Quando o texto cru não é confiável (fontes sem mapeamento para Unicode,
+texto dentro de Form XObjects, content stream ilegível), a página é tratada
+como candidata e recebe a extração completa.
+"""
+
+import re
+from collections import deque
+
+from pdfminer.pdffont import PDFUnicodeNotDefined
+from pdfminer.pdfinterp import PDFResourceManager
+from pdfminer.pdftypes import PDFObjRef, resolve1
+
+from .folding import fold
+
+# Páginas vizinhas de uma candidata que também recebem a extração completa
+PREFILTER_NEIGHBORS = 1
+
+# Fração máxima de caracteres sem mapeamento para Unicode no texto cru
+MAX_UNDEFINED_RATIO = 0.2
+
+# Strings literais (com um nível de parênteses balanceados), strings
+# hexadecimais, seleção de fonte e operadores que mudam de linha
+_CONTENT_TOKEN = re.compile(
+    rb'\((?P<literal>(?:[^()\\]|\\.|\((?:[^()\\]|\\.)*\))*)\)'
+    rb'|<(?P<hex>[0-9A-Fa-f\s]*)>'
+    rb'|/(?P<font>[^\s/\[\]()<>{}%]+)\s+[-+\d.]+\s+Tf(?![\w*])'
+    rb'|(?<![\w/])(?P<newline>T\*|Td|TD|Tm|ET|\'|")(?![\w*])',
+    re.S
+)
+
+_LITERAL_ESCAPE = re.compile(rb'\\(?:([0-7]{1,3})|(\r\n|\r|\n)|(.))', re.S)
+
+_ESCAPES = {b'n': b'\n', b'r': b'\r', b't': b'\t', b'b': b'\b', b'f': b'\f'}
+
+
+def _unescape(match):
+    if match.group(1):
+        return bytes([int(match.group(1), 8) & 0xFF])
+    if match.group(2):
+        return b''
+    return _ESCAPES.get(match.group(3), match.group(3))
+
+
+def _decode(font, data):
+    """Texto de uma string desenhada com a fonte; conta os caracteres sem mapeamento"""
+    chars = []
+    undefined = 0
+    for cid in font.decode(data):
+        try:
+            chars.append(font.to_unichr(cid))
+        except (PDFUnicodeNotDefined, KeyError, IndexError):
+            undefined += 1
+    return ''.join(chars), undefined
+
+
+def _has_form_xobject(resources):
+    xobjects = resolve1(resources.get('XObject')) or {}
+    for xobject in xobjects.values():
+        subtype = resolve1(xobject).get('Subtype')
+        if getattr(subtype, 'name', subtype) == 'Form':
+            return True
+    return False
+
+
+def raw_page_text(page_obj, resource_manager):
+    """
+    Texto cru de uma página, sem análise de layout
+
+    Args:
+        page_obj (PDFPage): Página do pdfminer (``page.page_obj`` no pdfplumber)
+        resource_manager (PDFResourceManager): Gerenciador de fontes (com cache)
+
+    Returns:
+        str: Texto dos operadores de texto, uma linha por mudança de linha
+        (sem linhas vazias), ou None se o texto cru não for confiável
+    """
+    try:
+        resources = resolve1(page_obj.resources) or {}
+        if _has_form_xobject(resources):
+            return None
+
+        font_specs = resolve1(resources.get('Font')) or {}
+        fonts = {}
+        data = b'\n'.join(resolve1(stream).get_data() for stream in page_obj.contents)
+
+        parts = []
+        font = None
+        total = undefined = 0
+        for match in _CONTENT_TOKEN.finditer(data):
+            kind = match.lastgroup
+            if kind == 'font':
+                name = match.group('font').decode('latin-1')
+                if name not in fonts:
+                    spec = font_specs.get(name)
+                    objid = spec.objid if isinstance(spec, PDFObjRef) else None
+                    fonts[name] = resource_manager.get_font(objid, resolve1(spec) or {})
+                font = fonts[name]
+            elif kind == 'newline':
+                parts.append('\n')
+            elif font is not None:
+                if kind == 'literal':
+                    raw = _LITERAL_ESCAPE.sub(_unescape, match.group('literal'))
+                else:
+                    digits = re.sub(rb'\s', b'', match.group('hex'))
+                    raw = bytes.fromhex((digits + b'0' * (len(digits) % 2)).decode('ascii'))
+                text, missing = _decode(font, raw)
+                parts.append(text)
+                total += len(text) + missing
+                undefined += missing
+    except Exception:
+        return None
+
+    if total and undefined > total * MAX_UNDEFINED_RATIO:
+        return None
+    # Sem linhas vazias, como no texto do pdfplumber
+    return '\n'.join(line for line in ''.join(parts).split('\n') if line.strip())
+
+
+class RawPageText(str):
+    """
+    Texto cru de uma página que não passou pela extração completa
+
+    Funciona como o texto da página em qualquer lugar; o cache de páginas
+    usa a marca para completar a página quando uma busca precisar dela.
+    """
+
+    __slots__ = ()
+
+
+class PageFilter:
+    """
+    Decide, pelo texto cru, quais páginas precisam da extração completa
+
+    Os tributos são procurados com espaços opcionais entre os caracteres
+    (o texto cru pode posicionar letras e palavras sem espaços), então o
+    filtro só erra para o lado de extrair páginas a mais. Como no
+    ``TributoMatcher``, a busca é feita no texto dobrado (sem acentos e em
+    minúsculas), uma vez por página.
+    """
+
+    def __init__(self, tributos, neighbors=PREFILTER_NEIGHBORS):
+        """
+        Args:
+            tributos (list): Tributos buscados
+            neighbors (int): Páginas vizinhas de uma candidata também extraídas
+        """
+        self.tributos = [t.strip() for t in tributos if t and t.strip()]
+        self.neighbors = neighbors
+        alternativas = [r'\s*'.join(re.escape(c) for c in fold(tributo) if not c.isspace())
+                        for tributo in self.tributos]
+        self._pattern = re.compile(r'\b(?:' + '|'.join(alternativas) + r')\b')
+
+    def is_candidate(self, raw_text):
+        """
+        Se a página pode mencionar algum tributo
+
+        Args:
+            raw_text (str): Texto cru da página (None se não confiável)
+
+        Returns:
+            bool: True se a página precisa da extração completa
+        """
+        return raw_text is None or self._pattern.search(fold(raw_text)) is not None
+
+
+def iter_filtered_pages(pages, first, start, end, page_filter):
+    """
+    Gera o texto das páginas extraindo por completo só as candidatas e vizinhas
+
+    As páginas são lidas com uma janela de ``neighbors`` páginas à frente,
+    então só essas ficam em memória.
+
+    Args:
+        pages (list): Páginas do pdfplumber, da página ``first`` em diante
+            (incluindo as vizinhas antes e depois da faixa)
+        first (int): Índice (0-based) da primeira página da lista
+        start (int): Índice da primeira página gerada
+        end (int): Índice final (exclusivo); as páginas fora de ``start:end``
+            só informam se são candidatas
+        page_filter (PageFilter): Filtro com os tributos buscados
+
+    Yields:
+        str: Texto de cada página da faixa (``RawPageText`` nas não extraídas)
+    """
+    neighbors = page_filter.neighbors
+    resource_manager = PDFResourceManager(caching=True)
+    candidates = []
+    pending = deque()
+
+    def emit(i, page, raw):
+        if any(candidates[max(0, i - neighbors):i + neighbors + 1]):
+            text = page.extract_text() or ''
+        else:
+            text = RawPageText(raw)
+        page.flush_cache()
+        return text
+
+    for i, page in enumerate(pages):
+        raw = raw_page_text(page.page_obj, resource_manager)
+        candidates.append(page_filter.is_candidate(raw))
+        if start <= i + first < end:
+            pending.append((i, page, raw or ''))
+        while pending and pending[0][0] + neighbors <= i:
+            yield emit(*pending.popleft())
+
+    # Fim do documento ou da faixa: as vizinhas que faltavam não existem
+    while pending:
+        yield emit(*pending.popleft())
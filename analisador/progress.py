@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""
+Progresso estruturado da análise, com estimativa de tempo restante
+
+A análise informa contadores (páginas extraídas, linhas lidas, trechos,
+extrações de empresas pendentes) a cada passo; o ``ProgressTracker`` só
+guarda os valores e repassa um retrato completo ao consumidor (job da versão
+web, rota de progresso da versão local, barra da versão desktop) no máximo a
+cada ``PROGRESS_INTERVAL`` segundos. No laço quente o custo é uma atualização
+de dicionário e uma leitura do relógio.
+
+O tempo restante de cada etapa vem da vazão média desde o início dela
+(ex: páginas por segundo na extração).
+"""
+
+import time
+import threading
+
+# Intervalo mínimo entre duas publicações do progresso (segundos)
+PROGRESS_INTERVAL = 0.5
+
+# Etapas da análise
+ETAPA_EXTRACAO = 'extracao'
+ETAPA_EMPRESAS = 'empresas'
+
+# Contadores (feito, total) usados na estimativa de cada etapa
+_ETA_FIELDS = {
+    ETAPA_EXTRACAO: ('paginas_processadas', 'paginas_previstas'),
+    ETAPA_EMPRESAS: ('empresas_processadas', 'empresas_total'),
+}
+
+
+def estimate_eta(done, total, elapsed):
+    """
+    Tempo restante pela vazão média
+
+    Args:
+        done (int): Unidades concluídas
+        total (int): Total de unidades (None se desconhecido)
+        elapsed (float): Segundos desde o início
+
+    Returns:
+        float: Segundos restantes ou None sem base para estimar
+    """
+    if not done or not total or elapsed <= 0:
+        return None
+    return max(0.0, (total - done) * elapsed / done)
+
+
+class ProgressTracker:
+    """Acumula o progresso de uma análise e o publica com intervalo mínimo"""
+
+    def __init__(self, callback, line_stats=None, interval=PROGRESS_INTERVAL, clock=time.monotonic):
+        """
+        Args:
+            callback (callable): Recebe o retrato do progresso como argumentos nomeados
+            line_stats (dict): Contadores da leitura das linhas (``iter_lines``),
+                consultados só na publicação
+            interval (float): Segundos mínimos entre publicações
+            clock (callable): Relógio monotônico (substituível nos testes)
+        """
+        self.callback = callback
+        self.line_stats = line_stats
+        self.interval = interval
+        self.clock = clock
+        self.fields = {}
+        self._stage = None
+        self._stage_started = 0.0
+        self._next_publish = 0.0
+        self._lock = threading.Lock()
+
+    def update(self, **fields):
+        """
+        Registra contadores (``etapa`` muda a etapa) e publica se já passou o intervalo
+
+        Pode ser passado no lugar do ``progress`` das funções da análise.
+        """
+        with self._lock:
+            self.fields.update(fields)
+            now = self.clock()
+            stage = fields.get('etapa')
+            if stage is not None and stage != self._stage:
+                self._stage = stage
+                self._stage_started = now
+            if now < self._next_publish:
+                return
+            self._next_publish = now + self.interval
+            snapshot = self._snapshot(now)
+        self.callback(**snapshot)
+
+    def flush(self):
+        """Publica o retrato atual sem esperar o intervalo"""
+        with self._lock:
+            now = self.clock()
+            self._next_publish = now + self.interval
+            snapshot = self._snapshot(now)
+        self.callback(**snapshot)
+
+    def _snapshot(self, now):
+        snapshot = dict(self.fields)
+        if self.line_stats is not None:
+            snapshot['linhas_lidas'] = self.line_stats.get('linhas', 0)
+
+        elapsed = now - self._stage_started
+        done_field, total_field = _ETA_FIELDS.get(self._stage, (None, None))
+        if done_field:
+            done = snapshot.get(done_field, 0)
+            snapshot['eta_s'] = _round(estimate_eta(done, snapshot.get(total_field), elapsed))
+            if self._stage == ETAPA_EXTRACAO and elapsed > 0:
+                snapshot['paginas_por_segundo'] = round(done / elapsed, 2)
+        return snapshot
+
+
+def _round(value):
+    return None if value is None else round(value, 1)
+
+
+def format_eta(seconds):
+    """
+    Tempo restante para exibição
+
+    Args:
+        seconds (float): Segundos restantes (None se desconhecido)
+
+    Returns:
+        str: Ex: '1min 05s', '12s' ou 'calculando...'
+    """
+    if seconds is None:
+        return 'calculando...'
+    seconds = int(round(seconds))
+    if seconds >= 60:
+        return f'{seconds // 60}min {seconds % 60:02d}s'
+    return f'{seconds}s'
+
+
+def describe_progress(progress):
+    """
+    Resumo do progresso em uma linha
+
+    Args:
+        progress (dict): Retrato publicado pelo ``ProgressTracker``
+
+    Returns:
+        str: Ex: '📄 Página 120/400 | 35 trechos | 12.3 páginas/s | restam 23s'
+    """
+    if progress.get('etapa') == ETAPA_EMPRESAS:
+        partes = [f"🏢 Empresas: {progress.get('empresas_processadas', 0)}/{progress.get('empresas_total', 0)} regiões"]
+        if progress.get('chamadas_ia_pendentes'):
+            partes.append(f"{progress['chamadas_ia_pendentes']} consultas à IA pendentes")
+    else:
+        previstas = progress.get('paginas_previstas')
+        pagina = f"📄 Página {progress.get('paginas_processadas', 0)}"
+        partes = [pagina + (f"/{previstas}" if previstas else "")]
+        if progress.get('paginas_por_segundo'):
+            partes.append(f"{progress['paginas_por_segundo']:.1f} páginas/s")
+    partes.insert(1, f"{progress.get('ocorrencias', 0)} trechos")
+    eta = progress.get('eta_s')
+    partes.append(f"restam {format_eta(eta)}" if eta is not None else "calculando o tempo restante...")
+    return ' | '.join(partes)
+
+
+def progress_fraction(progress):
+    """
+    Fração concluída da etapa atual
+
+    Args:
+        progress (dict): Retrato publicado pelo ``ProgressTracker``
+
+    Returns:
+        float: Entre 0 e 1, ou None se o total ainda não é conhecido
+    """
+    done_field, total_field = _ETA_FIELDS.get(progress.get('etapa'), (None, None))
+    total = progress.get(total_field) if total_field else None
+    if not total:
+        return None
+    return min(1.0, progress.get(done_field, 0) / total)
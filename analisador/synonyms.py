@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+"""
+Dicionário de sinônimos dos tributos
+
+Cada tributo tem um nome canônico (ex: 'ISS') e os nomes pelos quais aparece
+nos Diários (siglas alternativas e nomes por extenso). O usuário pode digitar
+qualquer um deles: os termos de um mesmo tributo viram um único grupo, todos
+os nomes do grupo entram no ``TributoMatcher`` (na mesma expressão combinada,
+então mais sinônimos não significam mais passadas pelo texto) e os trechos
+são reportados com o nome canônico.
+
+O dicionário embutido pode ser ampliado com um arquivo JSON
+(``TRIBUTO_SINONIMOS_FILE``) no formato ``{"canônico": ["sinônimo", ...]}``.
+Termos fora do dicionário formam um grupo só com eles mesmos.
+"""
+
+import json
+import os
+
+from .folding import fold
+
+# Arquivo JSON opcional com sinônimos adicionais
+TRIBUTO_SINONIMOS_FILE = os.environ.get('TRIBUTO_SINONIMOS_FILE')
+
+# Sinônimos embutidos (nome canônico -> outros nomes)
+TRIBUTO_SINONIMOS = {
+    'ISS': [
+        'ISSQN', 'ISS-QN', 'ISS/QN',
+        'Imposto sobre Serviços',
+        'Imposto sobre Serviços de Qualquer Natureza',
+        'Imposto Sobre Serviço de Qualquer Natureza',
+    ],
+    'IPTU': [
+        'Imposto Predial e Territorial Urbano',
+        'Imposto sobre a Propriedade Predial e Territorial Urbana',
+    ],
+    'ITBI': [
+        'ITIV',
+        'Imposto sobre a Transmissão de Bens Imóveis',
+        'Imposto sobre Transmissão de Bens Imóveis',
+        'Imposto de Transmissão de Bens Imóveis',
+        'Imposto sobre a Transmissão Inter Vivos',
+    ],
+    'ICMS': [
+        'Imposto sobre Circulação de Mercadorias e Serviços',
+        'Imposto sobre Operações relativas à Circulação de Mercadorias',
+    ],
+    'PIS': [
+        'PIS/PASEP', 'PIS-PASEP', 'PASEP',
+        'Programa de Integração Social',
+    ],
+    'COFINS': [
+        'Contribuição para o Financiamento da Seguridade Social',
+    ],
+    'CSLL': [
+        'Contribuição Social sobre o Lucro Líquido',
+    ],
+}
+
+
+def _key(term):
+    """Chave de comparação: texto dobrado com espaços normalizados"""
+    return ' '.join(fold(term).split())
+
+
+class SynonymDictionary:
+    """Grupos de nomes de um mesmo tributo, com o nome canônico de cada grupo"""
+
+    def __init__(self, synonyms=None):
+        """
+        Args:
+            synonyms (dict): Nome canônico -> lista de sinônimos
+        """
+        self._aliases = {}
+        self._canonical = {}
+        for canonical, aliases in (synonyms or {}).items():
+            self.add(canonical, aliases)
+
+    def add(self, canonical, aliases):
+        """
+        Acrescenta sinônimos a um tributo (criando o grupo se preciso)
+
+        Nomes que já estão no grupo são ignorados; um nome não pode estar em
+        dois grupos (ex: o nome canônico ser sinônimo de outro tributo).
+
+        Args:
+            canonical (str): Nome canônico
+            aliases (iterable): Outros nomes do tributo
+
+        Raises:
+            ValueError: Se o nome canônico ou um sinônimo já pertence a outro tributo
+        """
+        canonical = canonical.strip()
+        names = [canonical] + [alias.strip() for alias in aliases if alias and alias.strip()]
+        for name in names:
+            owner = self._canonical.get(_key(name), canonical)
+            if owner != canonical:
+                raise ValueError(f"'{name}' já é sinônimo de '{owner}', não pode ser também de '{canonical}'")
+
+        group = self._aliases.setdefault(canonical, [canonical])
+        self._canonical[_key(canonical)] = canonical
+        for alias in names[1:]:
+            if _key(alias) not in self._canonical:
+                self._canonical[_key(alias)] = canonical
+                group.append(alias)
+
+    def canonical(self, tributo):
+        """
+        Nome canônico de um tributo
+
+        Args:
+            tributo (str): Nome digitado (qualquer grafia, com ou sem acentos)
+
+        Returns:
+            str: Nome canônico, ou o próprio termo se ele não está no dicionário
+        """
+        return self._canonical.get(_key(tributo), tributo.strip())
+
+    def aliases(self, canonical):
+        """
+        Todos os nomes de um tributo
+
+        Args:
+            canonical (str): Nome canônico
+
+        Returns:
+            list: Nome canônico seguido dos sinônimos
+        """
+        return self._aliases.get(canonical, [canonical])
+
+    def group(self, tributos):
+        """
+        Agrupa os termos digitados pelos seus tributos
+
+        Args:
+            tributos (list): Termos digitados pelo usuário
+
+        Returns:
+            list: Nomes canônicos, sem repetição, na ordem em que aparecem
+        """
+        canonicals = {}
+        for tributo in tributos:
+            if tributo and tributo.strip():
+                canonical = self.canonical(tributo)
+                canonicals.setdefault(_key(canonical), canonical)
+        return list(canonicals.values())
+
+
+def load_synonyms(path=TRIBUTO_SINONIMOS_FILE):
+    """
+    Dicionário embutido mais os sinônimos do arquivo JSON (se houver)
+
+    Args:
+        path (str): Arquivo JSON com ``{"canônico": ["sinônimo", ...]}`` (opcional)
+
+    Returns:
+        SynonymDictionary: Dicionário de sinônimos
+
+    Raises:
+        ValueError: Se o arquivo coloca um nome em dois tributos
+    """
+    synonyms = SynonymDictionary(TRIBUTO_SINONIMOS)
+    if path:
+        with open(path, encoding='utf-8') as f:
+            for canonical, aliases in json.load(f).items():
+                synonyms.add(canonical, aliases)
+    return synonyms
+
+
+# Dicionário carregado uma vez na inicialização
+SYNONYMS = load_synonyms()
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+Recebimento dos uploads sem passar pela pasta uploads/
+
+O Werkzeug grava cada arquivo de um formulário multipart em um arquivo
+temporário em disco a partir de 500KB; depois a aplicação copiava esse
+arquivo para ``uploads/`` e o pdfplumber o lia de novo. Aqui o corpo da
+requisição é recebido direto em memória (``BytesIO``) e entregue ao
+analisador como bytes, sem cópias. Uploads maiores que
+``UPLOAD_MEMORY_MAX_MB`` (só na versão local, que não tem limite de tamanho)
+vão para um arquivo em tmpfs (``/dev/shm``, quando existe), cujo caminho é
+usado direto pela análise e pelos processos de extração.
+"""
+
+import io
+import os
+import tempfile
+
+from flask import Request
+
+# Tamanho máximo da requisição recebida em memória
+UPLOAD_MEMORY_MAX_MB = int(os.environ.get('UPLOAD_MEMORY_MAX_MB', 16))
+
+# Pasta dos uploads maiores (tmpfs quando disponível)
+UPLOAD_SPOOL_DIR = os.environ.get('UPLOAD_SPOOL_DIR') or (
+    '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir())
+
+# Assinatura do cabeçalho de um PDF (pode vir depois de alguns bytes de lixo)
+PDF_SIGNATURE = b'%PDF-'
+PDF_SIGNATURE_WINDOW = 1024
+
+
+class UploadRequest(Request):
+    """Requisição do Flask que recebe os arquivos em memória ou em tmpfs"""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if total_content_length is not None and total_content_length <= UPLOAD_MEMORY_MAX_MB * 1024 * 1024:
+            return io.BytesIO()
+        return tempfile.NamedTemporaryFile(dir=UPLOAD_SPOOL_DIR, prefix='upload_', suffix='.pdf')
+
+
+def upload_path(file):
+    """
+    Caminho do arquivo em tmpfs que recebeu o upload
+
+    Só é válido durante a requisição (o arquivo é apagado ao fechá-la).
+
+    Args:
+        file (FileStorage): Arquivo do formulário
+
+    Returns:
+        str: Caminho do arquivo ou None se o upload está em memória
+    """
+    name = getattr(file.stream, 'name', None)
+    return name if isinstance(name, str) else None
+
+
+def upload_bytes(file):
+    """
+    Conteúdo do upload como bytes
+
+    Um upload recebido em memória é devolvido sem cópia; os demais são lidos.
+
+    Args:
+        file (FileStorage): Arquivo do formulário
+
+    Returns:
+        bytes: Conteúdo do arquivo
+    """
+    stream = file.stream
+    if isinstance(stream, io.BytesIO):
+        return stream.getvalue()
+    stream.seek(0)
+    return stream.read()
+
+
+def upload_source(file):
+    """
+    PDF do upload no formato aceito pelo analisador
+
+    Args:
+        file (FileStorage): Arquivo do formulário
+
+    Returns:
+        str | bytes: Caminho em tmpfs ou o conteúdo em memória
+    """
+    return upload_path(file) or upload_bytes(file)
+
+
+def is_pdf(file):
+    """
+    Verifica a assinatura ``%PDF-`` no início do arquivo
+
+    Args:
+        file (FileStorage): Arquivo do formulário
+
+    Returns:
+        bool: True se o conteúdo parece um PDF
+    """
+    stream = file.stream
+    stream.seek(0)
+    head = stream.read(PDF_SIGNATURE_WINDOW)
+    stream.seek(0)
+    return PDF_SIGNATURE in head
@@ -1,114 +1,100 @@
 import os
-import re
-import csv
-import io
-from datetime import datetime
-from werkzeug.utils import secure_filename
-from flask import Flask, render_template, request, jsonify, send_file, flash, redirect, url_for
-import pdfplumber
-import requests
+import json
+import time
+from flask import Flask, Response, render_template, request, jsonify, url_for
 from dotenv import load_dotenv
-import threading
-from functools import wraps
+
+from analisador.cache import PageTextCache
+from analisador.core import Analyzer, get_profile
+from analisador.export import csv_response, filter_results
+from analisador.deadline import Deadline
+from analisador.extraction import join_pages
+from analisador.jobs import JobQueue, QueueFullError
+from analisador.llm_cache import LLMCache
+from analisador.maritaca import MaritacaClient
+from analisador.metrics import REGISTRY
+from analisador.uploads import UploadRequest, is_pdf, upload_bytes
 
 # Carrega variáveis de ambiente
 load_dotenv()
 
 app = Flask(__name__)
+# Uploads recebidos em memória (ver analisador/uploads.py)
+app.request_class = UploadRequest
 app.secret_key = os.environ.get('SECRET_KEY', 'dev-key-change-in-production')
 app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024  # 50MB max
 
 # Configurações otimizadas
-UPLOAD_FOLDER = 'uploads'
 ALLOWED_EXTENSIONS = {'pdf'}
 MARITACA_API_KEY = os.environ.get('MARITACA_API_KEY')
 
-# Configurações de timeout (ultra-agressivas para Render.com gratuito)
-PDF_PROCESSING_TIMEOUT = 8  # segundos (reduzido drasticamente de 15 para 8)
-API_TIMEOUT = 3  # segundos (reduzido de 5 para 3)
-MAX_PDF_PAGES = 10  # máximo de páginas para processar (reduzido de 20 para 10)
-MAX_TEXT_SIZE = 100000  # 100KB de texto máximo (reduzido de 200KB)
-MAX_LINES_PROCESSED = 2000  # máximo de linhas processadas (reduzido de 5000)
-MAX_MATCHES_PER_TRIBUTO = 5  # máximo de matches por tributo (reduzido de 10)
-MAX_RESULTS_RETURNED = 10  # máximo de resultados retornados (reduzido de 20)
-
-# Cria pasta de uploads se não existir
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-
-class TimeoutError(Exception):
-    pass
-
-def with_timeout(seconds):
-    """Decorator para adicionar timeout a funções usando threading"""
-    def decorator(func):
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            result = [None]
-            exception = [None]
-            success = [False]
-            
-            def target():
-                try:
-                    result[0] = func(*args, **kwargs)
-                    success[0] = True
-                except Exception as e:
-                    exception[0] = e
-            
-            thread = threading.Thread(target=target)
-            thread.daemon = True
-            thread.start()
-            thread.join(seconds)
-            
-            if thread.is_alive():
-                # Thread ainda está rodando, timeout ocorreu
-                return None, False
-            
-            if exception[0]:
-                # Houve uma exceção na função
-                print(f"Erro na função {func.__name__}: {exception[0]}")
-                return None, False
-                
-            return result[0], success[0]
-        
-        return wrapper
-    return decorator
+# Limites da análise: perfil 'web' (a análise roda na fila de jobs, fora do
+# timeout de 30s do gunicorn; ver analisador/core.py para os valores)
+CONFIG = get_profile('web')
+
+# Limite mais restritivo de upload: 10MB para Render.com gratuito
+MAX_UPLOAD_SIZE = 10 * 1024 * 1024
+
+# Fila de jobs (1 thread: o plano gratuito tem um único worker e pouca memória)
+JOB_WORKERS = 1
+JOB_QUEUE_MAX_PENDING = 10  # jobs aguardando (cada um com o PDF em memória: até 100MB)
+JOB_RESULT_TTL = 3600  # segundos que o resultado fica disponível
+
+# Stream de eventos (SSE) de um job: a conexão é encerrada periodicamente e o
+# navegador reconecta sozinho continuando do último evento (Last-Event-ID)
+EVENT_STREAM_MAX_SECONDS = 25  # duração máxima de uma conexão
+EVENT_STREAM_KEEPALIVE = 10  # segundos entre comentários de keepalive
+
+# Cache do texto extraído (evita reprocessar o mesmo PDF)
+page_cache = PageTextCache()
+
+# Cliente da Maritaca AI reaproveitado entre chamadas (conexões persistentes),
+# com as respostas memorizadas em disco
+maritaca = MaritacaClient(MARITACA_API_KEY, timeout=CONFIG.api_timeout, cache=LLMCache())
 
 def allowed_file(filename):
     """Verifica se o arquivo tem extensão permitida"""
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-@with_timeout(PDF_PROCESSING_TIMEOUT)
-def extract_text_from_pdf(pdf_path):
+def log_warnings(message):
+    """Log do motor de análise na versão web: só os avisos (⚠️) vão para a saída do servidor"""
+    if message.startswith('⚠️'):
+        print(message)
+
+def get_analyzer():
+    """Motor de análise com o perfil web e os recursos desta aplicação"""
+    return Analyzer(CONFIG, page_cache=page_cache, maritaca=maritaca, log=log_warnings)
+
+def iter_pdf_pages(pdf_path, progress=None, deadline=None):
     """
-    Extrai texto do PDF preservando formatação com timeout e limite de páginas
+    Gera o texto das páginas do PDF respeitando os limites de páginas, texto e tempo
     
     Args:
         pdf_path (str): Caminho para o arquivo PDF
+        progress (callable): Recebe o progresso como argumentos nomeados (opcional)
+        deadline (Deadline): Prazo da leitura (padrão: o do perfil)
+        
+    Yields:
+        str: Texto de cada página (a leitura para quando o prazo acaba)
+    """
+    return get_analyzer().iter_pages(pdf_path, progress, deadline=deadline or Deadline(CONFIG.timeout))
+
+def extract_text_from_pdf(pdf_path, progress=None):
+    """
+    Extrai texto do PDF preservando formatação com prazo e limite de páginas
+    
+    Se o prazo do perfil acabar, devolve o texto das páginas já lidas.
+    
+    Args:
+        pdf_path (str): Caminho para o arquivo PDF
+        progress (callable): Recebe o progresso como argumentos nomeados (opcional)
         
     Returns:
         tuple: (texto_extraido, sucesso)
     """
     try:
-        text = ""
-        pages_processed = 0
-        
-        with pdfplumber.open(pdf_path) as pdf:
-            total_pages = len(pdf.pages)
-            max_pages = min(total_pages, MAX_PDF_PAGES)
-            
-            for i, page in enumerate(pdf.pages):
-                if pages_processed >= max_pages:
-                    break
-                    
-                page_text = page.extract_text()
-                if page_text:
-                    text += page_text + "\n\n"
-                
-                pages_processed += 1
-                
-                # Quebra se o texto já é muito grande (performance)
-                if len(text) > MAX_TEXT_SIZE:  # 100KB de texto (reduzido)
-                    break
+        # Junta as páginas uma única vez (evita cópias quadráticas com +=)
+        text = join_pages(iter_pdf_pages(pdf_path, progress))
         
         if not text.strip():
             return None, False
@@ -119,9 +105,15 @@ def extract_text_from_pdf(pdf_path):
         print(f"Erro ao extrair texto do PDF: {e}")
         return None, False
 
+def _as_text(text):
+    """Texto de um resultado de ``extract_text_from_pdf`` (tupla) ou None se não for texto"""
+    if isinstance(text, tuple):
+        text = text[0] if text[0] is not None else ""
+    return text if isinstance(text, str) else None
+
 def search_tributos_in_text(text, tributos):
     """
-    Busca menções aos tributos no texto usando regex com word boundaries (otimizada)
+    Busca menções aos tributos no texto em uma única passada (otimizada)
     
     Args:
         text (str): Texto do PDF
@@ -130,50 +122,12 @@ def search_tributos_in_text(text, tributos):
     Returns:
         list: Lista de dicionários com trechos encontrados
     """
-    results = []
-    
-    # Verifica se text é uma tupla (caso de timeout) e extrai apenas o texto
-    if isinstance(text, tuple):
-        text = text[0] if text[0] is not None else ""
-    
-    # Garante que text é uma string
-    if not isinstance(text, str):
-        return results
-    
-    lines = text.split('\n')
-    
-    # Limita número de linhas para performance
-    if len(lines) > MAX_LINES_PROCESSED:
-        lines = lines[:MAX_LINES_PROCESSED]
+    text = _as_text(text)
+    if text is None:
+        return []
     
-    for tributo in tributos:
-        # Regex com word boundaries para evitar falsos positivos
-        pattern = r'\b' + re.escape(tributo.strip()) + r'\b'
-        
-        matches_found = 0
-        for i, line in enumerate(lines):
-            if re.search(pattern, line, re.IGNORECASE):
-                # Limita número de matches por tributo
-                if matches_found >= MAX_MATCHES_PER_TRIBUTO:
-                    break
-                
-                # Captura contexto: 5 linhas antes e depois (reduzido para performance)
-                start_idx = max(0, i - 5)
-                end_idx = min(len(lines), i + 6)
-                
-                context_lines = lines[start_idx:end_idx]
-                context = '\n'.join(context_lines)
-                
-                results.append({
-                    'tributo': tributo.strip(),
-                    'linha_encontrada': line.strip(),
-                    'contexto': context[:MAX_TEXT_SIZE],  # Limita tamanho do contexto
-                    'linha_numero': i + 1
-                })
-                
-                matches_found += 1
-    
-    return results
+    # Resultados agrupados por tributo, na ordem em que foram pedidos
+    return get_analyzer().search_text(text, tributos)
 
 def extract_entities_with_regex(text):
     """
@@ -185,46 +139,15 @@ def extract_entities_with_regex(text):
     Returns:
         list: Lista de possíveis nomes de empresas
     """
-    entities = set()
-    
-    # Verifica se text é uma tupla (caso de timeout) e extrai apenas o texto
-    if isinstance(text, tuple):
-        text = text[0] if text[0] is not None else ""
-    
-    # Garante que text é uma string
-    if not isinstance(text, str):
-        return list(entities)
-    
-    # Limita tamanho do texto para performance
-    text = text[:MAX_TEXT_SIZE]
-    
-    # Padrões para identificar empresas (otimizados)
-    patterns = [
-        # CNPJ
-        r'\d{2}\.\d{3}\.\d{3}/\d{4}-\d{2}',
-        # Palavras em maiúsculas seguidas de LTDA, S/A, etc.
-        r'[A-ZÁÊÇÕ\s]{3,30}(?:\s(?:LTDA|S/A|S\.A\.|EIRELI|EPP|ME)\.?)',
-    ]
+    text = _as_text(text)
+    if text is None:
+        return []
     
-    for pattern in patterns:
-        try:
-            matches = re.findall(pattern, text)
-            for match in matches:
-                if 5 < len(match.strip()) < 100:  # Filtrar resultados muito curtos ou longos
-                    entities.add(match.strip())
-                    
-                # Limita número de entidades encontradas
-                if len(entities) >= MAX_RESULTS_RETURNED:
-                    break
-        except:
-            continue
-    
-    return list(entities)
-
-@with_timeout(API_TIMEOUT)
+    return get_analyzer().extract_entities_regex(text)
+
 def extract_entities_with_maritaca(text):
     """
-    Extrai entidades usando a API Maritaca AI com timeout e otimizações agressivas
+    Extrai entidades usando a API Maritaca AI com saída estruturada
     
     Args:
         text (str): Texto para análise
@@ -232,169 +155,67 @@ def extract_entities_with_maritaca(text):
     Returns:
         list: Lista de nomes de empresas identificadas
     """
-    # Verifica se text é uma tupla (caso de timeout) e extrai apenas o texto
-    if isinstance(text, tuple):
-        text = text[0] if text[0] is not None else ""
-    
-    # Garante que text é uma string
-    if not isinstance(text, str):
+    text = _as_text(text)
+    if text is None:
         return []
     
-    # Se não há chave da API, retorna lista vazia
-    if not MARITACA_API_KEY or MARITACA_API_KEY == 'sua_chave_aqui':
-        return []
-    
-    try:
-        from openai import OpenAI
-        
-        client = OpenAI(
-            api_key=MARITACA_API_KEY,
-            base_url="https://chat.maritaca.ai/api"
-        )
-        
-        # Limita o texto para a API (ainda mais agressivo)
-        text_limited = text[:500]  # Reduzido drasticamente para 500 caracteres
-        
-        # Schema para saída estruturada (simplificado)
-        empresa_schema = {
-            "name": "empresas_identificadas",
-            "schema": {
-                "type": "object",
-                "properties": {
-                    "empresas": {
-                        "type": "array",
-                        "items": {
-                            "type": "object",
-                            "properties": {
-                                "nome_simplificado": {"type": "string"}
-                            },
-                            "required": ["nome_simplificado"]
-                        }
-                    }
-                },
-                "required": ["empresas"]
-            }
-        }
-        
-        response = client.beta.chat.completions.parse(
-            model="sabiazinho-3",
-            messages=[
-                {
-                    "role": "system", 
-                    "content": "Identifique empresas e forneça apenas o nome principal (sem LTDA, ME, etc.)."
-                },
-                {
-                    "role": "user", 
-                    "content": f"Empresas no texto:\n\n{text_limited}"
-                }
-            ],
-            response_format={"type": "json_schema", "json_schema": empresa_schema},
-            max_tokens=100,  # Reduzido drasticamente
-            temperature=0.1
-        )
-        
-        if response.choices[0].message.content:
-            import json
-            result = json.loads(response.choices[0].message.content)
-            empresas = result.get('empresas', [])
-            
-            # Retorna os nomes simplificados
-            nomes_simplificados = [emp.get('nome_simplificado', '') 
-                                 for emp in empresas if emp.get('nome_simplificado')]
-            
-            return nomes_simplificados[:3]  # Limita ainda mais o retorno
-                
-        return []
-        
-    except Exception as e:
-        print(f"Erro na API Maritaca: {e}")
-        return []
+    # O timeout da chamada é aplicado pelo próprio cliente
+    return get_analyzer().extract_entities_ai(text)
 
-def process_pdf_analysis(pdf_path, tributos_text):
+def process_pdf_analysis(pdf_path, tributos_text, progress=None, on_event=None, deadline=None, start_page=0,
+                         start_line=1):
     """
-    Processa a análise completa do PDF (ultra-otimizada para Render.com)
+    Processa a análise completa do PDF em streaming
+    
+    As páginas são lidas, divididas em linhas e buscadas à medida que são
+    extraídas; cada trecho é publicado em ``on_event('trecho', ...)`` assim que
+    encontrado e as empresas dele em ``on_event('empresas', ...)`` logo depois.
+    Se o prazo ou um limite do perfil parar a leitura, devolve os trechos já
+    encontrados com ``truncated`` e a faixa lida em 'cobertura'.
     
     Args:
-        pdf_path (str): Caminho para o PDF
+        pdf_path (str | bytes): Caminho para o PDF ou o seu conteúdo
         tributos_text (str): String com tributos separados por vírgula
+        progress (callable): Recebe o progresso como argumentos nomeados (opcional)
+        on_event (callable): Recebe ``(evento, dados)`` de cada trecho (opcional)
+        deadline (Deadline): Prazo e cancelamento (padrão: o do perfil)
+        start_page (int): Primeira página analisada (0-based)
+        start_line (int): Linha da primeira página onde a busca começa
         
     Returns:
         dict: Resultados da análise
     """
     try:
-        # Extrai texto do PDF
-        result = extract_text_from_pdf(pdf_path)
-        
-        # Verifica se o resultado é uma tupla (com timeout) ou apenas o texto
-        if isinstance(result, tuple):
-            text, success = result
-            if not success or text is None:
-                return {"error": "Tempo limite excedido. Tente um PDF menor ou com menos páginas."}
-        else:
-            # Resultado direto (sem timeout)
-            text = result
-            if text is None:
-                return {"error": "Não foi possível extrair texto do PDF."}
-        
-        # Processa lista de tributos (limita a 3 tributos)
-        tributos = [t.strip() for t in tributos_text.split(',') if t.strip()]
-        if not tributos:
-            return {"error": "Nenhum tributo foi especificado para busca."}
-        
-        # Limita número de tributos drasticamente
-        tributos = tributos[:3]
-        
-        # Busca tributos no texto
-        trechos_encontrados = search_tributos_in_text(text, tributos)
-        
-        if not trechos_encontrados:
-            return {"error": "Nenhum dos tributos especificados foi encontrado no PDF."}
-        
-        # Limita número de trechos processados drasticamente
-        trechos_encontrados = trechos_encontrados[:5]
-        
-        # Extrai entidades para cada trecho (processamento mínimo)
-        results = []
-        for i, trecho in enumerate(trechos_encontrados):
-            # Para economizar tempo, só processa entidades nos primeiros 3 trechos
-            if i >= 3:
-                results.append({
-                    'tributo': trecho['tributo'],
-                    'linha_encontrada': trecho['linha_encontrada'],
-                    'contexto': trecho['contexto'][:500],  # Contexto muito reduzido
-                    'linha_numero': trecho['linha_numero'],
-                    'empresas_identificadas': []  # Sem processamento de entidades para economizar tempo
-                })
-                continue
-            
-            # Extração com regex (apenas para os primeiros trechos)
-            entities_regex = extract_entities_with_regex(trecho['contexto'])
-            
-            # Extração com Maritaca AI (apenas para o primeiro trecho)
-            entities_ai = []
-            if i == 0 and MARITACA_API_KEY and MARITACA_API_KEY != 'sua_chave_aqui':
-                ai_result = extract_entities_with_maritaca(trecho['contexto'])
-                if isinstance(ai_result, tuple):
-                    entities_ai = ai_result[0] if ai_result[0] is not None else []
-                else:
-                    entities_ai = ai_result if ai_result is not None else []
-            
-            # Combina resultados (remove duplicatas)
-            all_entities = list(set(entities_regex + entities_ai))[:3]  # Máximo 3 entidades
-            
-            results.append({
-                'tributo': trecho['tributo'],
-                'linha_encontrada': trecho['linha_encontrada'],
-                'contexto': trecho['contexto'][:500],  # Contexto reduzido
-                'linha_numero': trecho['linha_numero'],
-                'empresas_identificadas': all_entities
-            })
-        
-        return {"success": True, "results": results, "total_encontrados": len(results)}
-        
+        return get_analyzer().analyze(pdf_path, tributos_text, progress=progress, on_event=on_event,
+                                      deadline=deadline, start_page=start_page, start_line=start_line)
     except Exception as e:
         return {"error": f"Erro durante processamento: {str(e)}"}
 
+def run_analysis_job(job, pdf_data, tributos, start_page=0, start_line=1):
+    """
+    Executa a análise de um upload na fila de jobs
+    
+    O prazo do perfil conta a partir do início da análise e um
+    ``DELETE /jobs/<id>`` interrompe o job no próximo ponto de verificação.
+    
+    Args:
+        job (Job): Job em execução (recebe o progresso)
+        pdf_data (bytes): Conteúdo do PDF enviado (liberado quando o job termina)
+        tributos (str): String com tributos separados por vírgula
+        start_page (int): Primeira página analisada (0-based)
+        start_line (int): Linha da primeira página onde a busca começa
+        
+    Returns:
+        dict: Resultados da análise (parciais se o prazo acabar)
+    """
+    deadline = Deadline(CONFIG.timeout, cancel_event=job.cancelled)
+    return process_pdf_analysis(pdf_data, tributos, progress=job.update, on_event=job.emit,
+                                deadline=deadline, start_page=start_page, start_line=start_line)
+
+# Fila de análises em segundo plano
+analysis_jobs = JobQueue(run_analysis_job, workers=JOB_WORKERS,
+                         max_pending=JOB_QUEUE_MAX_PENDING, result_ttl=JOB_RESULT_TTL)
+
 @app.route('/')
 def index():
     """Página inicial"""
@@ -403,97 +224,190 @@ def index():
 @app.route('/upload', methods=['POST'])
 def upload_file():
     """Processa upload do arquivo PDF (otimizado para Render.com)"""
+    # O tamanho vem do Content-Length, antes de receber o corpo (o limite
+    # inclui os outros campos do formulário, poucos bytes)
+    if request.content_length is not None and request.content_length > MAX_UPLOAD_SIZE:
+        return jsonify({"error": "Arquivo muito grande. Máximo 10MB para melhor performance."}), 400
+    
     if 'file' not in request.files:
         return jsonify({"error": "Nenhum arquivo foi enviado"}), 400
     
     file = request.files['file']
     tributos = request.form.get('tributos', '')
     
+    # Continuação de uma análise parcial ('proxima_pagina' e 'proxima_linha'
+    # da cobertura anterior)
+    try:
+        pagina_inicial = int(request.form.get('pagina_inicial') or 1)
+        linha_inicial = int(request.form.get('linha_inicial') or 1)
+    except ValueError:
+        pagina_inicial = linha_inicial = 0
+    if pagina_inicial < 1 or linha_inicial < 1:
+        return jsonify({"error": "Página inicial inválida"}), 400
+    
     if file.filename == '':
         return jsonify({"error": "Nenhum arquivo foi selecionado"}), 400
     
     if not tributos.strip():
         return jsonify({"error": "Nenhum tributo foi especificado"}), 400
     
-    # Verifica tamanho do arquivo (mais restritivo para Render.com)
-    file.seek(0, 2)  # Move para o final do arquivo
-    file_size = file.tell()
-    file.seek(0)  # Volta para o início
-    
-    # Limite mais restritivo: 10MB para Render.com gratuito
-    if file_size > 10 * 1024 * 1024:
-        return jsonify({"error": "Arquivo muito grande. Máximo 10MB para melhor performance."}), 400
-    
     if file and allowed_file(file.filename):
-        filename = secure_filename(file.filename)
-        # Adiciona timestamp para evitar conflitos
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"{timestamp}_{filename}"
-        filepath = os.path.join(UPLOAD_FOLDER, filename)
+        if not is_pdf(file):
+            return jsonify({"error": "O arquivo enviado não é um PDF válido."}), 400
+        
+        # O PDF fica em memória até a análise (sem gravar em uploads/)
+        pdf_data = upload_bytes(file)
+        
+        # Upload sem Content-Length (chunked): confere o tamanho recebido
+        if len(pdf_data) > MAX_UPLOAD_SIZE:
+            return jsonify({"error": "Arquivo muito grande. Máximo 10MB para melhor performance."}), 400
         
         try:
-            file.save(filepath)
+            # Enfileira a análise e responde imediatamente com o id do job
+            job = analysis_jobs.submit(pdf_data, tributos, pagina_inicial - 1, linha_inicial)
             
-            # Processa o arquivo com timeout global
-            import time
-            start_time = time.time()
-            
-            result = process_pdf_analysis(filepath, tributos)
-            
-            # Verifica se excedeu tempo total (failsafe)
-            if time.time() - start_time > 25:  # 25 segundos máximo total
-                result = {"error": "Processamento muito longo. Tente um arquivo menor."}
-            
-            # Remove arquivo temporário
-            if os.path.exists(filepath):
-                os.remove(filepath)
-            
-            return jsonify(result)
+            return jsonify({
+                "job_id": job.id,
+                "status": job.status,
+                "status_url": url_for('job_status', job_id=job.id),
+                "events_url": url_for('job_events', job_id=job.id),
+                "result_url": url_for('job_result', job_id=job.id),
+                "export_url": url_for('export_job_csv', job_id=job.id)
+            }), 202
             
+        except QueueFullError:
+            return jsonify({"error": "Muitas análises em andamento. Tente novamente em instantes."}), 503
         except Exception as e:
-            # Remove arquivo em caso de erro
-            if os.path.exists(filepath):
-                os.remove(filepath)
             return jsonify({"error": f"Erro ao processar arquivo: {str(e)}"}), 500
     
     return jsonify({"error": "Tipo de arquivo não permitido. Apenas PDFs são aceitos."}), 400
 
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    """Progresso de um job de análise"""
+    job = analysis_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Análise não encontrada ou expirada"}), 404
+    
+    return jsonify(job.to_dict())
+
+@app.route('/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    """Cancela um job: a análise para e devolve os trechos já encontrados"""
+    job = analysis_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Análise não encontrada ou expirada"}), 404
+    
+    job.cancel()
+    return jsonify(job.to_dict()), 202
+
+def format_sse(event, data, event_id=None):
+    """Formata um evento no protocolo Server-Sent Events"""
+    message = f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+    if event_id is not None:
+        message = f"id: {event_id}\n" + message
+    return message
+
+@app.route('/jobs/<job_id>/events')
+def job_events(job_id):
+    """
+    Stream (SSE) dos trechos encontrados por um job enquanto a análise roda
+    
+    Eventos: 'trecho' (cada ocorrência, assim que encontrada), 'empresas'
+    (empresas de um trecho já enviado), 'progresso' e 'fim'.
+    """
+    job = analysis_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Análise não encontrada ou expirada"}), 404
+    
+    # Reconexão: continua depois do último evento recebido pelo navegador
+    try:
+        position = int(request.headers.get('Last-Event-ID', -1)) + 1
+    except ValueError:
+        position = 0
+    
+    def generate(position):
+        deadline = time.monotonic() + EVENT_STREAM_MAX_SECONDS
+        last_progress = None
+        yield "retry: 1000\n\n"
+        
+        while True:
+            events, done = job.wait_events(position, EVENT_STREAM_KEEPALIVE)
+            
+            for event, data in events:
+                yield format_sse(event, data, position)
+                position += 1
+            
+            status = job.to_dict()
+            if status != last_progress:
+                yield format_sse('progresso', status)
+                last_progress = status
+            elif not events:
+                yield ": keepalive\n\n"
+            
+            if done:
+                yield format_sse('fim', status)
+                return
+            if time.monotonic() > deadline:
+                return
+    
+    return Response(generate(position), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/jobs/<job_id>/result')
+def job_result(job_id):
+    """Resultado final de um job de análise"""
+    job = analysis_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Análise não encontrada ou expirada"}), 404
+    
+    if not job.done:
+        return jsonify(job.to_dict()), 202
+    
+    if job.error:
+        return jsonify({"error": f"Erro durante processamento: {job.error}"}), 500
+    
+    return jsonify(job.result)
+
+@app.route('/jobs/<job_id>/export_csv')
+def export_job_csv(job_id):
+    """
+    Exporta para CSV o resultado de um job, sem o cliente reenviar os trechos
+    
+    Parâmetros opcionais: tributo e empresa (mesmos filtros da tabela).
+    """
+    job = analysis_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Análise não encontrada ou expirada"}), 404
+    
+    if not job.done:
+        return jsonify(job.to_dict()), 202
+    
+    if job.error or not job.result.get('success'):
+        return jsonify({"error": "Nenhum resultado para exportar"}), 400
+    
+    results = filter_results(job.result['results'], request.args.get('tributo'), request.args.get('empresa'))
+    return csv_response(results)
+
+@app.route('/stats')
+def stats():
+    """Estatísticas das chamadas à Maritaca AI e do cache de respostas"""
+    return jsonify({"maritaca": maritaca.to_dict()})
+
+@app.route('/metrics')
+def metrics():
+    """Tempos por etapa, volumes e memória das análises no formato do Prometheus"""
+    return Response(REGISTRY.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 @app.route('/export_csv', methods=['POST'])
 def export_csv():
-    """Exporta resultados para CSV"""
+    """Exporta para CSV os resultados enviados pelo cliente (gerado em streaming)"""
     data = request.json
     
-    if not data or 'results' not in data:
+    if not data or not data.get('results'):
         return jsonify({"error": "Dados inválidos para exportação"}), 400
     
-    # Cria CSV em memória
-    output = io.StringIO()
-    writer = csv.writer(output)
-    
-    # Cabeçalho
-    writer.writerow(['Tributo', 'Linha Encontrada', 'Número da Linha', 'Empresas Identificadas', 'Contexto Completo'])
-    
-    # Dados
-    for result in data['results']:
-        empresas = '; '.join(result.get('empresas_identificadas', []))
-        writer.writerow([
-            result.get('tributo', ''),
-            result.get('linha_encontrada', ''),
-            result.get('linha_numero', ''),
-            empresas,
-            result.get('contexto', '').replace('\n', ' | ')
-        ])
-    
-    # Prepara arquivo para download
-    output.seek(0)
-    csv_data = output.getvalue().encode('utf-8-sig')  # BOM para Excel
-    
-    return send_file(
-        io.BytesIO(csv_data),
-        mimetype='text/csv',
-        as_attachment=True,
-        download_name=f'analise_tributos_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
-    )
+    return csv_response(data['results'])
 
 @app.errorhandler(413)
 def too_large(e):
@@ -8,17 +8,159 @@ Aplicação para análise de Diários Oficiais Municipais
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, scrolledtext
 import os
-import re
 import csv
 import threading
+import multiprocessing
+from collections import deque
 from datetime import datetime
-import pdfplumber
-import requests
 from dotenv import load_dotenv
 
+from analisador.cache import PageTextCache
+from analisador.core import Analyzer, get_profile
+from analisador.llm_cache import LLMCache
+from analisador.maritaca import MaritacaClient
+from analisador.progress import describe_progress, progress_fraction
+
 # Carrega variáveis de ambiente
 load_dotenv()
 
+# Limites da análise: perfil 'desktop' (10 linhas de contexto; ver analisador/core.py)
+CONFIG = get_profile('desktop')
+
+# Tabela de resultados: linhas inseridas por ciclo da interface (a janela
+# continua respondendo entre um lote e outro) e intervalo entre os ciclos
+TREE_BATCH_SIZE = 200
+TREE_POLL_MS = 50
+
+# Linhas materializadas de cada vez; as seguintes entram ao rolar até o fim
+TREE_PAGE_SIZE = 1000
+
+# Fração da barra de rolagem a partir da qual a próxima página é carregada
+TREE_SCROLL_THRESHOLD = 0.9
+
+def _shorten(text, size):
+    return text[:size] + "..." if len(text) > size else text
+
+def row_values(result):
+    """Valores das colunas da tabela para um trecho"""
+    empresas = '; '.join(result.get('empresas_identificadas', []))
+    return (
+        result['tributo'],
+        _shorten(result['linha_encontrada'], 50),
+        result['linha_numero'],
+        _shorten(empresas, 50),
+        _shorten(result['contexto'], 100).replace('\n', ' ')
+    )
+
+class ResultsTable:
+    """
+    Resultados do Treeview inseridos em lotes e materializados sob demanda
+    
+    A thread da análise só enfileira os eventos ('trecho' e 'empresas'); a
+    thread da interface chama ``flush`` periodicamente, registra os eventos
+    (só acrescentar a uma lista) e insere no máximo ``batch_size`` linhas
+    por vez no Treeview, a parte cara. Só as primeiras ``page_size`` linhas são
+    criadas no Treeview; as demais entram quando a rolagem chega perto do
+    fim, então a tabela continua leve com dezenas de milhares de trechos.
+    """
+    
+    def __init__(self, tree, batch_size=TREE_BATCH_SIZE, page_size=TREE_PAGE_SIZE):
+        """
+        Args:
+            tree (ttk.Treeview): Tabela de resultados
+            batch_size (int): Linhas inseridas por ``flush``
+            page_size (int): Linhas materializadas a cada página
+        """
+        self.tree = tree
+        self.batch_size = batch_size
+        self.page_size = page_size
+        self.results = []
+        self._pending = deque()
+        self._items = {}
+        self._by_id = {}
+        self._item_by_id = {}
+        self._limit = page_size
+    
+    def push(self, event, data):
+        """Enfileira um evento da análise (chamado pela thread de trabalho)"""
+        self._pending.append((event, data))
+    
+    def load(self, results):
+        """Substitui a tabela pelos resultados finais (descarta os eventos pendentes)"""
+        self.clear()
+        self.results = list(results)
+    
+    def clear(self):
+        """Remove todas as linhas e resultados"""
+        self._pending.clear()
+        self.tree.delete(*self.tree.get_children())
+        self.results = []
+        self._items = {}
+        self._by_id = {}
+        self._item_by_id = {}
+        self._limit = self.page_size
+    
+    @property
+    def shown(self):
+        """Número de linhas materializadas no Treeview"""
+        return len(self._items)
+    
+    def flush(self):
+        """
+        Registra os eventos pendentes e insere um lote de linhas (thread da interface)
+        
+        Returns:
+            bool: True se ainda há eventos ou linhas esperando
+        """
+        while self._pending:
+            event, data = self._pending.popleft()
+            if event == 'trecho':
+                self.results.append(data)
+                self._by_id[data['id']] = data
+            elif event == 'empresas':
+                self._update_entities(data['id'], data['empresas_identificadas'])
+        
+        end = min(len(self.results), self._limit, self.shown + self.batch_size)
+        for result in self.results[self.shown:end]:
+            item = self.tree.insert('', 'end', values=row_values(result))
+            self._items[item] = result
+            if 'id' in result:
+                self._item_by_id[result['id']] = item
+        
+        return self.shown < min(len(self.results), self._limit)
+    
+    def _update_entities(self, trecho_id, empresas):
+        result = self._by_id.get(trecho_id)
+        if result is None:
+            return
+        result['empresas_identificadas'] = empresas
+        # Linha ainda não materializada: já entra com as empresas
+        item = self._item_by_id.get(trecho_id)
+        if item is not None:
+            self.tree.item(item, values=row_values(result))
+    
+    def on_scroll(self, first, last):
+        """
+        Libera a próxima página quando a rolagem chega perto do fim
+        
+        Args:
+            first (str): Início da área visível (fração, do ``yscrollcommand``)
+            last (str): Fim da área visível
+        
+        Returns:
+            bool: True se há novas linhas para materializar
+        """
+        if float(last) < TREE_SCROLL_THRESHOLD or self.shown < self._limit:
+            return False
+        if self._limit >= len(self.results):
+            return False
+        self._limit += self.page_size
+        return True
+    
+    def get(self, item):
+        """Resultado de uma linha do Treeview (ou None)"""
+        return self._items.get(item)
+
 class TributoAnalyzer:
     def __init__(self, root):
         self.root = root
@@ -29,6 +171,12 @@ class TributoAnalyzer:
         # Configurações
         self.maritaca_api_key = os.environ.get('MARITACA_API_KEY', '')
         self.current_results = []
+        self.analyzed_file = None
+        self._analyzing = False
+        self._pumping = False
+        self.page_cache = PageTextCache()
+        self.llm_cache = LLMCache()
+        self.maritaca = MaritacaClient(self.maritaca_api_key, timeout=CONFIG.api_timeout, cache=self.llm_cache)
         
         # Estilo
         self.setup_style()
@@ -172,14 +320,17 @@ class TributoAnalyzer:
         self.results_tree.column('Empresas', width=150, minwidth=100)
         self.results_tree.column('Contexto', width=300, minwidth=200)
         
-        # Scrollbars
-        v_scrollbar = ttk.Scrollbar(results_frame, orient=tk.VERTICAL, command=self.results_tree.yview)
+        # Linhas inseridas em lotes e sob demanda (ver ResultsTable)
+        self.table = ResultsTable(self.results_tree)
+        
+        # Scrollbars (a vertical também carrega a próxima página de linhas)
+        self.v_scrollbar = ttk.Scrollbar(results_frame, orient=tk.VERTICAL, command=self.results_tree.yview)
         h_scrollbar = ttk.Scrollbar(results_frame, orient=tk.HORIZONTAL, command=self.results_tree.xview)
-        self.results_tree.configure(yscrollcommand=v_scrollbar.set, xscrollcommand=h_scrollbar.set)
+        self.results_tree.configure(yscrollcommand=self._on_tree_scroll, xscrollcommand=h_scrollbar.set)
         
         # Grid dos resultados
         self.results_tree.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
-        v_scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
+        self.v_scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
         h_scrollbar.grid(row=1, column=0, sticky=(tk.W, tk.E))
         
         # Botões de ação
@@ -240,6 +391,10 @@ class TributoAnalyzer:
                 f.write('\n'.join(lines))
             
             self.maritaca_api_key = api_key
+            
+            # Novo cliente com a nova chave (o anterior fecha as conexões)
+            self.maritaca.close()
+            self.maritaca = MaritacaClient(api_key, timeout=CONFIG.api_timeout, cache=self.llm_cache)
             messagebox.showinfo("Sucesso", "Chave da API salva com sucesso!")
             
         except Exception as e:
@@ -262,208 +417,78 @@ class TributoAnalyzer:
             messagebox.showerror("Erro", "Arquivo não encontrado")
             return
         
-        # Desabilita botão e inicia progresso
+        # Desabilita botão e inicia progresso (indeterminado até saber o total de páginas)
         self.analyze_button.config(state='disabled')
+        self.progress_bar.config(mode='indeterminate')
         self.progress_bar.start()
         self.status_var.set("Analisando PDF...")
         
+        # Os trechos entram na tabela em lotes enquanto a análise roda
+        self.table.clear()
+        self.current_results = []
+        self.analyzed_file = file_path
+        self.export_button.config(state='disabled')
+        self._analyzing = True
+        self._schedule_pump()
+        
         # Inicia análise em thread separada
         thread = threading.Thread(target=self.analyze_pdf, args=(file_path, tributos))
         thread.daemon = True
         thread.start()
     
+    def analyzer(self):
+        """Motor de análise com o perfil desktop e os recursos desta janela"""
+        return Analyzer(CONFIG, page_cache=self.page_cache, maritaca=self.maritaca, log=self.update_status)
+    
     def analyze_pdf(self, file_path, tributos_text):
         """Analisa o PDF (executado em thread separada)"""
         try:
-            # Extrai texto do PDF
-            self.update_status("Extraindo texto do PDF...")
-            text = self.extract_text_from_pdf(file_path)
+            # Extrai e busca em streaming (páginas -> linhas -> ocorrências -> empresas)
+            self.update_status("Extraindo texto e buscando tributos...")
+            result = self.analyzer().analyze(file_path, tributos_text, progress=self.report_progress,
+                                             on_event=self.table.push)
             
-            if not text:
-                self.show_error("Não foi possível extrair texto do PDF")
+            if 'error' in result:
+                self.root.after(0, self.show_error, result['error'])
                 return
             
-            # Processa tributos
-            tributos = [t.strip() for t in tributos_text.split(',') if t.strip()]
-            
-            # Busca tributos
-            self.update_status("Buscando tributos no texto...")
-            results = self.search_tributos_in_text(text, tributos)
-            
-            if not results:
-                self.show_error("Nenhum dos tributos especificados foi encontrado no PDF")
-                return
-            
-            # Extrai entidades
-            self.update_status("Identificando empresas...")
-            for i, result in enumerate(results):
-                self.update_status(f"Processando resultado {i+1}/{len(results)}...")
-                
-                # Regex
-                entities_regex = self.extract_entities_with_regex(result['contexto'])
-                
-                # API Maritaca (se disponível)
-                entities_ai = []
-                if self.maritaca_api_key:
-                    entities_ai = self.extract_entities_with_maritaca(result['contexto'])
-                
-                # Combina resultados
-                all_entities = list(set(entities_regex + entities_ai))
-                result['empresas_identificadas'] = all_entities
-            
             # Atualiza interface
-            self.root.after(0, self.show_results, results)
+            self.root.after(0, self.show_results, result['results'])
             
         except Exception as e:
             self.root.after(0, self.show_error, f"Erro durante análise: {str(e)}")
     
-    def extract_text_from_pdf(self, pdf_path):
-        """Extrai texto do PDF"""
-        try:
-            text = ""
-            with pdfplumber.open(pdf_path) as pdf:
-                for page in pdf.pages:
-                    page_text = page.extract_text()
-                    if page_text:
-                        text += page_text + "\n\n"
-            return text
-        except Exception as e:
-            print(f"Erro ao extrair texto: {e}")
-            return None
+    def report_progress(self, **progress):
+        """Recebe o progresso da análise (thread de trabalho, já espaçado pelo núcleo)"""
+        self.root.after(0, self.show_progress, progress)
     
-    def search_tributos_in_text(self, text, tributos):
-        """Busca tributos no texto"""
-        results = []
-        lines = text.split('\n')
-        
-        for tributo in tributos:
-            pattern = r'\b' + re.escape(tributo.strip()) + r'\b'
-            
-            for i, line in enumerate(lines):
-                if re.search(pattern, line, re.IGNORECASE):
-                    # Contexto: 10 linhas antes e depois
-                    start_idx = max(0, i - 10)
-                    end_idx = min(len(lines), i + 11)
-                    
-                    context_lines = lines[start_idx:end_idx]
-                    context = '\n'.join(context_lines)
-                    
-                    results.append({
-                        'tributo': tributo.strip(),
-                        'linha_encontrada': line.strip(),
-                        'contexto': context,
-                        'linha_numero': i + 1,
-                        'empresas_identificadas': []
-                    })
-        
-        return results
-    
-    def extract_entities_with_regex(self, text):
-        """Extrai entidades usando regex"""
-        entities = set()
-        
-        # Padrões para identificar empresas
-        patterns = [
-            # CNPJ
-            r'\d{2}\.\d{3}\.\d{3}/\d{4}-\d{2}',
-            # Razão social (palavras em maiúsculo seguidas de LTDA, ME, etc.)
-            r'[A-ZÁÊÇÕ][A-ZÁÊÇÕ\s]{10,50}(?:LTDA|ME|EIRELI|S\.A\.|SA|EPP)',
-            # Nomes próprios em maiúsculo
-            r'[A-ZÁÊÇÕ][A-ZÁÊÇÕ\s]{5,30}(?=\s|$)',
-        ]
-        
-        for pattern in patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            for match in matches:
-                if len(match.strip()) > 3:
-                    entities.add(match.strip())
-                    if len(entities) >= 10:
-                        break
-        
-        return list(entities)
-    
-    def extract_entities_with_maritaca(self, text):
-        """Extrai entidades usando API Maritaca"""
-        if not self.maritaca_api_key:
-            return []
-        
-        try:
-            from openai import OpenAI
-            
-            client = OpenAI(
-                api_key=self.maritaca_api_key,
-                base_url="https://chat.maritaca.ai/api"
-            )
-            
-            # Limita texto
-            text_limited = text[:1000]
-            
-            response = client.chat.completions.create(
-                model="sabiazinho-3",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "Identifique nomes de empresas no texto e retorne apenas os nomes principais (sem LTDA, ME, etc.)."
-                    },
-                    {
-                        "role": "user",
-                        "content": f"Empresas no texto:\n\n{text_limited}"
-                    }
-                ],
-                max_tokens=200,
-                temperature=0.1
-            )
-            
-            if response.choices[0].message.content:
-                # Extrai nomes das empresas da resposta
-                content = response.choices[0].message.content
-                lines = content.split('\n')
-                empresas = []
-                
-                for line in lines:
-                    line = line.strip()
-                    if line and not line.startswith('Empresas') and len(line) > 3:
-                        # Remove numeração e pontuação
-                        line = re.sub(r'^\d+[\.\-\)]\s*', '', line)
-                        line = re.sub(r'^[\-\*]\s*', '', line)
-                        if line:
-                            empresas.append(line)
-                
-                return empresas[:5]
-            
-            return []
-            
-        except Exception as e:
-            print(f"Erro na API Maritaca: {e}")
-            return []
+    def show_progress(self, progress):
+        """Atualiza a barra (páginas ou regiões concluídas) e o status com o tempo restante"""
+        if not self._analyzing:
+            return
+        fraction = progress_fraction(progress)
+        if fraction is not None:
+            if str(self.progress_bar.cget('mode')) != 'determinate':
+                self.progress_bar.stop()
+                self.progress_bar.config(mode='determinate', maximum=100)
+            self.progress_var.set(fraction * 100)
+        self.status_var.set(describe_progress(progress))
     
     def update_status(self, message):
         """Atualiza status na thread principal"""
         self.root.after(0, lambda: self.status_var.set(message))
     
     def show_results(self, results):
-        """Mostra resultados na interface"""
-        self.current_results = results
-        
-        # Limpa resultados anteriores
-        for item in self.results_tree.get_children():
-            self.results_tree.delete(item)
-        
-        # Adiciona novos resultados
-        for result in results:
-            empresas = '; '.join(result.get('empresas_identificadas', []))
-            contexto_short = result['contexto'][:100] + "..." if len(result['contexto']) > 100 else result['contexto']
-            
-            self.results_tree.insert('', 'end', values=(
-                result['tributo'],
-                result['linha_encontrada'][:50] + "..." if len(result['linha_encontrada']) > 50 else result['linha_encontrada'],
-                result['linha_numero'],
-                empresas[:50] + "..." if len(empresas) > 50 else empresas,
-                contexto_short.replace('\n', ' ')
-            ))
+        """Mostra os resultados finais (agrupados por tributo) no lugar das linhas parciais"""
+        self._analyzing = False
+        self.table.load(results)
+        self.current_results = self.table.results
+        self._schedule_pump()
         
         # Atualiza interface
         self.progress_bar.stop()
+        self.progress_bar.config(mode='determinate')
+        self.progress_var.set(100)
         self.analyze_button.config(state='normal')
         self.export_button.config(state='normal')
         self.clear_button.config(state='normal')
@@ -471,36 +496,47 @@ class TributoAnalyzer:
     
     def show_error(self, message):
         """Mostra erro na interface"""
+        self._analyzing = False
         self.progress_bar.stop()
+        self.progress_var.set(0)
         self.analyze_button.config(state='normal')
         self.status_var.set(f"❌ {message}")
         messagebox.showerror("Erro", message)
     
+    def _schedule_pump(self):
+        """Agenda o próximo ciclo de atualização da tabela (se ainda não agendado)"""
+        if not self._pumping:
+            self._pumping = True
+            self.root.after(TREE_POLL_MS, self._pump)
+    
+    def _pump(self):
+        """Insere um lote de linhas e reagenda enquanto houver trabalho"""
+        more = self.table.flush()
+        if more or self._analyzing:
+            self.root.after(TREE_POLL_MS, self._pump)
+        else:
+            self._pumping = False
+    
+    def _on_tree_scroll(self, first, last):
+        """Repassa a rolagem à barra e carrega a próxima página perto do fim"""
+        self.v_scrollbar.set(first, last)
+        if self.table.on_scroll(first, last):
+            self._schedule_pump()
+    
     def show_full_context(self, event):
         """Mostra contexto completo em janela separada"""
         selection = self.results_tree.selection()
         if not selection:
             return
         
-        item = self.results_tree.item(selection[0])
-        values = item['values']
-        
-        if not values:
-            return
-        
-        # Encontra o resultado completo
-        tributo = values[0]
-        linha_num = values[2]
-        
-        result = None
-        for r in self.current_results:
-            if r['tributo'] == tributo and r['linha_numero'] == linha_num:
-                result = r
-                break
-        
+        # Resultado completo pelo id da linha
+        result = self.table.get(selection[0])
         if not result:
             return
         
+        tributo = result['tributo']
+        linha_num = result['linha_numero']
+        
         # Cria janela de contexto
         context_window = tk.Toplevel(self.root)
         context_window.title(f"Contexto - {tributo} (Linha {linha_num})")
@@ -515,7 +551,8 @@ class TributoAnalyzer:
         info_frame.pack(fill=tk.X, pady=(0, 10))
         
         ttk.Label(info_frame, text=f"Tributo: {result['tributo']}", style='Subtitle.TLabel').pack(anchor=tk.W)
-        ttk.Label(info_frame, text=f"Linha: {result['linha_numero']}", style='Info.TLabel').pack(anchor=tk.W)
+        ttk.Label(info_frame, text=f"Página {result['pagina']}, linha {result['linha_pagina']} "
+                                   f"(linha {result['linha_numero']} do texto)", style='Info.TLabel').pack(anchor=tk.W)
         ttk.Label(info_frame, text=f"Empresas: {'; '.join(result.get('empresas_identificadas', []))}", style='Info.TLabel').pack(anchor=tk.W)
         
         # Contexto
@@ -525,6 +562,34 @@ class TributoAnalyzer:
         context_text.pack(fill=tk.BOTH, expand=True)
         context_text.insert(tk.END, result['contexto'])
         context_text.config(state=tk.DISABLED)
+        
+        ttk.Button(frame, text=f"📄 Ver página {result['pagina']} inteira",
+                   command=lambda: self.show_page(result, context_text)).pack(anchor=tk.W, pady=(10, 0))
+    
+    def show_page(self, result, context_text):
+        """Troca o contexto pela página inteira do trecho, com a linha destacada"""
+        file_path = self.analyzed_file
+        
+        def load():
+            # Só a página do trecho é extraída (ou lida do cache de páginas)
+            try:
+                text = self.analyzer().page_text(file_path, result['pagina'])
+            except Exception as e:
+                self.root.after(0, self.show_error, f"Erro ao ler a página: {e}")
+                return
+            self.root.after(0, fill, text)
+        
+        def fill(text):
+            context_text.config(state=tk.NORMAL)
+            context_text.delete('1.0', tk.END)
+            context_text.insert(tk.END, text)
+            line = f"{result['linha_pagina']}.0"
+            context_text.tag_add('trecho', line, f"{line} lineend")
+            context_text.tag_config('trecho', background='#fff3cd')
+            context_text.see(line)
+            context_text.config(state=tk.DISABLED)
+        
+        threading.Thread(target=load, daemon=True).start()
     
     def export_csv(self):
         """Exporta resultados para CSV"""
@@ -567,9 +632,7 @@ class TributoAnalyzer:
     
     def clear_results(self):
         """Limpa os resultados"""
-        for item in self.results_tree.get_children():
-            self.results_tree.delete(item)
-        
+        self.table.clear()
         self.current_results = []
         self.export_button.config(state='disabled')
         self.clear_button.config(state='disabled')
@@ -582,4 +645,5 @@ def main():
     root.mainloop()
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # Necessário para o pool de extração no executável
     main() 
\ No newline at end of file
@@ -7,23 +7,36 @@ Simula uma aplicação desktop sem limitações de timeout
 """
 
 import os
-import re
-import csv
-import io
 import webbrowser
 import threading
 import time
+import shutil
+import sqlite3
+import multiprocessing
 from datetime import datetime
+from functools import partial
+from itertools import chain, islice
 from werkzeug.utils import secure_filename
-from flask import Flask, render_template, request, jsonify, send_file
-import pdfplumber
-import requests
+from flask import Flask, Response, render_template, request, jsonify
 from dotenv import load_dotenv
 
+from analisador.batch import find_pdfs, run_batch
+from analisador.cache import PageTextCache
+from analisador.core import Analyzer, get_profile
+from analisador.export import csv_response, filter_results
+from analisador.index import DocumentIndex
+from analisador.llm_cache import LLMCache
+from analisador.maritaca import MaritacaClient
+from analisador.metrics import REGISTRY
+from analisador.progress import describe_progress
+from analisador.uploads import UploadRequest, is_pdf, upload_source
+
 # Carrega variáveis de ambiente
 load_dotenv()
 
 app = Flask(__name__)
+# Uploads recebidos em memória ou em tmpfs (ver analisador/uploads.py)
+app.request_class = UploadRequest
 app.secret_key = os.environ.get('SECRET_KEY', 'local-desktop-key')
 app.config['MAX_CONTENT_LENGTH'] = 500 * 1024 * 1024  # 500MB max (sem limitações!)
 
@@ -32,48 +45,69 @@ UPLOAD_FOLDER = 'uploads'
 ALLOWED_EXTENSIONS = {'pdf'}
 MARITACA_API_KEY = os.environ.get('MARITACA_API_KEY', '')
 
+# Limites da análise: perfil 'local' (sem limites, 15 linhas de contexto;
+# ver analisador/core.py)
+CONFIG = get_profile('local')
+
 # Cria pasta de uploads se não existir
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
+# Cache do texto extraído (evita reprocessar o mesmo PDF)
+page_cache = PageTextCache()
+
+# Progresso das análises em andamento, pelo id enviado pela página
+# (consultado por polling em /progress/<id> enquanto o upload não responde)
+analysis_progress = {}
+
+# Cliente da Maritaca AI reaproveitado entre chamadas (conexões persistentes),
+# com as respostas memorizadas em disco
+maritaca = MaritacaClient(MARITACA_API_KEY, timeout=CONFIG.api_timeout, cache=LLMCache())
+
+# Índice das linhas dos documentos já analisados (consultas sem reenviar o PDF)
+try:
+    search_index = DocumentIndex()
+except sqlite3.Error as e:
+    print(f"⚠️ Índice de busca desativado: {e}")
+    search_index = None
+
 def allowed_file(filename):
     """Verifica se o arquivo tem extensão permitida"""
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def extract_text_from_pdf(pdf_path):
+def get_analyzer():
+    """Motor de análise com o perfil local e os recursos desta aplicação"""
+    return Analyzer(CONFIG, page_cache=page_cache, maritaca=maritaca, index=search_index, log=print)
+
+def extract_pages_from_pdf(pdf_path, workers=None, sha256=None):
     """
-    Extrai texto do PDF preservando formatação (SEM LIMITAÇÕES)
+    Extrai o texto do PDF página a página (SEM LIMITAÇÕES)
     
     Args:
         pdf_path (str): Caminho para o arquivo PDF
+        workers (int): Processos de extração (padrão: PDF_EXTRACTION_WORKERS)
+        sha256 (str): Hash do arquivo, se já calculado
         
-    Returns:
-        str: Texto extraído ou None se erro
+    Yields:
+        str: Texto de cada página, na ordem do documento
     """
-    try:
-        text = ""
-        with pdfplumber.open(pdf_path) as pdf:
-            total_pages = len(pdf.pages)
-            print(f"📄 Processando {total_pages} páginas...")
-            
-            for i, page in enumerate(pdf.pages):
-                print(f"📖 Processando página {i+1}/{total_pages}")
-                page_text = page.extract_text()
-                if page_text:
-                    text += page_text + "\n\n"
-        
-        if not text.strip():
-            return None
-            
-        print(f"✅ Texto extraído: {len(text)} caracteres")
-        return text
+    yield from get_analyzer().iter_pages(pdf_path, workers=workers, sha256=sha256)
+
+def search_tributos_in_lines(lines, tributos):
+    """
+    Busca menções aos tributos linha a linha, em streaming (SEM LIMITAÇÕES)
+    
+    Args:
+        lines (iterable): Tuplas (numero_linha, linha)
+        tributos (list): Lista de tributos para buscar
         
-    except Exception as e:
-        print(f"❌ Erro ao extrair texto do PDF: {e}")
-        return None
+    Returns:
+        list: Lista de dicionários com trechos encontrados
+    """
+    return get_analyzer().search_lines(lines, tributos)
 
 def search_tributos_in_text(text, tributos):
     """
-    Busca menções aos tributos no texto usando regex (SEM LIMITAÇÕES)
+    Busca menções aos tributos no texto em uma única passada (SEM LIMITAÇÕES)
     
     Args:
         text (str): Texto do PDF
@@ -82,38 +116,7 @@ def search_tributos_in_text(text, tributos):
     Returns:
         list: Lista de dicionários com trechos encontrados
     """
-    results = []
-    lines = text.split('\n')
-    
-    print(f"🔍 Buscando em {len(lines)} linhas de texto...")
-    
-    for tributo in tributos:
-        print(f"🎯 Buscando: {tributo}")
-        # Regex com word boundaries para evitar falsos positivos
-        pattern = r'\b' + re.escape(tributo.strip()) + r'\b'
-        
-        matches_found = 0
-        for i, line in enumerate(lines):
-            if re.search(pattern, line, re.IGNORECASE):
-                # Captura contexto: 15 linhas antes e depois (mais contexto que a versão web)
-                start_idx = max(0, i - 15)
-                end_idx = min(len(lines), i + 16)
-                
-                context_lines = lines[start_idx:end_idx]
-                context = '\n'.join(context_lines)
-                
-                results.append({
-                    'tributo': tributo.strip(),
-                    'linha_encontrada': line.strip(),
-                    'contexto': context,
-                    'linha_numero': i + 1
-                })
-                
-                matches_found += 1
-        
-        print(f"✅ {tributo}: {matches_found} ocorrências encontradas")
-    
-    return results
+    return get_analyzer().search_text(text, tributos)
 
 def extract_entities_with_regex(text):
     """
@@ -125,31 +128,7 @@ def extract_entities_with_regex(text):
     Returns:
         list: Lista de possíveis nomes de empresas
     """
-    entities = set()
-    
-    # Padrões para identificar empresas (mais abrangentes)
-    patterns = [
-        # CNPJ
-        r'\d{2}\.\d{3}\.\d{3}/\d{4}-\d{2}',
-        # Razão social completa
-        r'[A-ZÁÊÇÕ][A-ZÁÊÇÕ\s]{10,80}(?:LTDA|ME|EIRELI|S\.A\.|SA|EPP|MICROEMPRESA|EMPRESA)',
-        # Nomes próprios em maiúsculo
-        r'[A-ZÁÊÇÕ][A-ZÁÊÇÕ\s]{8,50}(?=\s|$)',
-        # Empresas com números
-        r'[A-ZÁÊÇÕ][A-ZÁÊÇÕ\s\d]{5,50}(?:LTDA|ME|EIRELI)',
-    ]
-    
-    for pattern in patterns:
-        try:
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            for match in matches:
-                cleaned = match.strip()
-                if len(cleaned) > 5 and not cleaned.isdigit():
-                    entities.add(cleaned)
-        except:
-            continue
-    
-    return list(entities)
+    return get_analyzer().extract_entities_regex(text)
 
 def extract_entities_with_maritaca(text):
     """
@@ -161,119 +140,30 @@ def extract_entities_with_maritaca(text):
     Returns:
         list: Lista de nomes de empresas identificadas
     """
-    if not MARITACA_API_KEY or MARITACA_API_KEY == 'sua_chave_aqui':
-        return []
-    
-    try:
-        from openai import OpenAI
-        
-        client = OpenAI(
-            api_key=MARITACA_API_KEY,
-            base_url="https://chat.maritaca.ai/api"
-        )
-        
-        # Limita o texto para a API (mas mais generoso que a versão web)
-        text_limited = text[:2000]  # 2KB ao invés de 500 bytes
-        
-        response = client.chat.completions.create(
-            model="sabiazinho-3",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "Você é um especialista em identificar nomes de empresas em textos oficiais. Identifique todas as empresas mencionadas e forneça apenas os nomes principais (removendo LTDA, ME, EIRELI, etc.)."
-                },
-                {
-                    "role": "user",
-                    "content": f"Identifique todas as empresas no texto abaixo:\n\n{text_limited}"
-                }
-            ],
-            max_tokens=500,  # Mais tokens que a versão web
-            temperature=0.1
-        )
-        
-        if response.choices[0].message.content:
-            # Extrai nomes das empresas da resposta
-            content = response.choices[0].message.content
-            lines = content.split('\n')
-            empresas = []
-            
-            for line in lines:
-                line = line.strip()
-                if line and not line.startswith(('Empresas', 'As empresas', 'Identifiquei')) and len(line) > 3:
-                    # Remove numeração e pontuação
-                    line = re.sub(r'^\d+[\.\-\)]\s*', '', line)
-                    line = re.sub(r'^[\-\*]\s*', '', line)
-                    if line:
-                        empresas.append(line)
-            
-            return empresas
-            
-        return []
-        
-    except Exception as e:
-        print(f"⚠️ Erro na API Maritaca: {e}")
-        return []
+    return get_analyzer().extract_entities_ai(text)
 
-def process_pdf_analysis(pdf_path, tributos_text):
+def process_pdf_analysis(pdf_path, tributos_text, workers=None, document_name=None, progress=None):
     """
     Processa a análise completa do PDF (SEM LIMITAÇÕES)
     
+    As linhas lidas também alimentam o índice de busca, para consultas
+    posteriores sem reenviar o PDF.
+    
     Args:
-        pdf_path (str): Caminho para o PDF
+        pdf_path (str | bytes): Caminho para o PDF ou o seu conteúdo
         tributos_text (str): String com tributos separados por vírgula
+        workers (int): Processos de extração (1 dentro da análise em lote)
+        document_name (str): Nome do documento no índice (padrão: nome do arquivo)
+        progress (callable): Recebe o progresso com o tempo restante estimado (opcional)
         
     Returns:
         dict: Resultados da análise
     """
     try:
-        print(f"🚀 Iniciando análise de: {os.path.basename(pdf_path)}")
-        
-        # Extrai texto do PDF
-        text = extract_text_from_pdf(pdf_path)
-        
-        if not text:
-            return {"error": "Não foi possível extrair texto do PDF. Verifique se o arquivo contém texto (não é apenas imagem)."}
-        
-        # Processa lista de tributos
-        tributos = [t.strip() for t in tributos_text.split(',') if t.strip()]
-        if not tributos:
-            return {"error": "Nenhum tributo foi especificado para busca."}
-        
-        print(f"🎯 Buscando {len(tributos)} tributos: {', '.join(tributos)}")
-        
-        # Busca tributos no texto
-        trechos_encontrados = search_tributos_in_text(text, tributos)
-        
-        if not trechos_encontrados:
-            return {"error": "Nenhum dos tributos especificados foi encontrado no PDF."}
-        
-        print(f"📋 Processando {len(trechos_encontrados)} trechos encontrados...")
-        
-        # Extrai entidades para cada trecho
-        results = []
-        for i, trecho in enumerate(trechos_encontrados):
-            print(f"🔍 Processando trecho {i+1}/{len(trechos_encontrados)}")
-            
-            # Extração com regex
-            entities_regex = extract_entities_with_regex(trecho['contexto'])
-            
-            # Extração com Maritaca AI
-            entities_ai = extract_entities_with_maritaca(trecho['contexto'])
-            
-            # Combina resultados (remove duplicatas)
-            all_entities = list(set(entities_regex + entities_ai))
-            
-            results.append({
-                'tributo': trecho['tributo'],
-                'linha_encontrada': trecho['linha_encontrada'],
-                'contexto': trecho['contexto'],
-                'linha_numero': trecho['linha_numero'],
-                'empresas_identificadas': all_entities
-            })
-        
-        print(f"✅ Análise concluída! {len(results)} resultados processados")
-        return {"success": True, "results": results, "total_encontrados": len(results)}
-        
+        name = document_name or (os.path.basename(pdf_path) if isinstance(pdf_path, str) else 'upload')
+        print(f"🚀 Iniciando análise de: {name}")
+        return get_analyzer().analyze(pdf_path, tributos_text, progress=progress, workers=workers,
+                                      document_name=document_name)
     except Exception as e:
         print(f"❌ Erro durante processamento: {str(e)}")
         return {"error": f"Erro durante processamento: {str(e)}"}
@@ -291,6 +181,7 @@ def upload_file():
     
     file = request.files['file']
     tributos = request.form.get('tributos', '')
+    progresso_id = request.form.get('progresso_id')
     
     if file.filename == '':
         return jsonify({"error": "Nenhum arquivo foi selecionado"}), 400
@@ -298,76 +189,234 @@ def upload_file():
     if not tributos.strip():
         return jsonify({"error": "Nenhum tributo foi especificado"}), 400
     
+    def report_progress(**progress):
+        # Terminal e página (polling) acompanham páginas, trechos e tempo restante
+        print(describe_progress(progress))
+        if progresso_id:
+            analysis_progress[progresso_id] = progress
+    
     if file and allowed_file(file.filename):
-        filename = secure_filename(file.filename)
-        # Adiciona timestamp para evitar conflitos
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"{timestamp}_{filename}"
-        filepath = os.path.join(UPLOAD_FOLDER, filename)
+        if not is_pdf(file):
+            return jsonify({"error": "O arquivo enviado não é um PDF válido."}), 400
         
         try:
-            print(f"💾 Salvando arquivo: {filename}")
-            file.save(filepath)
-            
-            # Mostra tamanho do arquivo
-            size_mb = os.path.getsize(filepath) / (1024 * 1024)
-            print(f"📊 Tamanho do arquivo: {size_mb:.1f} MB")
+            # Analisa direto do upload recebido (memória ou tmpfs), sem copiar para uploads/
+            source = upload_source(file)
+            size = os.path.getsize(source) if isinstance(source, str) else len(source)
+            print(f"📊 Tamanho do arquivo: {size / (1024 * 1024):.1f} MB")
             
             # Processa o arquivo (SEM TIMEOUT!)
-            result = process_pdf_analysis(filepath, tributos)
-            
-            # Remove arquivo temporário
-            if os.path.exists(filepath):
-                os.remove(filepath)
-                print(f"🗑️ Arquivo temporário removido")
+            result = process_pdf_analysis(source, tributos, document_name=secure_filename(file.filename),
+                                          progress=report_progress)
             
             return jsonify(result)
             
         except Exception as e:
-            # Remove arquivo em caso de erro
-            if os.path.exists(filepath):
-                os.remove(filepath)
             print(f"❌ Erro: {str(e)}")
             return jsonify({"error": f"Erro ao processar arquivo: {str(e)}"}), 500
+        finally:
+            if progresso_id:
+                analysis_progress.pop(progresso_id, None)
     
     return jsonify({"error": "Tipo de arquivo não permitido. Apenas PDFs são aceitos."}), 400
 
+@app.route('/progress/<progresso_id>')
+def upload_progress(progresso_id):
+    """
+    Progresso de uma análise enviada com 'progresso_id' (páginas, trechos,
+    empresas pendentes e 'eta_s'), com o resumo pronto para exibir
+    """
+    progress = analysis_progress.get(progresso_id)
+    if progress is None:
+        return jsonify({"error": "Nenhuma análise em andamento com este id"}), 404
+    
+    return jsonify(dict(progress, resumo=describe_progress(progress)))
+
+def analyze_batch(pdf_paths, tributos_text, workers=None):
+    """
+    Analisa vários PDFs em paralelo, um arquivo por processo (SEM LIMITAÇÕES)
+    
+    Args:
+        pdf_paths (list): Caminhos dos PDFs
+        tributos_text (str): String com tributos separados por vírgula
+        workers (int): Número de processos (padrão: BATCH_WORKERS)
+        
+    Returns:
+        dict: Resultados de todos os arquivos, marcados com arquivo, página e linha
+    """
+    print(f"📦 Iniciando lote de {len(pdf_paths)} arquivos...")
+    
+    # Cada processo já cuida de um arquivo inteiro: a extração dentro dele é sequencial
+    result = run_batch(pdf_paths, tributos_text, partial(process_pdf_analysis, workers=1),
+                       workers=workers, on_progress=print)
+    
+    stats = result['estatisticas']
+    print(f"✅ Lote concluído em {stats['duracao']:.1f}s: {stats['arquivos_por_segundo']} arquivos/s, "
+          f"{stats['paginas_por_segundo']} páginas/s")
+    return result
+
+@app.route('/batch', methods=['POST'])
+def batch_upload():
+    """Analisa vários PDFs (enviados ou de uma pasta local) de uma vez"""
+    tributos = request.form.get('tributos', '')
+    if not tributos.strip():
+        return jsonify({"error": "Nenhum tributo foi especificado"}), 400
+    
+    files = [f for f in request.files.getlist('files') if f.filename]
+    pastas = [p for p in request.form.getlist('pasta') if p.strip()]
+    
+    if any(not allowed_file(f.filename) for f in files):
+        return jsonify({"error": "Tipo de arquivo não permitido. Apenas PDFs são aceitos."}), 400
+    
+    for pasta in pastas:
+        if not os.path.isdir(pasta):
+            return jsonify({"error": f"Pasta não encontrada: {pasta}"}), 400
+    
+    saved = []
+    batch_folder = None
+    try:
+        # Uploads vão para uma subpasta própria para manter o nome original no resultado
+        if files:
+            batch_folder = os.path.join(UPLOAD_FOLDER, datetime.now().strftime("lote_%Y%m%d_%H%M%S_%f"))
+            os.makedirs(batch_folder, exist_ok=True)
+            for file in files:
+                filename = secure_filename(file.filename)
+                filepath = os.path.join(batch_folder, filename)
+                if os.path.exists(filepath):
+                    filepath = os.path.join(batch_folder, f"{len(saved)}_{filename}")
+                file.save(filepath)
+                saved.append(filepath)
+        
+        pdf_paths = saved + find_pdfs(pastas)
+        if not pdf_paths:
+            return jsonify({"error": "Nenhum PDF foi enviado"}), 400
+        
+        return jsonify(analyze_batch(pdf_paths, tributos))
+        
+    except Exception as e:
+        print(f"❌ Erro: {str(e)}")
+        return jsonify({"error": f"Erro ao processar lote: {str(e)}"}), 500
+    finally:
+        # Remove os arquivos temporários do lote
+        if batch_folder:
+            shutil.rmtree(batch_folder, ignore_errors=True)
+
+@app.route('/search')
+def search_index_route():
+    """
+    Busca tributos nos documentos já analisados, sem reenviar os PDFs
+    
+    Parâmetros: tributos (separados por vírgula), ultimos (N documentos mais
+    recentes) e limite (máximo de trechos).
+    """
+    if search_index is None:
+        return jsonify({"error": "Índice de busca indisponível"}), 503
+    
+    tributos = [t.strip() for t in request.args.get('tributos', '').split(',') if t.strip()]
+    if not tributos:
+        return jsonify({"error": "Nenhum tributo foi especificado"}), 400
+    
+    try:
+        ultimos = request.args.get('ultimos', type=int)
+        limite = request.args.get('limite', 100, type=int)
+        
+        inicio = time.perf_counter()
+        # Mesmo contexto da busca no PDF
+        results = search_index.search(tributos, ultimos=ultimos, context_before=CONFIG.context_lines,
+                                      context_after=CONFIG.context_lines, limit=limite)
+        tempo_ms = (time.perf_counter() - inicio) * 1000
+        
+        # Só a extração por regex: a consulta ao índice precisa ser instantânea
+        for result in results:
+            result['empresas_identificadas'] = extract_entities_with_regex(result['contexto'])
+    except sqlite3.Error as e:
+        print(f"❌ Erro no índice de busca: {e}")
+        return jsonify({"error": f"Erro na busca: {str(e)}"}), 500
+    
+    return jsonify({"success": True, "results": results, "total_encontrados": len(results),
+                    "tempo_ms": round(tempo_ms, 2)})
+
+@app.route('/documents')
+def indexed_documents():
+    """Lista os documentos no índice de busca"""
+    if search_index is None:
+        return jsonify({"error": "Índice de busca indisponível"}), 503
+    
+    return jsonify({"documentos": search_index.documents()})
+
+@app.route('/documents/<int:documento_id>/pages/<int:pagina>')
+def document_page(documento_id, pagina):
+    """
+    Texto de uma página de um documento do índice (sem reler o PDF)
+    
+    Usado para mostrar a página inteira de um trecho: as linhas vêm da faixa
+    da página na tabela de páginas do documento.
+    """
+    if search_index is None:
+        return jsonify({"error": "Índice de busca indisponível"}), 503
+    
+    try:
+        page = search_index.page(documento_id, pagina)
+    except sqlite3.Error as e:
+        print(f"❌ Erro no índice de busca: {e}")
+        return jsonify({"error": f"Erro na busca: {str(e)}"}), 500
+    
+    if page is None:
+        return jsonify({"error": "Página não encontrada"}), 404
+    return jsonify(page)
+
+@app.route('/documents/<int:documento_id>/export_csv')
+def export_document_csv(documento_id):
+    """
+    Exporta para CSV as ocorrências dos tributos em um documento do índice
+    
+    Parâmetros: tributos (separados por vírgula) e, opcionais, tributo e
+    empresa (mesmos filtros da tabela). Sem limite de trechos: o CSV é
+    gerado em streaming, com as empresas extraídas linha a linha.
+    """
+    if search_index is None:
+        return jsonify({"error": "Índice de busca indisponível"}), 503
+    
+    tributos = [t.strip() for t in request.args.get('tributos', '').split(',') if t.strip()]
+    if not tributos:
+        return jsonify({"error": "Nenhum tributo foi especificado"}), 400
+    
+    results = search_index.iter_search(tributos, documento_id=documento_id, context_before=CONFIG.context_lines,
+                                       context_after=CONFIG.context_lines)
+    try:
+        # Lê a primeira ocorrência antes de responder: erros do índice ainda viram 500
+        first = list(islice(results, 1))
+    except sqlite3.Error as e:
+        print(f"❌ Erro no índice de busca: {e}")
+        return jsonify({"error": f"Erro na busca: {str(e)}"}), 500
+    
+    def with_entities(results):
+        for result in results:
+            result['empresas_identificadas'] = extract_entities_with_regex(result['contexto'])
+            yield result
+    
+    results = filter_results(with_entities(chain(first, results)), request.args.get('tributo'), request.args.get('empresa'))
+    return csv_response(results)
+
+@app.route('/stats')
+def stats():
+    """Estatísticas das chamadas à Maritaca AI e do cache de respostas"""
+    return jsonify({"maritaca": maritaca.to_dict()})
+
+@app.route('/metrics')
+def metrics():
+    """Tempos por etapa, volumes e memória das análises no formato do Prometheus"""
+    return Response(REGISTRY.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 @app.route('/export_csv', methods=['POST'])
 def export_csv():
-    """Exporta resultados para CSV"""
+    """Exporta para CSV os resultados enviados pelo cliente (gerado em streaming)"""
     data = request.json
     
-    if not data or 'results' not in data:
+    if not data or not data.get('results'):
         return jsonify({"error": "Dados inválidos para exportação"}), 400
     
-    # Cria CSV em memória
-    output = io.StringIO()
-    writer = csv.writer(output)
-    
-    # Cabeçalho
-    writer.writerow(['Tributo', 'Linha Encontrada', 'Número da Linha', 'Empresas Identificadas', 'Contexto Completo'])
-    
-    # Dados
-    for result in data['results']:
-        empresas = '; '.join(result.get('empresas_identificadas', []))
-        writer.writerow([
-            result.get('tributo', ''),
-            result.get('linha_encontrada', ''),
-            result.get('linha_numero', ''),
-            empresas,
-            result.get('contexto', '').replace('\n', ' | ')
-        ])
-    
-    # Prepara arquivo para download
-    output.seek(0)
-    csv_data = output.getvalue().encode('utf-8-sig')  # BOM para Excel
-    
-    return send_file(
-        io.BytesIO(csv_data),
-        mimetype='text/csv',
-        as_attachment=True,
-        download_name=f'analise_tributos_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
-    )
+    return csv_response(data['results'])
 
 @app.errorhandler(413)
 def too_large(e):
@@ -402,4 +451,5 @@ def main():
         print(f"\n❌ Erro ao iniciar aplicação: {e}")
 
 if __name__ == '__main__':
+    multiprocessing.freeze_support()  # Necessário para o pool de extração em executáveis
     main() 
\ No newline at end of file
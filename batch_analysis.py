@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Análise em lote pela linha de comando
+
+Analisa vários PDFs (ou pastas de PDFs) com a mesma lista de tributos,
+distribuindo os arquivos por um pool de processos.
+
+Uso:
+    python batch_analysis.py diarios/2024-05/ --tributos "ISS, IPTU"
+    python batch_analysis.py a.pdf b.pdf --tributos ISS --workers 4 --saida resultado.json
+"""
+
+import sys
+import json
+import argparse
+import multiprocessing
+
+from analisador.batch import BATCH_WORKERS, find_pdfs
+from app_local import analyze_batch
+
+
+def main(argv=None):
+    """Função principal da análise em lote"""
+    parser = argparse.ArgumentParser(description="Analisa vários PDFs de uma vez")
+    parser.add_argument('caminhos', nargs='+', help="Arquivos PDF e/ou pastas com PDFs")
+    parser.add_argument('--tributos', required=True, help="Tributos separados por vírgula")
+    parser.add_argument('--workers', type=int, default=BATCH_WORKERS,
+                        help=f"Processos em paralelo (padrão: {BATCH_WORKERS})")
+    parser.add_argument('--saida', help="Arquivo JSON para gravar os resultados")
+    args = parser.parse_args(argv)
+
+    pdf_paths = find_pdfs(args.caminhos)
+    if not pdf_paths:
+        print("❌ Nenhum PDF encontrado")
+        return 1
+
+    result = analyze_batch(pdf_paths, args.tributos, workers=args.workers)
+
+    print("=" * 60)
+    for resumo in result['arquivos']:
+        detalhe = f" ({resumo['erro']})" if 'erro' in resumo else ""
+        print(f"📄 {resumo['arquivo']}: {resumo['total_encontrados']} trechos, "
+              f"{resumo['paginas']} páginas{detalhe}")
+    print(f"📋 Total: {result['total_encontrados']} trechos")
+
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"💾 Resultados gravados em {args.saida}")
+
+    return 0
+
+
+if __name__ == '__main__':
+    multiprocessing.freeze_support()
+    sys.exit(main())
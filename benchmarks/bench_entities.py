@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Microbenchmark da extração de empresas por regex
+
+Compara as regex antigas da versão local (quatro ``re.findall`` com
+``re.IGNORECASE``, recompiladas a cada chamada) com o ``EntityEngine`` do
+perfil 'local' (uma passada com grupos nomeados). Os contextos vêm dos PDFs
+informados, exatamente como a análise os monta; sem PDFs, usa contextos
+sintéticos no formato de um Diário Oficial.
+
+Uso:
+    python benchmarks/bench_entities.py
+    python benchmarks/bench_entities.py diario.pdf --tributos "ISS, IPTU" --repeticoes 20
+"""
+
+import os
+import re
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analisador import TributoMatcher
+from analisador.core import get_profile
+from analisador.extraction import extract_pages
+from analisador.pipeline import iter_lines, iter_matches
+from corpus import synthetic_contexts
+
+# Mesmo contexto da versão local
+CONTEXT_LINES = 15
+
+# Regex usadas pela versão local antes do EntityEngine
+LEGACY_PATTERNS = [
+    r'\d{2}\.\d{3}\.\d{3}/\d{4}-\d{2}',
+    r'[A-ZÁÊÇÕ][A-ZÁÊÇÕ\s]{10,80}(?:LTDA|ME|EIRELI|S\.A\.|SA|EPP|MICROEMPRESA|EMPRESA)',
+    r'[A-ZÁÊÇÕ][A-ZÁÊÇÕ\s]{8,50}(?=\s|$)',
+    r'[A-ZÁÊÇÕ][A-ZÁÊÇÕ\s\d]{5,50}(?:LTDA|ME|EIRELI)',
+]
+
+
+def legacy_extract(text):
+    """Extração antiga da versão local (referência)"""
+    entities = set()
+    for pattern in LEGACY_PATTERNS:
+        for match in re.findall(pattern, text, re.IGNORECASE):
+            cleaned = match.strip()
+            if len(cleaned) > 5 and not cleaned.isdigit():
+                entities.add(cleaned)
+    return list(entities)
+
+
+def pdf_contexts(pdf_paths, tributos):
+    """Contextos das ocorrências dos tributos nos PDFs"""
+    matcher = TributoMatcher(tributos)
+    contexts = []
+    for pdf_path in pdf_paths:
+        lines = iter_lines(extract_pages(pdf_path))
+        for match in iter_matches(lines, matcher, CONTEXT_LINES, CONTEXT_LINES):
+            contexts.append(match['contexto'])
+    return contexts
+
+
+def measure(func, contexts, repetitions):
+    """Melhor tempo (em segundos) de uma passada por todos os contextos"""
+    best = float('inf')
+    for _ in range(repetitions):
+        started = time.perf_counter()
+        for context in contexts:
+            func(context)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Microbenchmark da extração de empresas")
+    parser.add_argument('pdfs', nargs='*', help="Diários em PDF de onde tirar os contextos")
+    parser.add_argument('--tributos', default='ISS, IPTU, ITBI, TAXA', help="Tributos separados por vírgula")
+    parser.add_argument('--contextos', type=int, default=500, help="Contextos sintéticos (sem PDFs)")
+    parser.add_argument('--repeticoes', type=int, default=10, help="Repetições de cada medida")
+    args = parser.parse_args(argv)
+
+    if args.pdfs:
+        contexts = pdf_contexts(args.pdfs, [t.strip() for t in args.tributos.split(',')])
+    else:
+        contexts = synthetic_contexts(args.contextos, CONTEXT_LINES)
+    if not contexts:
+        print("❌ Nenhum contexto encontrado")
+        return 1
+
+    engine = get_profile('local').entity_engine
+    legacy = measure(legacy_extract, contexts, args.repeticoes)
+    current = measure(engine.extract, contexts, args.repeticoes)
+
+    kb = sum(len(c) for c in contexts) / 1024
+    print(f"📄 {len(contexts)} contextos ({kb:.0f} KB)")
+    print(f"🐢 regex antigas: {legacy * 1000:.1f} ms ({legacy / len(contexts) * 1e6:.0f} µs/contexto)")
+    print(f"⚡ EntityEngine: {current * 1000:.1f} ms ({current / len(contexts) * 1e6:.0f} µs/contexto)")
+    print(f"🚀 {legacy / current:.1f}x mais rápido")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark das etapas da análise com um Diário Oficial sintético
+
+Gera um PDF de várias páginas (tributos, razões sociais e CNPJs numa
+densidade configurável) e mede cada etapa isoladamente com o motor de
+``analisador.core`` no perfil escolhido:
+
+- extract_text_from_pdf: leitura das páginas e montagem do texto
+- search_tributos_in_text: busca dos tributos no texto já extraído
+- extract_entities_with_regex: extração de empresas nos contextos encontrados
+- process_pdf_analysis: análise completa (sem Maritaca AI e sem cache)
+
+O resultado vai para um JSON; com ``--comparar`` a saída de outro commit é
+usada como referência e a variação de cada etapa é mostrada.
+
+Uso:
+    python benchmarks/bench_pipeline.py --paginas 100 --saida bench.json
+    python benchmarks/bench_pipeline.py --perfil web --comparar bench.json
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import subprocess
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analisador.core import PROFILES, Analyzer, get_profile
+from analisador.extraction import join_pages, shutdown_pool
+from corpus import TRIBUTOS, build_pdf, synthetic_pages
+
+
+def git_commit():
+    """Commit atual do repositório (None fora de um repositório git)"""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def measure(func, repetitions):
+    """
+    Executa ``func`` várias vezes
+
+    Returns:
+        tuple: (estatísticas em segundos, resultado da última execução)
+    """
+    times = []
+    result = None
+    for _ in range(repetitions):
+        started = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - started)
+    return {'melhor_s': round(min(times), 6), 'media_s': round(sum(times) / len(times), 6),
+            'repeticoes': repetitions}, result
+
+
+def run(args):
+    """Gera o corpus, mede as etapas e devolve o relatório"""
+    pages = synthetic_pages(args.paginas, args.linhas_por_pagina, args.densidade, args.densidade_empresas)
+    total_lines = args.paginas * args.linhas_por_pagina
+    tributos = ', '.join(TRIBUTOS[:args.tributos])
+
+    # Sem cache de páginas e sem Maritaca: só o processamento local é medido
+    config = get_profile(args.perfil, extraction_workers=args.workers) if args.workers else get_profile(args.perfil)
+    analyzer = Analyzer(config)
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+        pdf_path = os.path.join(tmpdir, 'diario.pdf')
+        with open(pdf_path, 'wb') as f:
+            f.write(build_pdf(pages))
+
+        print(f"📄 Corpus: {args.paginas} páginas, {total_lines} linhas, {os.path.getsize(pdf_path) / 1024:.0f} KB")
+
+        etapas = {}
+        etapas['extract_text_from_pdf'], text = measure(
+            lambda: join_pages(analyzer.iter_pages(pdf_path)), args.repeticoes)
+        etapas['search_tributos_in_text'], matches = measure(
+            lambda: analyzer.search_text(text, analyzer.parse_tributos(tributos)), args.repeticoes)
+        contexts = [match['contexto'] for match in matches]
+        etapas['extract_entities_with_regex'], _ = measure(
+            lambda: [analyzer.extract_entities_regex(context) for context in contexts], args.repeticoes)
+        etapas['process_pdf_analysis'], result = measure(
+            lambda: analyzer.analyze(pdf_path, tributos), args.repeticoes)
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+        shutdown_pool()
+
+    # Vazão de cada etapa (na unidade que ela processa)
+    etapas['extract_text_from_pdf']['paginas_por_s'] = round(args.paginas / etapas['extract_text_from_pdf']['melhor_s'], 1)
+    etapas['search_tributos_in_text']['linhas_por_s'] = round(total_lines / etapas['search_tributos_in_text']['melhor_s'], 1)
+    if contexts:
+        etapas['extract_entities_with_regex']['contextos_por_s'] = round(
+            len(contexts) / etapas['extract_entities_with_regex']['melhor_s'], 1)
+    etapas['process_pdf_analysis']['paginas_por_s'] = round(args.paginas / etapas['process_pdf_analysis']['melhor_s'], 1)
+
+    return {
+        'commit': git_commit(),
+        'data': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'cpus': os.cpu_count(),
+        'perfil': args.perfil,
+        'corpus': {
+            'paginas': args.paginas,
+            'linhas_por_pagina': args.linhas_por_pagina,
+            'densidade_tributos': args.densidade,
+            'densidade_empresas': args.densidade_empresas,
+            'tributos': tributos,
+            'caracteres': len(text),
+            'ocorrencias': len(matches),
+            'trechos_analise': result.get('total_encontrados', 0),
+        },
+        'etapas': etapas,
+    }
+
+
+def compare(report, reference):
+    """Mostra a variação de cada etapa em relação a um relatório anterior"""
+    print(f"📊 Comparação com {reference.get('commit') or 'referência'}:")
+    for etapa, dados in report['etapas'].items():
+        anterior = reference.get('etapas', {}).get(etapa)
+        if not anterior:
+            continue
+        variacao = dados['melhor_s'] / anterior['melhor_s'] - 1
+        sinal = '🔺' if variacao > 0.05 else '🔻' if variacao < -0.05 else '➖'
+        print(f"  {sinal} {etapa}: {anterior['melhor_s'] * 1000:.1f} ms -> {dados['melhor_s'] * 1000:.1f} ms "
+              f"({variacao:+.0%})")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark das etapas da análise")
+    parser.add_argument('--paginas', type=int, default=50, help="Páginas do PDF sintético")
+    parser.add_argument('--linhas-por-pagina', type=int, default=60, help="Linhas por página")
+    parser.add_argument('--densidade', type=float, default=0.02, help="Fração das linhas com um tributo")
+    parser.add_argument('--densidade-empresas', type=float, default=0.05,
+                        help="Fração das linhas com razão social e CNPJ")
+    parser.add_argument('--tributos', type=int, default=3, help=f"Tributos buscados (até {len(TRIBUTOS)})")
+    parser.add_argument('--perfil', choices=sorted(PROFILES), default='local', help="Perfil de configuração")
+    parser.add_argument('--workers', type=int, help="Processos de extração (padrão: o do perfil)")
+    parser.add_argument('--repeticoes', type=int, default=3, help="Repetições de cada medida")
+    parser.add_argument('--saida', help="Arquivo JSON para gravar o relatório")
+    parser.add_argument('--comparar', help="Relatório JSON anterior para comparação")
+    args = parser.parse_args(argv)
+
+    report = run(args)
+
+    for etapa, dados in report['etapas'].items():
+        print(f"⏱️ {etapa}: {dados['melhor_s'] * 1000:.1f} ms (média {dados['media_s'] * 1000:.1f} ms)")
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            compare(report, json.load(f))
+
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"💾 Relatório gravado em {args.saida}")
+    else:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""
+Corpora sintéticos no formato de um Diário Oficial Municipal
+
+Gera linhas com cabeçalhos, atos, extratos de contrato (razão social e CNPJ)
+e menções a tributos numa densidade configurável, como texto ou como um PDF
+de várias páginas, sempre de forma determinística (semente fixa).
+"""
+
+import random
+
+# Tributos mencionados nas linhas geradas
+TRIBUTOS = ['ISS', 'IPTU', 'ITBI', 'TAXA DE LICENÇA', 'ICMS']
+
+EMPRESAS = [
+    'ALFA SERVIÇOS GERAIS LTDA', 'CONSTRUTORA BETA EIRELI', 'GAMA COMÉRCIO DE ALIMENTOS ME',
+    'DELTA ENGENHARIA S.A.', 'ÔMEGA TRANSPORTES E LOGÍSTICA LTDA', 'SIGMA INFORMÁTICA EPP',
+]
+
+CABECALHOS = [
+    'PREFEITURA MUNICIPAL DE SÃO JOSÉ', 'SECRETARIA MUNICIPAL DA FAZENDA',
+    'GABINETE DO PREFEITO', 'DIÁRIO OFICIAL DO MUNICÍPIO',
+]
+
+FRASES = [
+    'O Prefeito Municipal, no uso de suas atribuições legais, resolve:',
+    'Art. 2º Esta lei entra em vigor na data de sua publicação.',
+    'Publique-se, registre-se e cumpra-se.',
+    'Fica nomeado o servidor para o cargo em comissão de assessor.',
+    'Considerando o disposto na Lei Orgânica do Município;',
+    'Revogam-se as disposições em contrário.',
+]
+
+FRASES_TRIBUTO = [
+    'Fica o contribuinte notificado do lançamento do {} referente ao exercício de 2024.',
+    'O valor do {} deverá ser recolhido até o vencimento da parcela única.',
+    'Concede isenção do {} aos imóveis cadastrados no programa municipal.',
+    'Auto de infração por falta de recolhimento do {} retido na fonte.',
+]
+
+
+def _cnpj(rng):
+    return (f"{rng.randint(10, 99)}.{rng.randint(100, 999)}.{rng.randint(100, 999)}/"
+            f"{rng.randint(1, 9):04d}-{rng.randint(10, 99)}")
+
+
+def synthetic_lines(count, tributo_density=0.02, empresa_density=0.05, rng=None):
+    """
+    Gera linhas de um Diário Oficial
+
+    Args:
+        count (int): Número de linhas
+        tributo_density (float): Fração das linhas que menciona um tributo
+        empresa_density (float): Fração das linhas com razão social e CNPJ
+        rng (random.Random): Gerador (padrão: semente fixa)
+
+    Returns:
+        list: Linhas de texto
+    """
+    rng = rng or random.Random(42)
+    lines = []
+    for _ in range(count):
+        sorteio = rng.random()
+        if sorteio < tributo_density:
+            lines.append(rng.choice(FRASES_TRIBUTO).format(rng.choice(TRIBUTOS)))
+        elif sorteio < tributo_density + empresa_density:
+            lines.append(f"EXTRATO DE CONTRATO. Contratada: {rng.choice(EMPRESAS)}, CNPJ {_cnpj(rng)}.")
+        elif sorteio < tributo_density + empresa_density + 0.05:
+            lines.append(rng.choice(CABECALHOS))
+        else:
+            lines.append(rng.choice(FRASES))
+    return lines
+
+
+def synthetic_pages(pages, lines_per_page=60, tributo_density=0.02, empresa_density=0.05, seed=42):
+    """
+    Gera as páginas de um Diário Oficial
+
+    Args:
+        pages (int): Número de páginas
+        lines_per_page (int): Linhas por página
+        tributo_density (float): Fração das linhas que menciona um tributo
+        empresa_density (float): Fração das linhas com razão social e CNPJ
+        seed (int): Semente do gerador
+
+    Returns:
+        list: Uma lista de linhas por página
+    """
+    rng = random.Random(seed)
+    return [synthetic_lines(lines_per_page, tributo_density, empresa_density, rng) for _ in range(pages)]
+
+
+def synthetic_contexts(count, context_lines=15, seed=42):
+    """
+    Gera contextos de ocorrências (cabeçalho e linhas vizinhas com empresas)
+
+    Args:
+        count (int): Número de contextos
+        context_lines (int): Linhas de contexto antes e depois
+        seed (int): Semente do gerador
+
+    Returns:
+        list: Contextos de texto
+    """
+    rng = random.Random(seed)
+    contexts = []
+    for _ in range(count):
+        lines = CABECALHOS[:2] + synthetic_lines(2 * context_lines - 1, 0.05, 0.2, rng)
+        contexts.append('\n'.join(lines))
+    return contexts
+
+
+def build_pdf(pages):
+    """
+    Gera um PDF com uma linha de texto por item de cada página
+
+    Args:
+        pages (list): Uma lista de linhas por página
+
+    Returns:
+        bytes: Conteúdo do arquivo PDF
+    """
+    page_ids = [4 + 2 * i for i in range(len(pages))]
+    kids = ' '.join(f'{pid} 0 R' for pid in page_ids)
+    objs = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        f'<< /Type /Pages /Kids [{kids}] /Count {len(pages)} >>'.encode(),
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>',
+    ]
+    for page_id, lines in zip(page_ids, pages):
+        content = [b'BT /F1 8 Tf 10 TL 30 820 Td']
+        for line in lines:
+            escaped = line.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+            content.append(b'(' + escaped.encode('cp1252', errors='replace') + b') Tj T*')
+        content.append(b'ET')
+        stream = b'\n'.join(content)
+        objs.append(f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] '
+                    f'/Resources << /Font << /F1 3 0 R >> >> /Contents {page_id + 1} 0 R >>'.encode())
+        objs.append(f'<< /Length {len(stream)} >>\nstream\n'.encode() + stream + b'\nendstream')
+
+    out = bytearray(b'%PDF-1.4\n')
+    offsets = []
+    for num, body in enumerate(objs, 1):
+        offsets.append(len(out))
+        out += f'{num} 0 obj\n'.encode() + body + b'\nendobj\n'
+    xref = len(out)
+    out += f'xref\n0 {len(objs) + 1}\n0000000000 65535 f \n'.encode()
+    for offset in offsets:
+        out += f'{offset:010d} 00000 n \n'.encode()
+    out += f'trailer\n<< /Size {len(objs) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n'.encode()
+    return bytes(out)
@@ -4,14 +4,17 @@ import os
 # Configurações básicas
 bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
 workers = 1  # Apenas 1 worker para economizar memória no plano gratuito
-worker_class = "sync"
+worker_class = "gthread"  # Threads: streams de eventos (SSE) não bloqueiam as outras requisições
+threads = 4
 worker_connections = 50  # Reduzido para economizar recursos
 
 # Timeouts otimizados para Render.com
 timeout = 30  # 30 segundos máximo por request
 keepalive = 2
-max_requests = 100  # Reinicia worker após 100 requests para evitar memory leaks
-max_requests_jitter = 10
+# Sem reinício periódico do worker: a fila de análises (analisador/jobs.py) e o
+# estado dos jobs vivem nas threads deste processo, e o polling/SSE do cliente
+# chegaria a qualquer limite de requests no meio de uma análise (jobs perdidos, 404)
+max_requests = 0
 
 # Configurações de memória
 preload_app = True  # Carrega app antes de fazer fork dos workers
@@ -3,6 +3,7 @@ class TributosAnalyzer {
     constructor() {
         this.results = [];
         this.filteredResults = [];
+        this.exportUrl = null;
         this.init();
     }
 
@@ -64,7 +65,7 @@ class TributosAnalyzer {
         this.showAlert(`Arquivo selecionado: ${file.name} (${fileSize} MB)`, 'info');
     }
 
-    async handleUpload() {
+    async handleUpload(paginaInicial = 1, linhaInicial = 1) {
         const formData = new FormData();
         const fileInput = document.getElementById('pdfFile');
         const tributos = document.getElementById('tributos').value;
@@ -81,6 +82,8 @@ class TributosAnalyzer {
 
         formData.append('file', fileInput.files[0]);
         formData.append('tributos', tributos);
+        formData.append('pagina_inicial', paginaInicial);
+        formData.append('linha_inicial', linhaInicial);
 
         this.showProgress();
         this.disableForm(true);
@@ -91,16 +94,32 @@ class TributosAnalyzer {
                 body: formData
             });
 
-            const result = await response.json();
+            const job = await response.json();
 
-            if (response.ok && result.success) {
+            if (!response.ok) {
+                this.showAlert(job.error || 'Erro ao processar o arquivo.', 'danger');
+                return;
+            }
+
+            // A análise roda em segundo plano: mostra os trechos à medida que aparecem
+            this.exportUrl = null;
+            const result = await this.streamJob(job);
+            if (result.success) {
+                // O CSV é gerado no servidor a partir do resultado guardado no job
+                this.exportUrl = job.export_url;
                 this.results = result.results;
                 this.filteredResults = [...this.results];
                 this.displayResults();
                 this.setupFilters();
-                this.showAlert(`Análise concluída! ${result.total_encontrados} trechos encontrados.`, 'success');
+                if (result.truncated) {
+                    this.showAlert(`${result.aviso}. ${result.total_encontrados} trechos encontrados.`, 'warning');
+                    this.offerNextRange(result.cobertura);
+                } else {
+                    this.showAlert(`Análise concluída! ${result.total_encontrados} trechos encontrados.`, 'success');
+                }
             } else {
                 this.showAlert(result.error || 'Erro ao processar o arquivo.', 'danger');
+                this.offerNextRange(result.cobertura);
             }
         } catch (error) {
             console.error('Erro:', error);
@@ -111,6 +130,107 @@ class TributosAnalyzer {
         }
     }
 
+    offerNextRange(cobertura) {
+        // Análise parcial: oferece a próxima faixa de páginas do mesmo arquivo
+        if (!cobertura || !cobertura.proxima_pagina) return;
+
+        const proxima = cobertura.proxima_pagina;
+        const linha = cobertura.proxima_linha || 1;
+        const button = document.createElement('button');
+        button.type = 'button';
+        button.className = 'btn btn-sm btn-outline-primary mt-2';
+        const inicio = linha > 1 ? `página ${proxima}, linha ${linha}` : `página ${proxima}`;
+        button.textContent = `Analisar a partir da ${inicio} (de ${cobertura.total_paginas})`;
+        button.addEventListener('click', () => this.handleUpload(proxima, linha));
+        document.getElementById('alertContainer').appendChild(button);
+    }
+
+    streamJob(job) {
+        // Sem suporte a SSE: consulta o progresso periodicamente
+        if (!window.EventSource || !job.events_url) {
+            return this.waitForJob(job);
+        }
+
+        this.results = [];
+        this.filteredResults = [];
+        const rows = {};
+
+        return new Promise((resolve) => {
+            const source = new EventSource(job.events_url);
+
+            source.addEventListener('trecho', (e) => {
+                const trecho = JSON.parse(e.data);
+                rows[trecho.id] = trecho;
+                this.appendResult(trecho);
+            });
+
+            source.addEventListener('empresas', (e) => {
+                const data = JSON.parse(e.data);
+                const trecho = rows[data.id];
+                if (trecho) {
+                    trecho.empresas_identificadas = data.empresas_identificadas;
+                    this.applyFilters();
+                }
+            });
+
+            source.addEventListener('progresso', (e) => {
+                this.updateProgress(JSON.parse(e.data));
+            });
+
+            source.addEventListener('fim', async () => {
+                source.close();
+                // Resultado final (agrupado por tributo) substitui as linhas parciais
+                const response = await fetch(job.result_url);
+                resolve(await response.json());
+            });
+
+            source.onerror = () => {
+                // Quedas são reconectadas pelo navegador; se desistiu, volta ao polling
+                if (source.readyState === EventSource.CLOSED) {
+                    resolve(this.waitForJob(job));
+                }
+            };
+        });
+    }
+
+    appendResult(result) {
+        // Acrescenta uma linha sem redesenhar a tabela inteira
+        const resultsSection = document.getElementById('resultsSection');
+        const tbody = document.getElementById('resultsTableBody');
+
+        if (this.results.length === 0) {
+            tbody.innerHTML = '';
+            resultsSection.style.display = 'block';
+            resultsSection.classList.add('fade-in');
+        }
+
+        this.results.push(result);
+        this.filteredResults.push(result);
+        tbody.appendChild(this.createResultRow(result, this.filteredResults.length - 1));
+        document.getElementById('totalResults').textContent = `${this.filteredResults.length} resultados`;
+    }
+
+    async waitForJob(job) {
+        // Consulta o progresso até o job terminar e então busca o resultado
+        while (true) {
+            await new Promise(resolve => setTimeout(resolve, 1000));
+
+            const response = await fetch(job.status_url);
+            const status = await response.json();
+
+            if (!response.ok) {
+                return { error: status.error || 'Análise não encontrada.' };
+            }
+
+            this.updateProgress(status);
+
+            if (status.status === 'concluido' || status.status === 'erro') {
+                const resultResponse = await fetch(job.result_url);
+                return await resultResponse.json();
+            }
+        }
+    }
+
     showProgress() {
         const progressSection = document.getElementById('progressSection');
         const progressBar = document.getElementById('progressBar');
@@ -119,25 +239,46 @@ class TributosAnalyzer {
         progressSection.style.display = 'block';
         progressSection.classList.add('fade-in');
 
-        // Simula progresso
-        let progress = 0;
-        const steps = [
-            { progress: 20, text: 'Extraindo texto do PDF...' },
-            { progress: 50, text: 'Buscando tributos...' },
-            { progress: 80, text: 'Identificando empresas...' },
-            { progress: 100, text: 'Finalizando análise...' }
-        ];
-
-        const interval = setInterval(() => {
-            if (progress < steps.length) {
-                const step = steps[progress];
-                progressBar.style.width = step.progress + '%';
-                progressText.textContent = step.text;
-                progress++;
+        progressBar.style.width = '10%';
+        progressText.textContent = 'Enviando arquivo...';
+    }
+
+    updateProgress(status) {
+        const progressBar = document.getElementById('progressBar');
+        const progressText = document.getElementById('progressText');
+        const progresso = status.progresso || {};
+
+        if (status.status === 'na_fila') {
+            progressBar.style.width = '10%';
+            progressText.textContent = 'Aguardando na fila de análises...';
+        } else if (status.status === 'processando') {
+            const ocorrencias = progresso.ocorrencias || 0;
+            let feito, total, texto;
+            if (progresso.etapa === 'empresas') {
+                [feito, total] = [progresso.empresas_processadas || 0, progresso.empresas_total];
+                texto = `Identificando empresas... ${feito}/${total || '?'} regiões, ${ocorrencias} trechos`;
             } else {
-                clearInterval(interval);
+                [feito, total] = [progresso.paginas_processadas || 0, progresso.paginas_previstas];
+                texto = `Analisando PDF... página ${feito}${total ? '/' + total : ''}, ${ocorrencias} trechos encontrados`;
+            }
+            // Barra proporcional à etapa atual (10% a 95%) e tempo restante estimado pelo servidor
+            progressBar.style.width = total ? `${10 + Math.round(85 * Math.min(1, feito / total))}%` : '50%';
+            if (progresso.eta_s !== undefined && progresso.eta_s !== null) {
+                texto += ` (restam ${this.formatEta(progresso.eta_s)})`;
             }
-        }, 1000);
+            progressText.textContent = texto;
+        } else {
+            progressBar.style.width = '100%';
+            progressText.textContent = 'Finalizando análise...';
+        }
+    }
+
+    formatEta(segundos) {
+        const total = Math.round(segundos);
+        if (total >= 60) {
+            return `${Math.floor(total / 60)}min ${String(total % 60).padStart(2, '0')}s`;
+        }
+        return `${total}s`;
     }
 
     hideProgress() {
@@ -208,9 +349,7 @@ class TributosAnalyzer {
             ? result.empresas_identificadas.join(', ')
             : 'Nenhuma identificada';
 
-        const linhaDisplay = result.linha_encontrada.length > 100 
-            ? result.linha_encontrada.substring(0, 100) + '...'
-            : result.linha_encontrada;
+        const linhaDisplay = this.highlightTerm(result, 100);
 
         row.innerHTML = `
             <td>
@@ -220,7 +359,7 @@ class TributosAnalyzer {
                 ${linhaDisplay}
             </td>
             <td>
-                <span class="badge bg-secondary">${result.linha_numero}</span>
+                <span class="badge bg-secondary" title="Linha ${result.linha_numero} do texto">${this.formatLocation(result)}</span>
             </td>
             <td class="text-truncate-custom" title="${empresas}">
                 ${empresas}
@@ -235,11 +374,21 @@ class TributosAnalyzer {
         return row;
     }
 
+    highlightTerm(result, size) {
+        // Destaca o tributo como aparece no texto, pela posição vinda da análise
+        const linha = result.linha_encontrada;
+        const cortada = linha.length > size ? linha.substring(0, size) + '...' : linha;
+        if (!result.posicao || result.posicao[1] > size) return cortada;
+
+        const [inicio, fim] = result.posicao;
+        return `${cortada.substring(0, inicio)}<mark>${cortada.substring(inicio, fim)}</mark>${cortada.substring(fim)}`;
+    }
+
     showContext(index) {
         const result = this.filteredResults[index];
         
         document.getElementById('modalTributo').textContent = result.tributo;
-        document.getElementById('modalLinha').textContent = result.linha_numero;
+        document.getElementById('modalLinha').textContent = `${this.formatLocation(result)} (linha ${result.linha_numero} do texto)`;
         document.getElementById('modalEmpresas').textContent = 
             result.empresas_identificadas.length > 0 
                 ? result.empresas_identificadas.join(', ')
@@ -250,6 +399,14 @@ class TributosAnalyzer {
         modal.show();
     }
 
+    formatLocation(result) {
+        // Página e linha dentro dela (resultados antigos só têm a linha do texto)
+        if (!result.pagina) {
+            return `${result.linha_numero}`;
+        }
+        return result.linha_pagina ? `Pág. ${result.pagina}, linha ${result.linha_pagina}` : `Pág. ${result.pagina}`;
+    }
+
     setupFilters() {
         // Popula filtro de tributos
         const filterTributo = document.getElementById('filterTributo');
@@ -289,6 +446,20 @@ class TributosAnalyzer {
             return;
         }
 
+        if (this.exportUrl) {
+            // Download direto (em streaming), com os filtros aplicados na tabela
+            const params = new URLSearchParams({
+                tributo: document.getElementById('filterTributo').value,
+                empresa: document.getElementById('filterEmpresa').value
+            });
+            const a = document.createElement('a');
+            a.href = `${this.exportUrl}?${params}`;
+            document.body.appendChild(a);
+            a.click();
+            document.body.removeChild(a);
+            return;
+        }
+
         try {
             const response = await fetch('/export_csv', {
                 method: 'POST',
@@ -7,6 +7,14 @@ import os
 import sys
 import unittest
 from unittest.mock import patch, MagicMock
+import io
+import csv
+import json
+import time
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pdfplumber.page import Page
 import tempfile
 import shutil
 
@@ -14,6 +22,25 @@ import shutil
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from app import app, extract_text_from_pdf, search_tributos_in_text, extract_entities_with_regex
+from app_local import app as app_local, analyze_batch, process_pdf_analysis as process_local_analysis
+from app_local import extract_entities_with_maritaca as extract_local_entities_ai
+from app_desktop import ResultsTable
+from analisador import TributoMatcher
+from analisador.batch import find_pdfs
+from analisador.cache import PageTextCache, file_sha256, iter_pages_cached
+from analisador.core import Analyzer, get_profile
+from analisador.deadline import Deadline
+from analisador.entities import EntityEngine
+from analisador import extraction
+from analisador.extraction import extract_pages, iter_pages, join_pages
+from analisador.index import DocumentIndex
+from analisador import metrics
+from analisador.llm_cache import LLMCache
+from analisador.maritaca import MaritacaClient
+from analisador.progress import ProgressTracker
+from analisador.synonyms import SynonymDictionary
+from analisador.pipeline import PageOffsets, group_by_tributo, iter_context_regions, iter_lines, iter_matches
+from benchmarks.corpus import build_pdf
 
 class TestAnalisadorTributos(unittest.TestCase):
     
@@ -41,17 +68,72 @@ class TestAnalisadorTributos(unittest.TestCase):
         tributos = ['ISS', 'IPTU', 'ISSQN']
         resultados = search_tributos_in_text(texto, tributos)
         
-        # Deve encontrar os 3 tributos
+        # ISSQN é sinônimo de ISS: as duas linhas vêm com o nome canônico
         tributos_encontrados = [r['tributo'] for r in resultados]
-        self.assertIn('ISS', tributos_encontrados)
+        self.assertEqual(tributos_encontrados.count('ISS'), 2)
         self.assertIn('IPTU', tributos_encontrados)
-        self.assertIn('ISSQN', tributos_encontrados)
+        self.assertNotIn('ISSQN', tributos_encontrados)
         
         # Não deve encontrar palavras parciais
         linhas_encontradas = ' '.join([r['linha_encontrada'] for r in resultados])
         self.assertNotIn('isso', linhas_encontradas.lower())
         self.assertNotIn('mississippi', linhas_encontradas.lower())
-    
+
+    def test_search_tributos_sobrepostos_mesma_linha(self):
+        """Testa tributos sobrepostos na mesma linha com uma única passada"""
+        texto = "Retenção de ISS RETIDO na fonte\nSem menção aqui\nISS e IPTU juntos"
+
+        resultados = search_tributos_in_text(texto, ['ISS', 'ISS RETIDO', 'IPTU'])
+        pares = [(r['tributo'], r['linha_numero']) for r in resultados]
+
+        # Resultados agrupados por tributo, na ordem pedida
+        self.assertEqual(pares, [('ISS', 1), ('ISS', 3), ('ISS RETIDO', 1), ('IPTU', 3)])
+
+    def test_busca_sem_acentos_e_nome_completo(self):
+        """Testa a busca no texto dobrado e as posições no texto original"""
+        texto = "IMPOSTO SOBRE  SERVICOS devido\nTaxa de Coleta\nStraße do Imposto sobre Serviços"
+
+        resultados = search_tributos_in_text(texto, ['Imposto sobre Serviços', 'TAXA DE COLETA'])
+        pares = [(r['tributo'], r['linha_numero']) for r in resultados]
+        self.assertEqual(pares, [('ISS', 1), ('ISS', 3), ('TAXA DE COLETA', 2)])
+        self.assertEqual([r['termo_encontrado'] for r in resultados],
+                         ['IMPOSTO SOBRE  SERVICOS', 'Imposto sobre Serviços', 'Taxa de Coleta'])
+        self.assertEqual(resultados[1]['posicao'], [10, 32])
+
+        linha = texto.split('\n')[2]
+        spans = list(TributoMatcher(['imposto sobre servicos']).iter_spans(linha))
+        self.assertEqual([linha[inicio:fim] for _, inicio, fim in spans], ['Imposto sobre Serviços'])
+
+    def test_sinonimos_agrupados_no_nome_canonico(self):
+        """Testa o agrupamento dos sinônimos em um único tributo"""
+        analyzer = Analyzer(get_profile('web'))
+        tributos = analyzer.parse_tributos('issqn, Imposto sobre Serviços de Qualquer Natureza, PIS, COFINS, CSLL, ITBI')
+        self.assertEqual(tributos, ['ISS', 'PIS', 'COFINS', 'CSLL', 'ITBI'])
+
+        matcher = TributoMatcher(['PASEP', 'Taxa de Lixo'])
+        self.assertEqual(matcher.tributos, ['PIS', 'Taxa de Lixo'])
+        linha = "Recolhimento do PIS/PASEP e da taxa de lixo"
+        spans = [(matcher.tributos[i], linha[inicio:fim]) for i, inicio, fim in matcher.iter_spans(linha)]
+        self.assertEqual(spans, [('PIS', 'PIS/PASEP'), ('Taxa de Lixo', 'taxa de lixo')])
+
+        sinonimos = SynonymDictionary({'TLP': ['Taxa de Limpeza Pública']})
+        matcher = TributoMatcher(['taxa de limpeza publica'], synonyms=sinonimos)
+        self.assertEqual(matcher.match_line('Cobrança da TLP de 2024'), [0])
+
+    def test_sinonimo_em_dois_tributos_e_rejeitado(self):
+        """Testa que um nome não é remapeado em silêncio para outro tributo"""
+        sinonimos = SynonymDictionary({'ISS': ['ISSQN']})
+        sinonimos.add('ISS', ['issqn', 'Imposto sobre Serviços'])
+        
+        with self.assertRaises(ValueError):
+            sinonimos.add('ISSQN', ['Imposto Municipal sobre Serviços'])
+        with self.assertRaises(ValueError):
+            sinonimos.add('TLP', ['Taxa de Limpeza', 'Imposto sobre Servicos'])
+        
+        self.assertEqual(sinonimos.canonical('ISSQN'), 'ISS')
+        self.assertEqual(sinonimos.aliases('ISS'), ['ISS', 'ISSQN', 'Imposto sobre Serviços'])
+        self.assertEqual(sinonimos.canonical('Taxa de Limpeza'), 'Taxa de Limpeza')
+
     def test_extract_entities_with_regex(self):
         """Testa a extração de entidades com regex"""
         texto = """
@@ -93,6 +175,68 @@ class TestAnalisadorTributos(unittest.TestCase):
         finally:
             os.unlink(tmp_path)
     
+    def test_upload_enfileira_job_e_retorna_resultado(self):
+        """Testa o fluxo assíncrono: upload -> job -> progresso -> resultado"""
+        pdf = build_pdf([['Cobrança de ISS da empresa EXEMPLO LTDA'], ['Sem tributos aqui']])
+        
+        with patch('app.page_cache', None):
+            response = self.app.post('/upload', data={
+                'file': (io.BytesIO(pdf), 'diario.pdf'),
+                'tributos': 'ISS'
+            })
+            self.assertEqual(response.status_code, 202)
+            job = response.get_json()
+            
+            for _ in range(50):
+                status = self.app.get(job['status_url']).get_json()
+                if status['status'] in ('concluido', 'erro'):
+                    break
+                time.sleep(0.1)
+        
+        self.assertEqual(status['status'], 'concluido')
+        self.assertEqual(status['progresso']['paginas_processadas'], 2)
+        
+        result = self.app.get(job['result_url']).get_json()
+        self.assertTrue(result['success'])
+        self.assertEqual(result['results'][0]['tributo'], 'ISS')
+        
+        # CSV gerado a partir do resultado guardado no job, com os filtros da tabela
+        response = self.app.get(job['export_url'] + '?tributo=ISS&empresa=exemplo')
+        rows = list(csv.reader(io.StringIO(response.get_data(as_text=True).lstrip('\ufeff'))))
+        self.assertEqual(response.mimetype, 'text/csv')
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[1][0], 'ISS')
+        
+        response = self.app.get(job['export_url'] + '?tributo=IPTU')
+        self.assertEqual(len(response.get_data(as_text=True).splitlines()), 1)
+    
+    def test_stream_de_eventos_do_job(self):
+        """Testa o stream SSE: trecho antes das empresas e evento final"""
+        pdf = build_pdf([['Cobrança de ISS da empresa EXEMPLO LTDA'], ['Outra linha com ISS']])
+        
+        with patch('app.page_cache', None):
+            job = self.app.post('/upload', data={
+                'file': (io.BytesIO(pdf), 'diario.pdf'),
+                'tributos': 'ISS'
+            }).get_json()
+            response = self.app.get(job['events_url'])
+            body = response.get_data(as_text=True)
+        
+        self.assertEqual(response.mimetype, 'text/event-stream')
+        events = [line.split(': ', 1)[1] for line in body.splitlines() if line.startswith('event: ')]
+        self.assertEqual([e for e in events if e != 'progresso'], ['trecho', 'empresas', 'trecho', 'empresas', 'fim'])
+        self.assertIn('EXEMPLO LTDA', body)
+        
+        # Reconexão continua depois do último evento recebido
+        response = self.app.get(job['events_url'], headers={'Last-Event-ID': '2'})
+        events = [line for line in response.get_data(as_text=True).splitlines() if line.startswith('event: ')]
+        self.assertEqual(events, ['event: empresas', 'event: progresso', 'event: fim'])
+    
+    def test_job_inexistente(self):
+        """Testa consulta de job desconhecido"""
+        response = self.app.get('/jobs/naoexiste')
+        self.assertEqual(response.status_code, 404)
+    
     def test_export_csv_without_data(self):
         """Testa exportação CSV sem dados"""
         response = self.app.post('/export_csv', 
@@ -120,6 +264,691 @@ class TestAnalisadorTributos(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.mimetype, 'text/csv')
 
+class TestExtracaoPDF(unittest.TestCase):
+    """Testes da extração de texto do PDF"""
+    
+    def setUp(self):
+        pages = [[f'Página {i + 1}', f'Linha com ISS na página {i + 1}'] for i in range(12)]
+        with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as tmp:
+            tmp.write(build_pdf(pages))
+            self.pdf_path = tmp.name
+    
+    def tearDown(self):
+        os.unlink(self.pdf_path)
+    
+    def test_extracao_paralela_preserva_ordem(self):
+        """Testa que o pool de processos devolve as páginas na ordem original"""
+        sequencial = extract_pages(self.pdf_path, workers=1)
+        paralelo = extract_pages(self.pdf_path, workers=2)
+        
+        self.assertEqual(len(paralelo), 12)
+        self.assertEqual(paralelo, sequencial)
+        self.assertTrue(paralelo[11].startswith('Página 12'))
+        self.assertEqual(join_pages(paralelo).count('\n\n'), 12)
+    
+    def test_pdf_em_memoria_vai_aos_processos_por_arquivo(self):
+        """Testa que os bytes do PDF são gravados uma vez e as faixas levam só o caminho"""
+        spool = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, spool)
+        with open(self.pdf_path, 'rb') as f:
+            pdf_data = f.read()
+        
+        enviados = []
+        submit = ProcessPoolExecutor.submit
+        
+        def registrar(executor, fn, *args, **kwargs):
+            enviados.append(args[0])
+            return submit(executor, fn, *args, **kwargs)
+        
+        with patch('analisador.extraction.UPLOAD_SPOOL_DIR', spool), \
+             patch.object(ProcessPoolExecutor, 'submit', registrar):
+            paralelo = list(iter_pages(pdf_data, workers=2))
+        
+        self.assertEqual(paralelo, extract_pages(self.pdf_path, workers=1))
+        self.assertTrue(enviados)
+        self.assertEqual(len(set(enviados)), 1)
+        self.assertTrue(enviados[0].startswith(spool))
+        self.assertEqual(os.listdir(spool), [])
+    
+    def test_pool_compartilhado_entre_threads(self):
+        """Testa que threads simultâneas recebem o mesmo pool, sem criar pools duplicados"""
+        pools = []
+        threads = [threading.Thread(target=lambda: pools.append(extraction._get_executor(3))) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        self.assertEqual(len({id(pool) for pool in pools}), 1)
+        self.assertIs(extraction._get_executor(3), pools[0])
+        extraction._discard_executor(pools[0])
+        self.assertIsNot(extraction._get_executor(3), pools[0])
+        extraction.shutdown_pool()
+
+class TestPipelineStreaming(unittest.TestCase):
+    """Testes do pipeline páginas -> linhas -> ocorrências"""
+    
+    def test_numeracao_igual_ao_texto_concatenado(self):
+        """Testa que as linhas em streaming seguem a numeração do texto completo"""
+        pages = ['Primeira\nLinha ISS', '', 'Terceira com IPTU']
+        
+        linhas = [linha for _, linha in iter_lines(pages)]
+        self.assertEqual(linhas, join_pages(pages).split('\n'))
+    
+    def test_contexto_do_buffer_circular(self):
+        """Testa o contexto montado com linhas anteriores e seguintes"""
+        pages = ['\n'.join(f'linha {i}' for i in range(1, 10)) + '\nISS aqui\n' +
+                 '\n'.join(f'linha {i}' for i in range(11, 20))]
+        
+        matches = list(iter_matches(iter_lines(pages), TributoMatcher(['ISS']), 2, 3))
+        
+        self.assertEqual(len(matches), 1)
+        self.assertEqual(matches[0]['linha_numero'], 10)
+        self.assertEqual(matches[0]['contexto'], 'linha 8\nlinha 9\nISS aqui\nlinha 11\nlinha 12\nlinha 13')
+    
+    def test_tabela_de_paginas(self):
+        """Testa a página e a linha na página pela tabela de inícios de página"""
+        offsets = PageOffsets(first_page=5)
+        linhas = list(iter_lines(['a\nb', '', 'c\nd\ne'], page_offsets=offsets))
+        self.assertEqual(list(offsets.starts), [1, 4, 4])
+        
+        posicoes = {linha: offsets.locate(numero) for numero, linha in linhas if linha}
+        self.assertEqual(posicoes, {'a': (5, 1), 'b': (5, 2), 'c': (7, 1), 'd': (7, 2), 'e': (7, 3)})
+        self.assertEqual(offsets.page_lines(5), (1, 3))
+        self.assertEqual(offsets.page_lines(6), (4, 3))
+        self.assertEqual(offsets.page_lines(7), (4, None))
+        self.assertIsNone(offsets.page_lines(8))
+        self.assertEqual(list(PageOffsets(data=offsets.tobytes()).starts), [1, 4, 4])
+
+    def test_regioes_de_contexto_sobrepostas(self):
+        """Testa que contextos sobrepostos viram uma única região com as linhas sem repetição"""
+        linhas = [f'linha {i}' for i in range(1, 51)]
+        for numero, texto in ((10, 'ISS e IPTU'), (12, 'ISS de novo'), (40, 'ISS distante')):
+            linhas[numero - 1] = texto
+        
+        matches = group_by_tributo(iter_matches(iter_lines(['\n'.join(linhas)]), TributoMatcher(['ISS', 'IPTU']), 2, 2))
+        regioes = list(iter_context_regions(matches, 2, 20))
+        
+        self.assertEqual(len(matches), 4)
+        self.assertEqual(len(regioes), 2)
+        texto, membros = regioes[0]
+        self.assertEqual(texto, '\n'.join(linhas[7:14]))
+        self.assertEqual(sorted(m['linha_numero'] for m in membros), [10, 10, 12])
+        self.assertEqual(regioes[1][0], '\n'.join(linhas[37:42]))
+
+class TestMotorAnalise(unittest.TestCase):
+    """Testes do motor compartilhado e dos perfis de configuração"""
+    
+    def setUp(self):
+        pages = [[f'Linha com ISS e IPTU na página {i + 1}', 'EMPRESA ALFA LTDA'] for i in range(8)]
+        with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as tmp:
+            tmp.write(build_pdf(pages))
+            self.pdf_path = tmp.name
+    
+    def tearDown(self):
+        os.unlink(self.pdf_path)
+    
+    def test_perfis_aplicam_limites_diferentes(self):
+        """Testa que o mesmo PDF respeita os limites de cada perfil"""
+        web = Analyzer(get_profile('web', max_matches_per_tributo=2)).analyze(self.pdf_path, 'ISS, IPTU')
+        local = Analyzer(get_profile('local')).analyze(self.pdf_path, 'ISS, IPTU')
+        
+        self.assertEqual([r['tributo'] for r in web['results']], ['ISS', 'ISS', 'IPTU', 'IPTU'])
+        self.assertEqual(local['total_encontrados'], 16)
+        self.assertEqual({(r['termo_encontrado'], tuple(r['posicao'])) for r in local['results']},
+                         {('ISS', (10, 13)), ('IPTU', (16, 20))})
+        self.assertEqual([r['pagina'] for r in local['results'][:8]], list(range(1, 9)))
+        self.assertTrue(all('EMPRESA ALFA LTDA' in r['empresas_identificadas'] for r in local['results']))
+    
+    def test_limite_de_paginas_e_tributos(self):
+        """Testa os limites de páginas lidas e de tributos buscados"""
+        config = get_profile('local', max_pdf_pages=3, max_tributos=1)
+        
+        result = Analyzer(config).analyze(self.pdf_path, 'ISS, IPTU')
+        
+        self.assertEqual(result['paginas_processadas'], 3)
+        self.assertEqual({r['tributo'] for r in result['results']}, {'ISS'})
+        self.assertEqual(get_profile('local').max_pdf_pages, None)
+    
+    def test_cobertura_e_proxima_faixa(self):
+        """Testa que o limite de páginas informa a faixa lida e permite continuar"""
+        analyzer = Analyzer(get_profile('local', max_pdf_pages=3))
+
+        primeira = analyzer.analyze(self.pdf_path, 'ISS')
+        segunda = analyzer.analyze(self.pdf_path, 'ISS', start_page=primeira['cobertura']['proxima_pagina'] - 1)
+        ultima = analyzer.analyze(self.pdf_path, 'ISS', start_page=6)
+
+        self.assertTrue(primeira['truncated'])
+        self.assertEqual(primeira['cobertura']['paginas'], [1, 3])
+        self.assertEqual(primeira['cobertura']['total_paginas'], 8)
+        self.assertEqual(primeira['cobertura']['motivo'], 'max_pdf_pages')
+        self.assertIn('continue a partir da página 4', primeira['aviso'])
+        self.assertEqual([r['pagina'] for r in segunda['results']], [4, 5, 6])
+        self.assertEqual(segunda['cobertura']['proxima_pagina'], 7)
+        self.assertNotIn('truncated', ultima)
+        self.assertEqual(ultima['cobertura'], {'paginas': [7, 8], 'total_paginas': 8, 'completa': True,
+                                               'proxima_pagina': None, 'proxima_linha': None, 'motivo': None,
+                                               'truncated': False})
+
+    def test_limite_no_meio_da_pagina_continua_na_mesma_pagina(self):
+        """Testa que a página em que o limite parou a busca é retomada na linha seguinte"""
+        pages = [['Cobrança de ISS', 'Sem tributos', 'Outro ISS', 'Fim da página'] for _ in range(3)]
+        with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as tmp:
+            tmp.write(build_pdf(pages))
+        self.addCleanup(os.unlink, tmp.name)
+
+        primeira = Analyzer(get_profile('local', max_matches_per_tributo=3)).analyze(tmp.name, 'ISS')
+        cobertura = primeira['cobertura']
+        segunda = Analyzer(get_profile('local')).analyze(
+            tmp.name, 'ISS', start_page=cobertura['proxima_pagina'] - 1, start_line=cobertura['proxima_linha'])
+        por_linhas = Analyzer(get_profile('local', max_lines=6)).analyze(tmp.name, 'ISS')
+
+        self.assertTrue(primeira['truncated'])
+        self.assertEqual((cobertura['proxima_pagina'], cobertura['proxima_linha']), (2, 2))
+        self.assertIn('continue a partir da página 2, linha 2', primeira['aviso'])
+        encontrados = [(r['pagina'], r['linha_pagina']) for r in primeira['results'] + segunda['results']]
+        self.assertEqual(encontrados, [(1, 1), (1, 3), (2, 1), (2, 3), (3, 1), (3, 3)])
+        self.assertTrue(segunda['cobertura']['completa'])
+        self.assertEqual((por_linhas['cobertura']['proxima_pagina'], por_linhas['cobertura']['proxima_linha']),
+                         (2, 2))
+
+    def test_prefiltro_so_extrai_paginas_candidatas(self):
+        """Testa que só a página com o tributo e as vizinhas passam pela análise de layout"""
+        pages = [['Sem tributos nesta página', f'Página {i + 1}'] for i in range(10)]
+        pages[6] = ['Cobrança de ISS', 'EMPRESA ALFA LTDA']
+        with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as tmp:
+            tmp.write(build_pdf(pages))
+        self.addCleanup(os.unlink, tmp.name)
+
+        extract_text = Page.extract_text
+        chamadas = []
+
+        def contar(page, *args, **kwargs):
+            chamadas.append(page.page_number)
+            return extract_text(page, *args, **kwargs)
+
+        with patch.object(Page, 'extract_text', contar):
+            filtrado = Analyzer(get_profile('local', prefilter_pages=True, extraction_workers=1)).analyze(tmp.name, 'ISS')
+        completo = Analyzer(get_profile('local', extraction_workers=1)).analyze(tmp.name, 'ISS')
+
+        self.assertEqual(sorted(chamadas), [6, 7, 8])
+        self.assertEqual(filtrado['results'], completo['results'])
+
+    def test_metricas_por_etapa(self):
+        """Testa o resumo da análise e a exposição no formato do Prometheus"""
+        antes = metrics.lines_scanned.value()
+        
+        result = Analyzer(get_profile('local')).analyze(self.pdf_path, 'ISS')
+        body = app_local.test_client().get('/metrics').get_data(as_text=True)
+        
+        self.assertEqual(result['metricas']['paginas'], 8)
+        self.assertEqual(result['metricas']['ocorrencias'], 8)
+        self.assertGreater(result['metricas']['etapas_s']['extracao'], 0)
+        self.assertEqual(metrics.lines_scanned.value() - antes, result['metricas']['linhas'])
+        self.assertIn('analisador_etapa_segundos_bucket{etapa="extracao",le="+Inf"}', body)
+        self.assertIn('analisador_analises_total{resultado="sucesso"}', body)
+        self.assertIn('# TYPE analisador_memoria_pico_bytes gauge', body)
+
+    def test_prazo_devolve_resultado_parcial(self):
+        """Testa que cancelamento e prazo esgotado devolvem o que já foi encontrado"""
+        deadline = Deadline()
+
+        def on_event(event, data):
+            if event == 'trecho' and data['id'] == 2:
+                deadline.cancel()
+
+        parcial = Analyzer(get_profile('local', context_lines=1)).analyze(self.pdf_path, 'ISS', on_event=on_event,
+                                                                          deadline=deadline)
+        esgotado = Analyzer(get_profile('local', timeout=0)).analyze(self.pdf_path, 'ISS')
+
+        self.assertTrue(parcial['success'])
+        self.assertTrue(parcial['truncated'])
+        self.assertIn('Análise cancelada', parcial['aviso'])
+        self.assertLess(parcial['paginas_processadas'], 8)
+        self.assertGreaterEqual(parcial['total_encontrados'], 3)
+        self.assertTrue(esgotado['truncated'])
+        self.assertIn('Tempo limite excedido', esgotado['error'])
+
+    def test_progresso_com_tempo_restante(self):
+        """Testa a publicação espaçada do progresso e a estimativa pela vazão"""
+        agora = [0.0]
+        publicados = []
+        tracker = ProgressTracker(lambda **p: publicados.append(p), interval=0.5, clock=lambda: agora[0])
+
+        tracker.update(etapa='extracao', paginas_processadas=0)
+        for pagina in range(1, 11):
+            agora[0] += 0.125
+            tracker.update(etapa='extracao', paginas_processadas=pagina, paginas_previstas=40)
+
+        # Uma publicação no início e uma a cada 0,5s
+        self.assertEqual([p['paginas_processadas'] for p in publicados], [0, 4, 8])
+        self.assertEqual(publicados[-1]['paginas_por_segundo'], 8.0)
+        self.assertEqual(publicados[-1]['eta_s'], 4.0)
+
+        # A análise sempre publica o retrato final
+        final = []
+        result = Analyzer(get_profile('local')).analyze(self.pdf_path, 'ISS', progress=lambda **p: final.append(p))
+        self.assertEqual(final[-1]['paginas_processadas'], 8)
+        self.assertEqual(final[-1]['paginas_previstas'], 8)
+        self.assertEqual(final[-1]['linhas_lidas'], result['metricas']['linhas'])
+        self.assertEqual(final[-1]['ocorrencias'], 8)
+        self.assertEqual(final[-1]['empresas_pendentes'], 0)
+
+class FakeTree:
+    """Treeview mínimo (sem janela) para testar a tabela da versão desktop"""
+    
+    def __init__(self):
+        self.rows = {}
+        self.inserts = 0
+    
+    def insert(self, parent, index, values):
+        self.inserts += 1
+        item = f'I{self.inserts}'
+        self.rows[item] = values
+        return item
+    
+    def item(self, item, values):
+        self.rows[item] = values
+    
+    def get_children(self):
+        return list(self.rows)
+    
+    def delete(self, *items):
+        for item in items:
+            del self.rows[item]
+
+class TestTabelaDesktop(unittest.TestCase):
+    """Testes da tabela de resultados da versão desktop"""
+    
+    def trecho(self, i):
+        return {'id': i, 'tributo': 'ISS', 'linha_encontrada': f'ISS linha {i}', 'linha_numero': i,
+                'contexto': f'ISS linha {i}', 'empresas_identificadas': []}
+    
+    def test_linhas_em_lotes_e_sob_demanda(self):
+        """Testa a inserção em lotes, a página materializada e o índice linha -> resultado"""
+        tree = FakeTree()
+        table = ResultsTable(tree, batch_size=100, page_size=250)
+        for i in range(50000):
+            table.push('trecho', self.trecho(i))
+        table.push('empresas', {'id': 3, 'empresas_identificadas': ['EMPRESA X LTDA']})
+        
+        # Cada ciclo insere no máximo um lote
+        table.flush()
+        self.assertEqual(len(tree.rows), 100)
+        while table.flush():
+            pass
+        
+        self.assertEqual(len(table.results), 50000)
+        self.assertEqual(len(tree.rows), 250)
+        self.assertEqual(tree.rows['I4'][3], 'EMPRESA X LTDA')
+        self.assertEqual(table.get('I4')['linha_numero'], 3)
+        
+        # Rolagem até o fim libera a próxima página
+        self.assertFalse(table.on_scroll('0.0', '0.5'))
+        self.assertTrue(table.on_scroll('0.9', '1.0'))
+        while table.flush():
+            pass
+        self.assertEqual(len(tree.rows), 500)
+        
+        # Resultado final substitui as linhas parciais
+        table.load([self.trecho(1)])
+        table.flush()
+        self.assertEqual(list(tree.rows.values())[0][2], 1)
+        self.assertEqual(len(tree.rows), 1)
+
+class TestExtracaoEntidades(unittest.TestCase):
+    """Testes da extração de empresas em uma passada"""
+    
+    def test_cnpj_razao_social_e_nomes(self):
+        """Testa CNPJ, razão social e nomes em maiúsculas sem pegar texto em minúsculas"""
+        texto = ("PREFEITURA MUNICIPAL DE SÃO JOSÉ\n"
+                 "Contratada: ALFA COMÉRCIO LTDA, CNPJ 12.345.678/0001-90. Também a BETA S.A. recolheu ISS.")
+        
+        entidades = EntityEngine().extract(texto)
+        
+        self.assertEqual(entidades, ['PREFEITURA MUNICIPAL DE SÃO JOSÉ', 'ALFA COMÉRCIO LTDA',
+                                     '12.345.678/0001-90', 'BETA S.A.'])
+        self.assertEqual(EntityEngine(include_names=False).extract(texto),
+                         ['ALFA COMÉRCIO LTDA', '12.345.678/0001-90', 'BETA S.A.'])
+    
+    def test_limite_de_resultados(self):
+        """Testa o número máximo de entidades devolvidas"""
+        texto = ' '.join(f'{i:02d}.345.678/0001-90' for i in range(10, 30))
+        
+        self.assertEqual(len(EntityEngine(max_results=10).extract(texto)), 10)
+
+class TestCachePaginas(unittest.TestCase):
+    """Testes do cache em disco do texto extraído"""
+    
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.cache = PageTextCache(self.cache_dir, max_bytes=10 * 1024 * 1024)
+        pages = [[f'Página {i + 1} com ISS'] for i in range(5)]
+        with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as tmp:
+            tmp.write(build_pdf(pages))
+            self.pdf_path = tmp.name
+    
+    def tearDown(self):
+        os.unlink(self.pdf_path)
+        shutil.rmtree(self.cache_dir)
+    
+    def test_reanalise_nao_usa_pdfplumber(self):
+        """Testa que o segundo acesso ao mesmo arquivo vem só do cache"""
+        primeira = list(iter_pages_cached(self.pdf_path, self.cache, workers=1))
+        
+        with patch('analisador.cache.iter_pages', side_effect=AssertionError('pdfplumber usado')), \
+             patch('analisador.cache.count_pages', side_effect=AssertionError('pdfplumber usado')):
+            segunda = list(iter_pages_cached(self.pdf_path, self.cache, workers=1))
+        
+        self.assertEqual(segunda, primeira)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+    
+    def test_prefixo_guardado_e_completado(self):
+        """Testa que uma leitura parcial é guardada e depois completada"""
+        parcial = list(iter_pages_cached(self.pdf_path, self.cache, workers=1, max_pages=2))
+        self.assertEqual(len(parcial), 2)
+        
+        completa = list(iter_pages_cached(self.pdf_path, self.cache, workers=1))
+        self.assertEqual(len(completa), 5)
+        self.assertEqual(completa[:2], parcial)
+        
+        total, guardadas, paginas = self.cache.open(file_sha256(self.pdf_path))
+        paginas.close()
+        self.assertEqual((total, guardadas), (5, 5))
+
+    def test_pdf_em_memoria_usa_a_mesma_entrada(self):
+        """Testa que o upload em memória (bytes) é lido e reaproveita o cache do arquivo"""
+        do_arquivo = list(iter_pages_cached(self.pdf_path, self.cache, workers=1))
+    
+        with open(self.pdf_path, 'rb') as f:
+            pdf_data = f.read()
+        self.assertEqual(file_sha256(pdf_data), file_sha256(self.pdf_path))
+        self.assertEqual(list(iter_pages(pdf_data, workers=1)), do_arquivo)
+    
+        self.assertEqual(list(iter_pages_cached(pdf_data, self.cache, workers=1)), do_arquivo)
+        self.assertEqual(self.cache.hits, 1)
+    
+    def test_perfil_web_com_prefiltro_grava_o_cache(self):
+        """Testa que o pré-filtro (perfis web e desktop) não impede o cache de ser gravado"""
+        analyzer = Analyzer(get_profile('web', extraction_workers=1), page_cache=self.cache)
+        primeira = analyzer.analyze(self.pdf_path, 'ISS')
+        
+        with patch.object(Page, 'extract_text', side_effect=AssertionError('pdfplumber usado')):
+            segunda = analyzer.analyze(self.pdf_path, 'ISS')
+        
+        self.assertEqual(segunda['results'], primeira['results'])
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+    
+    def test_prefiltro_com_cache_so_extrai_paginas_candidatas(self):
+        """Testa o pré-filtro com cache e a extração das páginas cruas quando viram candidatas"""
+        pages = [['Sem tributos nesta página', f'Página {i + 1}'] for i in range(10)]
+        pages[2] = ['Cobrança de IPTU', 'EMPRESA BETA LTDA']
+        pages[6] = ['Cobrança de ISS', 'EMPRESA ALFA LTDA']
+        with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as tmp:
+            tmp.write(build_pdf(pages))
+        self.addCleanup(os.unlink, tmp.name)
+        
+        extract_text = Page.extract_text
+        chamadas = []
+        
+        def contar(page, *args, **kwargs):
+            chamadas.append(page.page_number)
+            return extract_text(page, *args, **kwargs)
+        
+        web = Analyzer(get_profile('web', extraction_workers=1), page_cache=self.cache)
+        with patch.object(Page, 'extract_text', contar):
+            iss = web.analyze(tmp.name, 'ISS')
+            primeira = sorted(chamadas)
+            del chamadas[:]
+            web.analyze(tmp.name, 'ISS')
+            repetida = sorted(chamadas)
+            iptu = web.analyze(tmp.name, 'IPTU')
+            segunda = sorted(chamadas)
+            del chamadas[:]
+            completo = list(iter_pages_cached(tmp.name, self.cache, workers=1))
+        
+        self.assertEqual(primeira, [6, 7, 8])
+        self.assertEqual(repetida, [])
+        self.assertEqual(segunda, [2, 3, 4])
+        self.assertEqual(sorted(chamadas), [1, 5, 9, 10])
+        self.assertEqual([r['pagina'] for r in iss['results']], [7])
+        self.assertEqual([r['pagina'] for r in iptu['results']], [3])
+        self.assertEqual(completo, list(iter_pages(tmp.name, workers=1)))
+    
+    def test_remove_entradas_menos_usadas(self):
+        """Testa a remoção LRU quando o cache passa do limite"""
+        cache = PageTextCache(self.cache_dir, max_bytes=1)
+        cache.write('a' * 64, 1, ['texto'])
+        cache.write('b' * 64, 1, ['texto'])
+        
+        self.assertIsNone(cache.open('a' * 64))
+
+class TestAnaliseEmLote(unittest.TestCase):
+    """Testes da análise de vários PDFs com pool de processos"""
+    
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        for dia in range(3):
+            pages = [[f'Diário do dia {dia}'], ['Sem tributos'], [f'Cobrança de ISS dia {dia}']]
+            with open(os.path.join(self.tmpdir, f'diario_{dia}.pdf'), 'wb') as f:
+                f.write(build_pdf(pages))
+    
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+    
+    def test_lote_marca_arquivo_pagina_e_linha(self):
+        """Testa que o lote junta os resultados na ordem dos arquivos com arquivo e página"""
+        with patch('app_local.page_cache', PageTextCache(os.path.join(self.tmpdir, 'cache'))), \
+             patch('app_local.search_index', None):
+            result = analyze_batch(find_pdfs([self.tmpdir]), 'ISS', workers=2)
+        
+        self.assertEqual(result['total_encontrados'], 3)
+        self.assertEqual([r['arquivo'] for r in result['results']],
+                         ['diario_0.pdf', 'diario_1.pdf', 'diario_2.pdf'])
+        self.assertTrue(all(r['pagina'] == 3 for r in result['results']))
+        self.assertEqual(result['estatisticas']['paginas'], 9)
+        self.assertGreater(result['estatisticas']['paginas_por_segundo'], 0)
+
+class TestIndiceBusca(unittest.TestCase):
+    """Testes do índice invertido dos documentos analisados"""
+    
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.index = DocumentIndex(os.path.join(self.tmpdir, 'indice.sqlite3'))
+        self.app = app_local.test_client()
+    
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+    
+    def test_consulta_sem_reextrair_pdf(self):
+        """Testa que a consulta devolve o mesmo trecho da análise, sem abrir o PDF"""
+        pdf_path = os.path.join(self.tmpdir, 'diario.pdf')
+        with open(pdf_path, 'wb') as f:
+            f.write(build_pdf([['Abertura'], ['Linha antes', 'Recolhimento de ITBI pela EMPRESA X LTDA', 'Linha depois'],
+                               ['ITBIS não é tributo']]))
+        
+        with patch('app_local.page_cache', PageTextCache(os.path.join(self.tmpdir, 'cache'))), \
+             patch('app_local.search_index', self.index):
+            analise = process_local_analysis(pdf_path, 'ITBI')
+            
+            with patch('analisador.extraction.pdfplumber.open') as pdf_open:
+                response = self.app.get('/search?tributos=itbi&ultimos=90')
+                pagina = self.app.get(f"/documents/{analise['documento_id']}/pages/2").get_json()
+                pdf_open.assert_not_called()
+        
+        busca = response.get_json()
+        self.assertEqual(busca['total_encontrados'], 1)
+        trecho = busca['results'][0]
+        self.assertEqual(trecho['arquivo'], 'diario.pdf')
+        self.assertEqual(trecho['documento_id'], analise['documento_id'])
+        for campo in ('linha_encontrada', 'termo_encontrado', 'posicao', 'linha_numero', 'pagina', 'linha_pagina',
+                      'contexto'):
+            self.assertEqual(trecho[campo], analise['results'][0][campo])
+        self.assertEqual((trecho['pagina'], trecho['linha_pagina']), (2, 2))
+        
+        # Só a página do trecho, pela faixa de linhas da tabela de páginas
+        self.assertEqual(pagina['linhas'], ['Linha antes', 'Recolhimento de ITBI pela EMPRESA X LTDA', 'Linha depois'])
+        self.assertEqual(pagina['linhas'][trecho['linha_pagina'] - 1], trecho['linha_encontrada'])
+    
+    def test_banco_criado_no_primeiro_uso(self):
+        """Testa que criar o índice e os caches não grava nada até o primeiro uso"""
+        pasta = os.path.join(self.tmpdir, 'dados')
+        index = DocumentIndex(os.path.join(pasta, 'indice.sqlite3'))
+        llm_cache = LLMCache(os.path.join(pasta, 'maritaca.sqlite3'))
+        PageTextCache(os.path.join(pasta, 'paginas'))
+        self.assertFalse(os.path.exists(pasta))
+        
+        self.assertEqual(index.documents(), [])
+        self.assertIsNone(llm_cache.get('chave'))
+        self.assertEqual(sorted(os.listdir(pasta)), ['indice.sqlite3', 'maritaca.sqlite3'])
+    
+    def test_documento_reanalisado_nao_duplica(self):
+        """Testa que o mesmo arquivo gravado de novo substitui a versão anterior"""
+        for _ in range(2):
+            writer = self.index.writer('abc', 'diario.pdf')
+            writer.add(1, 1, 'ISS devido')
+            writer.commit(1)
+        
+        self.assertEqual(len(self.index.documents()), 1)
+        self.assertEqual(len(self.index.search(['ISS'])), 1)
+    
+    def test_exporta_csv_do_documento(self):
+        """Testa a exportação das ocorrências de um documento do índice, sem limite de trechos"""
+        writer = self.index.writer('abc', 'diario.pdf')
+        for linha in range(1, 151):
+            writer.add(linha, 1, f'ISS devido pela EMPRESA {linha} LTDA')
+        writer.commit(1)
+        documento_id = self.index.documents()[0]['id']
+        
+        with patch('app_local.search_index', self.index):
+            response = self.app.get(f'/documents/{documento_id}/export_csv?tributos=ISS')
+            body = response.get_data(as_text=True)
+        
+        self.assertEqual(response.mimetype, 'text/csv')
+        rows = list(csv.reader(io.StringIO(body.lstrip('\ufeff'))))
+        self.assertEqual(len(rows), 151)
+        self.assertEqual(rows[1][:3], ['ISS', 'ISS devido pela EMPRESA 1 LTDA', '1'])
+        
+        # As ocorrências saem do cursor sob demanda, sem montar a lista inteira
+        ocorrencias = self.index.iter_search(['ISS'], documento_id=documento_id)
+        self.assertEqual(next(ocorrencias)['linha_numero'], 1)
+        ocorrencias.close()
+
+class StubMaritacaHandler(BaseHTTPRequestHandler):
+    """Servidor local que imita o endpoint /api/chat/completions da Maritaca"""
+    protocol_version = 'HTTP/1.1'  # keep-alive, para verificar o reuso de conexões
+    
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        self.server.conexoes.add(self.client_address)
+        time.sleep(0.2)
+        
+        if 'FALHA' in body['messages'][-1]['content']:
+            status, payload = 500, {'error': {'message': 'falha simulada'}}
+        else:
+            status, payload = 200, {
+                'id': 'stub', 'object': 'chat.completion', 'created': 0, 'model': body['model'],
+                'choices': [{'index': 0, 'finish_reason': 'stop',
+                             'message': {'role': 'assistant', 'content': 'EMPRESA ALFA\nEMPRESA BETA'}}],
+            }
+        
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+    
+    def log_message(self, *args):
+        pass
+
+class TestClienteMaritaca(unittest.TestCase):
+    """Testes do cliente compartilhado da Maritaca contra um servidor local"""
+    
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubMaritacaHandler)
+        self.server.conexoes = set()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.client = MaritacaClient('chave-teste', base_url=f'http://127.0.0.1:{self.server.server_port}/api',
+                                     max_concurrency=4)
+    
+    def tearDown(self):
+        self.client.close()
+        self.server.shutdown()
+        self.server.server_close()
+    
+    def test_chamadas_em_paralelo_reaproveitam_conexoes(self):
+        """Testa 8 chamadas com no máximo 4 simultâneas e 4 conexões"""
+        with patch('app_local.maritaca', self.client):
+            inicio = time.perf_counter()
+            resultados = self.client.map(extract_local_entities_ai, [f'Contexto {i}' for i in range(8)])
+            duracao = time.perf_counter() - inicio
+        
+        self.assertEqual(resultados, [['EMPRESA ALFA', 'EMPRESA BETA']] * 8)
+        self.assertLess(duracao, 1.2)  # em sequência seriam 1,6s
+        self.assertLessEqual(len(self.server.conexoes), 4)
+        self.assertEqual(self.client.stats.to_dict()['chamadas'], 8)
+    
+    def test_falhas_sao_contabilizadas(self):
+        """Testa que uma falha da API vira lista vazia e entra nas estatísticas"""
+        with patch('app_local.maritaca', self.client):
+            self.assertEqual(extract_local_entities_ai('FALHA'), [])
+        
+        stats = self.client.stats.to_dict()
+        self.assertEqual((stats['chamadas'], stats['falhas']), (1, 1))
+        self.assertGreaterEqual(stats['latencia_media_ms'], 200)
+
+class TestCacheMaritaca(unittest.TestCase):
+    """Testes do cache persistente das respostas da Maritaca"""
+    
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubMaritacaHandler)
+        self.server.conexoes = set()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+    
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.tmpdir)
+    
+    def make_client(self):
+        cache = LLMCache(os.path.join(self.tmpdir, 'maritaca.sqlite3'))
+        return MaritacaClient('chave-teste', base_url=f'http://127.0.0.1:{self.server.server_port}/api',
+                              cache=cache)
+    
+    def test_contexto_repetido_nao_chama_a_api(self):
+        """Testa que o mesmo contexto (a menos de espaços) é respondido pelo cache, mesmo em outro processo"""
+        client = self.make_client()
+        with patch('app_local.maritaca', client):
+            primeira = extract_local_entities_ai('ISS devido pela\nEMPRESA ALFA LTDA')
+            segunda = extract_local_entities_ai('ISS  devido pela EMPRESA ALFA LTDA  ')
+        client.close()
+        
+        # Novo cliente (ex: reinício da aplicação) reaproveita o cache em disco
+        client = self.make_client()
+        with patch('app_local.maritaca', client):
+            terceira = extract_local_entities_ai('ISS devido pela EMPRESA ALFA LTDA')
+        client.close()
+        
+        self.assertEqual(primeira, segunda)
+        self.assertEqual(primeira, terceira)
+        self.assertEqual(len(self.server.conexoes), 1)
+        self.assertEqual(client.to_dict()['cache'], {'acertos': 1, 'faltas': 0, 'taxa_acerto': 1.0})
+        self.assertEqual(client.stats.chamadas, 0)
+    
+    def test_ttl_e_limite_de_entradas(self):
+        """Testa a expiração por TTL e a remoção das entradas menos usadas"""
+        cache = LLMCache(os.path.join(self.tmpdir, 'limite.sqlite3'), max_entries=2)
+        for chave in ('a', 'b', 'c'):
+            cache.set(chave, chave.upper())
+        
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.get('c'), 'C')
+        
+        cache.ttl = -1
+        self.assertIsNone(cache.get('c'))
+
 class TestSecurityValidations(unittest.TestCase):
     """Testes de segurança e validações"""
     